@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Memory-mappable serving artifacts.
+
+A serving artifact is a directory next to the joblib model holding the
+compiled forest and the feature encoding parameters as uncompressed .npy
+files plus a small meta.json. Loading opens the arrays with mmap, so every
+uvicorn worker on a node shares a single page-cache copy of the trees instead
+of unpickling its own. The compact forest export (app.ai.compact) uses the
+same writer and loader with its own arrays and format version.
+
+Usage: python -m app.ai.artifacts  (exports both models from the backend directory)
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+from app.ai.features import FeatureEncoder
+
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.mmap'
+META_FILE = 'meta.json'
+
+
+def artifact_dir_for(model_path):
+    """Serving artifact directory that belongs to a joblib model file"""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+
+def read_export_meta(path, format_version):
+    """Returns an export's metadata, or None if there is no complete export of format_version at path"""
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+    if meta.get('format_version') != format_version:
+        return None
+    return meta
+
+
+def _write_export(path, forest, features, version, format_version, smoke_X, smoke_proba):
+    os.makedirs(path)
+    for name in forest.ARRAYS:
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(forest, name)))
+    np.save(os.path.join(path, 'mean.npy'), features.mean)
+    np.save(os.path.join(path, 'scale.npy'), features.scale)
+    if smoke_X is not None:
+        np.save(os.path.join(path, 'smoke_X.npy'), smoke_X)
+        np.save(os.path.join(path, 'smoke_proba.npy'), smoke_proba)
+
+    meta = {
+        'format_version': format_version,
+        'version': version,
+        'feature_cols': features.feature_cols,
+        'numerical_cols': features.numerical_cols,
+        'categories': features.valid_values,
+        'classes': forest.classes.tolist(),
+        'max_depth': forest.max_depth,
+        'has_smoke': smoke_X is not None,
+    }
+    # meta.json is written last and marks the export as complete
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def export_forest(path, forest, features, version, format_version, smoke_X=None, smoke_proba=None):
+    """Writes a forest's arrays and feature parameters as uncompressed .npy files and atomically moves them into place
+
+    version identifies the joblib artifacts the export was built from;
+    smoke_X and smoke_proba optionally record inputs and the probabilities
+    sklearn gave for them, so a loader can check the export without
+    unpickling anything.
+
+    Safe to call from several workers at once: the export is built in a
+    private directory and renamed over the old one, and processes that have
+    the old files mapped keep reading them until they reload.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    _write_export(tmp_path, forest, features, version, format_version, smoke_X, smoke_proba)
+    publish_directory(tmp_path, path, version, format_version)
+
+
+def publish_directory(tmp_path, path, version, format_version):
+    """Renames a fully written export directory over path
+
+    If path already holds an export of the same version (another worker got
+    there first) the new copy is discarded; an older export is replaced.
+    """
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        existing = read_export_meta(path, format_version)
+        if existing is not None and existing['version'] == version:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        old_path = f"{path}.old-{os.getpid()}"
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_forest_export(path, forest_type, format_version, mmap_mode='r'):
+    """Opens an export written by export_forest, returning (forest, features, meta, smoke)
+
+    The forest's arrays are opened with mmap_mode. smoke is
+    (X, expected_probabilities) recorded at export time, or None.
+    """
+    meta = read_export_meta(path, format_version)
+    if meta is None:
+        raise FileNotFoundError(f"No {forest_type.__name__} export at {path}")
+
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in forest_type.ARRAYS}
+    forest = forest_type(max_depth=meta['max_depth'], classes=np.asarray(meta['classes']), **arrays)
+    features = FeatureEncoder(
+        meta['feature_cols'],
+        meta['categories'],
+        np.load(os.path.join(path, 'mean.npy')),
+        np.load(os.path.join(path, 'scale.npy')),
+        meta['numerical_cols'],
+    )
+
+    smoke = None
+    if meta.get('has_smoke'):
+        smoke = (np.load(os.path.join(path, 'smoke_X.npy')), np.load(os.path.join(path, 'smoke_proba.npy')))
+
+    return forest, features, meta, smoke
+
+
+def main():
+    """Exports serving artifacts for both models from their joblib files"""
+    import logging
+    from app.ai.specs import default_model_specs, load_mmap_bundle
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    ai_dir = os.path.dirname(os.path.abspath(__file__))
+    for spec in default_model_specs(ai_dir).values():
+        bundle = load_mmap_bundle(spec)
+        print(f"{spec.name}: version {bundle.version} -> {spec.artifact_dir}")
+
+
+if __name__ == "__main__":
+    main()
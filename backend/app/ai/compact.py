@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+"""
+Compact, quantized random forest layout for low-memory inference.
+
+sklearn keeps a 64-byte node record plus a full class-count row for every
+node, and CompiledForest still spends int64 ids and float64 thresholds on
+every node. CompactForest stores split nodes only, as int16 feature ids,
+float32 thresholds and int32 children, and keeps class probabilities for the
+leaves only. Predictions are bit-for-bit identical to the sklearn forest:
+
+- Trees already compare float32 inputs, so each float64 threshold is rounded
+  down to the largest float32 not above it, which gives every float32 input
+  the same decision.
+- Leaf probabilities stay float64 and are summed over the trees in order.
+
+Usage: python -m app.ai.compact [--export]
+(reports memory use and verifies predictions on the training datasets)
+"""
+import json
+import os
+
+import numpy as np
+
+from app.ai.artifacts import export_forest
+
+COMPACT_FORMAT_VERSION = 2
+COMPACT_SUFFIX = '.compact'
+
+
+def round_down_float32(thresholds):
+    """Largest float32 <= each float64 threshold, so float32 `x <= t` decisions are unchanged"""
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    rounded = thresholds.astype(np.float32)
+    rounded_up = rounded.astype(np.float64) > thresholds
+    rounded[rounded_up] = np.nextafter(rounded[rounded_up], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """A random forest stored as split nodes and leaves in separate, narrow arrays
+
+    feature, threshold, left and right describe the split nodes of all trees
+    back to back. A child >= 0 is another split node; a negative child c is
+    leaf ~c, whose class probabilities are leaf_value[~c]. roots uses the same
+    encoding, so a tree that is a single leaf needs no split node.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'leaf_value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes = classes
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Builds the compact layout from a fitted RandomForestClassifier"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compacted")
+        if model.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError(f"{model.n_features_in_} features do not fit int16 feature ids")
+
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        max_depth = 0
+        n_splits = 0
+        n_leaves = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+
+            # Renumber split nodes and leaves separately; leaves get ~index
+            node_ids = np.empty(tree.node_count, dtype=np.int64)
+            node_ids[~is_leaf] = n_splits + np.arange(np.count_nonzero(~is_leaf))
+            node_ids[is_leaf] = ~(n_leaves + np.arange(np.count_nonzero(is_leaf)))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[is_leaf, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+            features.append(tree.feature[~is_leaf])
+            thresholds.append(round_down_float32(tree.threshold[~is_leaf]))
+            lefts.append(node_ids[tree.children_left[~is_leaf]])
+            rights.append(node_ids[tree.children_right[~is_leaf]])
+            leaf_values.append(value)
+            roots.append(node_ids[0])
+            max_depth = max(max_depth, tree.max_depth)
+            n_splits += np.count_nonzero(~is_leaf)
+            n_leaves += np.count_nonzero(is_leaf)
+
+        if max(n_splits, n_leaves) > np.iinfo(np.int32).max:
+            raise ValueError("Forest has too many nodes for int32 child ids")
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int16),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float32),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            leaf_value=np.ascontiguousarray(np.concatenate(leaf_values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    @property
+    def n_splits(self):
+        return len(self.feature)
+
+    @property
+    def n_leaves(self):
+        return len(self.leaf_value)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def split_thresholds(self, feature_idx):
+        """Sorted distinct thresholds the trees test on one feature"""
+        return np.unique(self.threshold[self.feature == feature_idx]).astype(np.float64)
+
+    def _walk(self, X, roots):
+        """Leaf index reached by each row from each root, shape (len(roots), n_rows)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[np.newaxis, :]
+        nodes = np.repeat(roots.astype(np.intp)[:, np.newaxis], X.shape[0], axis=1)
+
+        for _ in range(self.max_depth if self.n_splits else 0):
+            at_split = nodes >= 0
+            if not at_split.any():
+                break
+            # Rows already at a leaf look up split 0 and keep their leaf
+            split = np.where(at_split, nodes, 0)
+            go_left = X[rows, self.feature[split]] <= self.threshold[split]
+            nodes = np.where(at_split, np.where(go_left, self.left[split], self.right[split]), nodes)
+
+        return ~nodes
+
+    def apply(self, X):
+        """Returns the leaf index reached by each row in each tree, shape (n_trees, n_rows)"""
+        return self._walk(X, self.roots)
+
+    def trees_proba(self, X, trees):
+        """Class probabilities of a subset of the trees, shape (len(trees), n_rows, n_classes)"""
+        return self.leaf_value[self._walk(X, self.roots[trees])]
+
+    def tree_leaf_values(self, tree):
+        """Class probabilities of every leaf of a single tree"""
+        leaves, pending = [], [int(self.roots[tree])]
+        while pending:
+            node = pending.pop()
+            if node < 0:
+                leaves.append(~node)
+            else:
+                pending.extend((int(self.left[node]), int(self.right[node])))
+        return self.leaf_value[np.sort(leaves)]
+
+    def predict_proba(self, X):
+        """Class probabilities, identical to RandomForestClassifier.predict_proba"""
+        # Summing over the tree axis accumulates trees in order, as sklearn does
+        proba = self.leaf_value[self.apply(X)].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """Returns (decisions, probabilities) from a single traversal"""
+        proba = self.predict_proba(X)
+        return self.classes.take(np.argmax(proba, axis=1)), proba
+
+
+def verify_compact_forest(model, forest, X):
+    """Raises AssertionError unless the compact forest matches sklearn exactly on X"""
+    decisions, proba = forest.predict(X)
+    expected_proba = model.predict_proba(X)
+
+    if not np.array_equal(proba, expected_proba):
+        max_diff = float(np.max(np.abs(proba - expected_proba)))
+        raise AssertionError(f"Compact forest probabilities differ from sklearn (max diff {max_diff})")
+    if not np.array_equal(decisions, model.predict(X)):
+        raise AssertionError("Compact forest decisions differ from sklearn")
+
+
+def threshold_probes(forest, X, seed=0):
+    """Copies of rows of X moved onto both sides of every split threshold
+
+    These are the inputs where rounding a threshold the wrong way would show.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.asarray(X, dtype=np.float64)
+    probes = []
+    for idx in np.unique(forest.feature):
+        thresholds = forest.split_thresholds(idx).astype(np.float32)
+        edges = np.concatenate([thresholds, np.nextafter(thresholds, np.float32(np.inf))]).astype(np.float64)
+        rows = X[rng.integers(0, len(X), len(edges))].copy()
+        rows[:, idx] = edges
+        probes.append(rows)
+    return np.vstack(probes) if probes else X[:0]
+
+
+def sklearn_forest_nbytes(model):
+    """Bytes held by the node records and value arrays of a fitted sklearn forest"""
+    total = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        total += tree.__getstate__()['nodes'].nbytes + tree.value.nbytes
+    return total
+
+
+def compact_dir_for(model_path):
+    """Compact forest directory that belongs to a joblib model file"""
+    return os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+
+
+def export_compact(path, forest, features, version, smoke_X=None, smoke_proba=None):
+    """Writes a compact forest export and atomically moves it into place (see export_forest)"""
+    export_forest(path, forest, features, version, COMPACT_FORMAT_VERSION, smoke_X, smoke_proba)
+
+
+def main():
+    """Reports the memory saved by the compact layout and verifies it on the training datasets"""
+    import argparse
+    import warnings
+    from app.ai.specs import artifact_version, default_model_specs, load_bundle, smoke_features
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--export', action='store_true', help="also write the verified compact forests")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    report = {}
+    ai_dir = os.path.dirname(os.path.abspath(__file__))
+    for spec in default_model_specs(ai_dir).values():
+        bundle = load_bundle(spec)
+        compact = CompactForest.from_sklearn(bundle.model)
+        X = smoke_features(bundle)
+        verify_compact_forest(bundle.model, compact, X)
+        probes = threshold_probes(compact, X)
+        verify_compact_forest(bundle.model, compact, probes)
+
+        sklearn_bytes = sklearn_forest_nbytes(bundle.model)
+        compiled_bytes = bundle.forest.nbytes
+        report[spec.name] = {
+            'trees': compact.n_trees,
+            'split_nodes': compact.n_splits,
+            'leaves': compact.n_leaves,
+            'rows_verified': len(X),
+            'threshold_probes_verified': len(probes),
+            'sklearn_kb': round(sklearn_bytes / 1024, 1),
+            'compiled_kb': round(compiled_bytes / 1024, 1),
+            'compact_kb': round(compact.nbytes / 1024, 1),
+            'saved_vs_sklearn_pct': round(100 * (1 - compact.nbytes / sklearn_bytes), 1),
+            'saved_vs_compiled_pct': round(100 * (1 - compact.nbytes / compiled_bytes), 1),
+        }
+
+        if args.export:
+            path = compact_dir_for(spec.model_path)
+            export_compact(path, compact, bundle.features, artifact_version(*spec.artifact_paths),
+                           X, bundle.model.predict_proba(X))
+            report[spec.name]['exported_to'] = path
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+"""
+Early-exit forest evaluation for band-only decisions.
+
+The API acts on which band the approval probability falls in (low < 0.3 <=
+moderate < 0.7 <= high) and on the approve/decline decision at 0.5. After k
+trees the running sum of positive-class probabilities bounds the final
+average: each remaining tree adds at least its smallest and at most its
+largest leaf probability. Trees are visited one at a time and a row stops as
+soon as those bounds fall on one side of every edge, which fixes its band and
+decision. Rows that never settle visit every tree and get the exact
+probability.
+
+The tree order is tuned greedily on training data so that as many rows as
+possible settle after as few trees as possible. Trees are walked in blocks
+with one settle check per block, since a NumPy step per tree costs more than
+it saves; for small inputs the full forest is cheaper still, so inputs below
+min_rows skip early exit entirely.
+"""
+import numpy as np
+
+from app.ai.recommendations import BANDS, LOW_BAND_UPPER, MODERATE_BAND_UPPER
+
+# Decision threshold of a binary forest: class 1 wins when its probability is above 0.5
+DECISION_EDGE = 0.5
+
+# Bounds must clear an edge by this much, so float rounding in the partial sums can never flip a band
+EDGE_MARGIN = 1e-9
+
+
+class BandPredictions:
+    """Per-row results of an early-exit evaluation
+
+    band holds indices into BANDS; probability is the positive-class estimate,
+    guaranteed to lie within [lower, upper] and exact for rows that visited
+    every tree; proba holds the estimates per class in the forest's layout.
+    """
+
+    def __init__(self, band, decision, probability, lower, upper, trees, proba):
+        self.band = band
+        self.decision = decision
+        self.probability = probability
+        self.lower = lower
+        self.upper = upper
+        self.trees = trees
+        self.proba = proba
+
+    def band_names(self):
+        return [BANDS[index] for index in self.band]
+
+
+class EarlyExitForest:
+    """Evaluates a binary forest tree by tree until every row's band and decision are settled
+
+    `forest` is a CompiledForest or CompactForest; `order` is the order in
+    which trees are visited, `block_size` trees at a time. predict() uses the
+    full forest for inputs of fewer than `min_rows` rows.
+    """
+
+    def __init__(self, forest, order, edges=(LOW_BAND_UPPER, DECISION_EDGE, MODERATE_BAND_UPPER),
+                 block_size=20, min_rows=0):
+        if len(forest.classes) != 2:
+            raise ValueError("Early exit needs a binary forest")
+        self.forest = forest
+        self.classes = forest.classes
+        self.order = np.asarray(order, dtype=np.intp)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.band_edges = np.asarray([LOW_BAND_UPPER, MODERATE_BAND_UPPER], dtype=np.float64)
+        self.block_size = max(1, int(block_size))
+        self.min_rows = min_rows
+        self.n_trees = forest.n_trees
+        if sorted(self.order.tolist()) != list(range(self.n_trees)):
+            raise ValueError("Tree order must visit every tree exactly once")
+
+        # Smallest and largest positive-class probability each remaining tree can still add
+        leaf_min, leaf_max = tree_probability_ranges(forest)
+        self.rest_min = np.append(np.cumsum(leaf_min[self.order][::-1])[::-1], 0.0)
+        self.rest_max = np.append(np.cumsum(leaf_max[self.order][::-1])[::-1], 0.0)
+        # Position of each tree id in the visiting order
+        self.tree_positions = np.argsort(self.order)
+
+    @classmethod
+    def tuned(cls, forest, X, **kwargs):
+        """Builds an evaluator whose tree order is tuned on the rows of X"""
+        return cls(forest, tune_tree_order(forest, X), **kwargs)
+
+    def evaluate(self, X):
+        """Band, decision and bounded probability of every row of an encoded, scaled matrix"""
+        X = np.asarray(X)
+        n_rows = len(X)
+        n = self.n_trees
+        # Class probabilities of the visited trees for the rows still active, for their exact sum
+        blocks = []
+        running = np.zeros(n_rows, dtype=np.float64)
+        lower = np.empty(n_rows, dtype=np.float64)
+        upper = np.empty(n_rows, dtype=np.float64)
+        estimate = np.empty(n_rows, dtype=np.float64)
+        trees_used = np.full(n_rows, n, dtype=np.intp)
+        active = np.arange(n_rows)
+
+        visited = 0
+        while visited < n and len(active):
+            trees = self.order[visited:visited + self.block_size]
+            block = self.forest.trees_proba(X[active], trees)
+            blocks.append(block)
+            running[active] += block[:, :, 1].sum(axis=0)
+            visited += len(trees)
+            if visited == n:
+                break
+
+            low = (running[active] + self.rest_min[visited]) / n
+            high = (running[active] + self.rest_max[visited]) / n
+            settled = settled_mask(low, high, self.edges)
+            if settled.any():
+                rows = active[settled]
+                lower[rows] = low[settled]
+                upper[rows] = high[settled]
+                estimate[rows] = np.clip(running[rows] / visited, low[settled], high[settled])
+                trees_used[rows] = visited
+                active = active[~settled]
+                blocks = [block[:, ~settled] for block in blocks]
+
+        proba = np.column_stack([1.0 - estimate, estimate])
+        if len(active):
+            # Summed in the forest's own tree order, as predict_proba does, so the result is exact
+            proba[active] = np.concatenate(blocks)[self.tree_positions].sum(axis=0) / n
+            lower[active] = upper[active] = estimate[active] = proba[active, 1]
+
+        band = np.searchsorted(self.band_edges, estimate, side='right')
+        decision = self.classes.take(np.argmax(proba, axis=1))
+        return BandPredictions(band, decision, estimate, lower, upper, trees_used, proba)
+
+    def predict(self, X):
+        """Returns (decisions, probabilities) like the forest, with probabilities as bounded estimates"""
+        if len(X) < self.min_rows:
+            return self.forest.predict(X)
+        result = self.evaluate(X)
+        return result.decision, result.proba
+
+
+def settled_mask(lower, upper, edges):
+    """Rows whose probability bounds fall clearly on one side of every edge"""
+    settled = np.ones(len(lower), dtype=bool)
+    for edge in edges:
+        settled &= (upper < edge - EDGE_MARGIN) | (lower > edge + EDGE_MARGIN)
+    return settled
+
+
+def tree_probability_ranges(forest):
+    """Smallest and largest positive-class leaf probability of every tree"""
+    ranges = np.empty((forest.n_trees, 2), dtype=np.float64)
+    for tree in range(forest.n_trees):
+        values = forest.tree_leaf_values(tree)[:, 1]
+        ranges[tree] = values.min(), values.max()
+    return ranges[:, 0], ranges[:, 1]
+
+
+def tune_tree_order(forest, X, edges=(LOW_BAND_UPPER, DECISION_EDGE, MODERATE_BAND_UPPER)):
+    """Greedy tree order that settles the rows of X as early as possible
+
+    At each step picks the tree that settles the most still-unsettled rows,
+    breaking ties by the widest leaf probability range, since visiting that
+    tree narrows every row's bounds the most.
+    """
+    X = np.asarray(X)
+    n = forest.n_trees
+    leaf_min, leaf_max = tree_probability_ranges(forest)
+    values = forest.trees_proba(X, np.arange(n))[:, :, 1]
+
+    remaining = list(range(n))
+    order = []
+    running = np.zeros(len(X), dtype=np.float64)
+    unsettled = np.ones(len(X), dtype=bool)
+    rest_min, rest_max = leaf_min.sum(), leaf_max.sum()
+
+    while remaining:
+        candidates = np.asarray(remaining)
+        # Bounds of every unsettled row if each candidate were visited next
+        sums = running[unsettled] + values[candidates][:, unsettled]
+        low = (sums + (rest_min - leaf_min[candidates])[:, np.newaxis]) / n
+        high = (sums + (rest_max - leaf_max[candidates])[:, np.newaxis]) / n
+        newly_settled = np.array([settled_mask(l, h, edges).sum() for l, h in zip(low, high)])
+        spread = leaf_max[candidates] - leaf_min[candidates]
+        best = candidates[np.lexsort((-spread, -newly_settled))[0]]
+
+        order.append(int(best))
+        remaining.remove(best)
+        running += values[best]
+        rest_min -= leaf_min[best]
+        rest_max -= leaf_max[best]
+        unsettled[unsettled] = ~settled_mask((running[unsettled] + rest_min) / n,
+                                             (running[unsettled] + rest_max) / n, edges)
+
+    return np.asarray(order, dtype=np.intp)
+
+
+def verify_early_exit(evaluator, X):
+    """Raises AssertionError unless early exit gives the forest's band and decision on every row of X"""
+    decisions, proba = evaluator.forest.predict(X)
+    result = evaluator.evaluate(X)
+    exact = proba[:, 1]
+    if not np.array_equal(result.decision, decisions):
+        raise AssertionError("Early-exit decisions differ from the forest")
+    if not np.array_equal(result.band, np.searchsorted(evaluator.band_edges, exact, side='right')):
+        raise AssertionError("Early-exit bands differ from the forest")
+    if np.any(exact < result.lower - EDGE_MARGIN) or np.any(exact > result.upper + EDGE_MARGIN):
+        raise AssertionError("Early-exit bounds do not contain the forest's probability")
+    unsettled = result.trees == evaluator.n_trees
+    if not np.array_equal(result.probability[unsettled], exact[unsettled]):
+        raise AssertionError("Early-exit probability differs from the forest for rows that visited every tree")
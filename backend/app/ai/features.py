@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Pandas-free feature encoding for serving.
+
+Turns a raw request into the exact feature vector the trained models expect,
+using dict lookups for the categorical codes and a precomputed mean/scale
+array in place of the fitted StandardScaler.
+"""
+import threading
+
+import numpy as np
+
+# Feature layout the farmer approval model was trained on
+FARMER_FEATURE_COLS = ['years_experience', 'land_size_hectares', 'previous_loans', 'credit_score',
+                       'annual_income', 'crop_diversity', 'has_irrigation', 'farm_type']
+FARMER_NUMERICAL_COLS = ['years_experience', 'land_size_hectares', 'previous_loans',
+                         'credit_score', 'annual_income', 'crop_diversity']
+
+# Feature layout the farm plan model was trained on
+FARM_PLAN_FEATURE_COLS = ['crop_type', 'soil_type', 'climate', 'area_hectares', 'yield_per_hectare']
+FARM_PLAN_NUMERICAL_COLS = ['area_hectares', 'yield_per_hectare']
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a categorical value was not seen during training"""
+
+    def __init__(self, column, value, valid_values):
+        self.column = column
+        self.value = value
+        self.valid_values = list(valid_values)
+        super().__init__(f"Unknown value '{value}' for {column}. Valid options are: {', '.join(self.valid_values)}")
+
+
+class NonFiniteValueError(ValueError):
+    """Raised when a numerical value is NaN or infinite, which the trees would route arbitrarily"""
+
+    def __init__(self, column, value):
+        self.column = column
+        self.value = value
+        super().__init__(f"Invalid value {value} for {column}. It must be a finite number")
+
+
+class FeatureEncoder:
+    """Encodes raw feature values into a model-ready NumPy row
+
+    Produces the same values as LabelEncoder.transform followed by
+    StandardScaler.transform on a one-row DataFrame, without building one.
+    `categories` maps each categorical column to its values in code order
+    (LabelEncoder.classes_), and mean/scale are the scaler's parameters for
+    the numerical columns.
+    """
+
+    def __init__(self, feature_cols, categories, mean, scale, numerical_cols):
+        self.feature_cols = list(feature_cols)
+        self.numerical_cols = list(numerical_cols)
+
+        # Categorical codes are the position of each value in the sorted classes_
+        self.valid_values = {col: [str(value) for value in values] for col, values in categories.items()}
+        self.codes = {col: {value: code for code, value in enumerate(values)}
+                      for col, values in self.valid_values.items()}
+
+        self.numerical_idx = np.array([self.feature_cols.index(col) for col in self.numerical_cols])
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+        self._columns = [(idx, col, self.codes.get(col)) for idx, col in enumerate(self.feature_cols)]
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, feature_cols, label_encoders, scaler, numerical_cols):
+        """Builds an encoder from fitted LabelEncoders and a StandardScaler"""
+        # Fold the scaler into plain arrays (scale_ already has zero variances replaced by 1)
+        n_numerical = len(numerical_cols)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_numerical)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_numerical)
+        categories = {col: list(encoder.classes_) for col, encoder in label_encoders.items()}
+        return cls(feature_cols, categories, mean, scale, numerical_cols)
+
+    def _buffer(self):
+        """Returns this thread's preallocated one-row feature buffer"""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.empty((1, len(self.feature_cols)), dtype=np.float64)
+            self._local.buffer = buffer
+        return buffer
+
+    def transform_one(self, values):
+        """Encodes and scales a single row given as a dict of raw values
+
+        The returned array is reused by the next call on the same thread, so
+        callers must finish with it before encoding another row.
+        """
+        row = self._buffer()
+        out = row[0]
+
+        for idx, col, codes in self._columns:
+            value = values[col]
+            if codes is None:
+                out[idx] = value
+            else:
+                code = codes.get(value)
+                if code is None:
+                    raise UnknownCategoryError(col, value, self.valid_values[col])
+                out[idx] = code
+
+        if not np.isfinite(out).all():
+            raise self._non_finite(out)
+
+        numerical = out[self.numerical_idx]
+        numerical -= self.mean
+        numerical /= self.scale
+        out[self.numerical_idx] = numerical
+
+        return row
+
+    def encode_batch(self, rows):
+        """Encodes many rows given as dicts of raw values, without scaling
+
+        Returns (X, valid_indices, errors): X holds the categorical codes and
+        raw numerical values of the rows that encoded successfully, in order,
+        valid_indices gives their positions in rows and errors maps the
+        position of every rejected row to its UnknownCategoryError or
+        NonFiniteValueError.
+        """
+        X = np.empty((len(rows), len(self.feature_cols)), dtype=np.float64)
+        valid_indices = []
+        errors = {}
+
+        for index, values in enumerate(rows):
+            out = X[len(valid_indices)]
+            try:
+                for idx, col, codes in self._columns:
+                    value = values[col]
+                    if codes is None:
+                        out[idx] = value
+                    else:
+                        code = codes.get(value)
+                        if code is None:
+                            raise UnknownCategoryError(col, value, self.valid_values[col])
+                        out[idx] = code
+            except UnknownCategoryError as e:
+                errors[index] = e
+                continue
+            valid_indices.append(index)
+        X = X[:len(valid_indices)]
+
+        # One check over the whole batch; rows with a NaN or infinite value are moved to errors
+        finite = np.isfinite(X).all(axis=1)
+        if not finite.all():
+            for row in np.flatnonzero(~finite):
+                errors[valid_indices[row]] = self._non_finite(X[row])
+            valid_indices = [index for index, keep in zip(valid_indices, finite) if keep]
+            X = X[finite]
+
+        return X, valid_indices, errors
+
+    def _non_finite(self, out):
+        """NonFiniteValueError for the first non-finite value of an encoded row"""
+        idx = int(np.flatnonzero(~np.isfinite(out))[0])
+        return NonFiniteValueError(self.feature_cols[idx], out[idx])
+
+    def scale_batch(self, X):
+        """Returns a scaled copy of a batch from encode_batch"""
+        X = X.copy()
+        numerical = X[:, self.numerical_idx]
+        numerical -= self.mean
+        numerical /= self.scale
+        X[:, self.numerical_idx] = numerical
+        return X
+
+    def transform_batch(self, rows):
+        """Encodes and scales many rows given as dicts of raw values
+
+        Returns (X, valid_indices, errors) like encode_batch, with X scaled.
+        """
+        X, valid_indices, errors = self.encode_batch(rows)
+        return self.scale_batch(X), valid_indices, errors
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Flat-array random forest evaluator for serving.
+
+Exports a fitted RandomForestClassifier into contiguous node arrays shared by
+all trees and evaluates every tree in one vectorized traversal, returning the
+class decision and the probabilities from the same pass. Results are
+bit-for-bit identical to RandomForestClassifier.predict / predict_proba for
+finite inputs; a NaN compares false against every threshold and is sent
+right, so callers reject non-finite rows first (FeatureEncoder does).
+"""
+import numpy as np
+
+
+class CompiledForest:
+    """A random forest flattened into contiguous node arrays
+
+    Nodes of all trees are stored back to back. Leaves point to themselves,
+    so a fixed number of steps (the deepest tree's depth) walks every row of
+    every tree to its leaf without per-tree bookkeeping.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes = classes
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Builds the flat representation from a fitted RandomForestClassifier"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back onto themselves and test feature 0 harmlessly
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def split_thresholds(self, feature_idx):
+        """Sorted distinct thresholds the trees test on one feature"""
+        # Leaves point to themselves and carry no real threshold
+        is_split = self.left != np.arange(self.n_nodes)
+        return np.unique(self.threshold[is_split & (self.feature == feature_idx)])
+
+    def _walk(self, X, roots):
+        """Global leaf index reached by each row from each root, shape (len(roots), n_rows)"""
+        # Trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[np.newaxis, :]
+        nodes = np.repeat(roots[:, np.newaxis], X.shape[0], axis=1)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def apply(self, X):
+        """Returns the global leaf index reached by each row in each tree, shape (n_trees, n_rows)"""
+        return self._walk(X, self.roots)
+
+    def trees_proba(self, X, trees):
+        """Class probabilities of a subset of the trees, shape (len(trees), n_rows, n_classes)"""
+        return self.value[self._walk(X, self.roots[trees])]
+
+    def tree_leaf_values(self, tree):
+        """Class probabilities of every leaf of a single tree"""
+        end = self.roots[tree + 1] if tree + 1 < self.n_trees else self.n_nodes
+        nodes = np.arange(self.roots[tree], end)
+        return self.value[nodes[self.left[nodes] == nodes]]
+
+    def predict_proba(self, X):
+        """Class probabilities, identical to RandomForestClassifier.predict_proba"""
+        # Summing over the tree axis accumulates trees in order, as sklearn does
+        proba = self.value[self.apply(X)].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """Returns (decisions, probabilities) from a single traversal"""
+        proba = self.predict_proba(X)
+        return self.classes.take(np.argmax(proba, axis=1)), proba
+
+
+def verify_compiled_forest(model, forest, X):
+    """Raises AssertionError unless the compiled forest matches sklearn exactly on X"""
+    decisions, proba = forest.predict(X)
+    expected_proba = model.predict_proba(X)
+
+    if not np.array_equal(proba, expected_proba):
+        max_diff = float(np.max(np.abs(proba - expected_proba)))
+        raise AssertionError(f"Compiled forest probabilities differ from sklearn (max diff {max_diff})")
+    if not np.array_equal(decisions, model.predict(X)):
+        raise AssertionError("Compiled forest decisions differ from sklearn")
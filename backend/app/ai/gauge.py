@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+"""
+The approval gauge: a colored arc from red to green with a needle at the
+approval probability. The command-line predictors draw it in their reports,
+and the server pre-renders it for prediction responses.
+"""
+import numpy as np
+from matplotlib.colors import Normalize
+from matplotlib import colormaps
+
+
+def draw_gauge(ax, probability):
+    """Draws the approval gauge (colored arc and needle) for a probability on a matplotlib axes"""
+    gauge = np.linspace(0, 100, 100)
+    angle = np.linspace(-3*np.pi/4, 3*np.pi/4, 100)
+    colors = colormaps['RdYlGn'](Normalize(0, 100)(gauge))
+    ax.scatter(np.cos(angle), np.sin(angle), c=colors, s=300, alpha=0.8)
+
+    needle_angle = -3*np.pi/4 + 3*np.pi/2 * probability
+    ax.plot([0, 0.8 * np.cos(needle_angle)], [0, 0.8 * np.sin(needle_angle)], 'k-', linewidth=4)
+    ax.plot([0], [0], 'ko', markersize=10)
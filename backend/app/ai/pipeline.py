@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+One serializable feature pipeline shared by training and serving.
+
+A FeaturePipeline holds everything between a raw record and a prediction:
+the column order the model was fitted on, the categorical codes, the scaler
+parameters and the fitted model. Training fits it and transforms its frames
+with it, and serving loads the same object, so the two cannot drift apart in
+column order or preprocessing. Rows are encoded and scaled by the
+FeatureEncoder in a single NumPy pass, without building or mutating
+DataFrames.
+"""
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from app.ai.features import FeatureEncoder, NonFiniteValueError, UnknownCategoryError
+
+PIPELINE_FORMAT_VERSION = 1
+
+
+class FeaturePipeline:
+    """Column order, categorical codes, scaler parameters and model in one object
+
+    features is the FeatureEncoder that turns raw values into model input;
+    transform_one, encode_batch, scale_batch and transform_batch are its
+    methods. model may be None while the pipeline is being fitted.
+    """
+
+    def __init__(self, feature_cols, categories, mean, scale, numerical_cols, model=None):
+        self.features = FeatureEncoder(feature_cols, categories, mean, scale, numerical_cols)
+        self.model = None
+        if model is not None:
+            self.set_model(model)
+
+    @classmethod
+    def fit(cls, X, X_train, numerical_cols):
+        """Fits the preprocessing on raw training frames
+
+        Category codes are learned from every row of X, as LabelEncoder did
+        before the train/test split, and the scaler from the training split
+        only. The column order is X's. Columns that are neither numerical
+        nor numeric-typed are treated as categorical; other columns (such as
+        0/1 flags) pass through unchanged.
+        """
+        feature_cols = list(X.columns)
+        categorical_cols = [col for col in feature_cols
+                            if col not in numerical_cols and X[col].dtype == object]
+        label_encoders = {col: LabelEncoder().fit(X[col]) for col in categorical_cols}
+        scaler = StandardScaler().fit(X_train[list(numerical_cols)])
+        return cls.from_sklearn(feature_cols, label_encoders, scaler, numerical_cols)
+
+    @classmethod
+    def from_sklearn(cls, feature_cols, label_encoders, scaler, numerical_cols, model=None):
+        """Builds a pipeline from fitted LabelEncoders, a StandardScaler and optionally the model"""
+        features = FeatureEncoder.from_sklearn(feature_cols, label_encoders, scaler, numerical_cols)
+        return cls(features.feature_cols, features.valid_values, features.mean, features.scale,
+                   features.numerical_cols, model)
+
+    @property
+    def feature_cols(self):
+        return self.features.feature_cols
+
+    @property
+    def numerical_cols(self):
+        return self.features.numerical_cols
+
+    def set_model(self, model):
+        """Attaches the fitted model after checking it was fitted on this column layout"""
+        if model.n_features_in_ != len(self.feature_cols):
+            raise ValueError(f"Model expects {model.n_features_in_} features, "
+                             f"pipeline produces {len(self.feature_cols)}")
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and list(names) != self.feature_cols:
+            raise ValueError(f"Model was fitted on columns {list(names)}, pipeline produces {self.feature_cols}")
+        self.model = model
+
+    def transform_one(self, values):
+        return self.features.transform_one(values)
+
+    def encode_batch(self, rows):
+        return self.features.encode_batch(rows)
+
+    def scale_batch(self, X):
+        return self.features.scale_batch(X)
+
+    def transform_batch(self, rows):
+        return self.features.transform_batch(rows)
+
+    def transform_frame(self, df):
+        """Encodes and scales a raw DataFrame into model input, in the pipeline's column order
+
+        Raises UnknownCategoryError for the first categorical value that was
+        not seen during fitting, and NonFiniteValueError for the first NaN or
+        infinite numerical value. The frame itself is left untouched.
+        """
+        features = self.features
+        X = np.empty((len(df), len(features.feature_cols)), dtype=np.float64)
+        for idx, col in enumerate(features.feature_cols):
+            values = df[col]
+            codes = features.codes.get(col)
+            if codes is None:
+                X[:, idx] = values.to_numpy(dtype=np.float64)
+                continue
+            encoded = values.map(codes)
+            unknown = encoded.isna().to_numpy()
+            if unknown.any():
+                raise UnknownCategoryError(col, values[unknown].iloc[0], features.valid_values[col])
+            X[:, idx] = encoded.to_numpy(dtype=np.float64)
+        finite = np.isfinite(X)
+        if not finite.all():
+            row, idx = np.argwhere(~finite)[0]
+            raise NonFiniteValueError(features.feature_cols[idx], X[row, idx])
+        return features.scale_batch(X)
+
+    def predict_one(self, values):
+        """Returns (prediction, probability of class 1) for one raw record"""
+        proba = self.model.predict_proba(self.transform_one(values))[0]
+        return bool(self.model.classes_[np.argmax(proba)]), float(proba[1])
+
+    def __getstate__(self):
+        # The encoder's per-thread buffers are not picklable; store its parameters instead
+        features = self.features
+        return {
+            'format_version': PIPELINE_FORMAT_VERSION,
+            'feature_cols': features.feature_cols,
+            'categories': features.valid_values,
+            'mean': features.mean,
+            'scale': features.scale,
+            'numerical_cols': features.numerical_cols,
+            'model': self.model,
+        }
+
+    def __setstate__(self, state):
+        if state.get('format_version') != PIPELINE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported pipeline format version {state.get('format_version')}")
+        self.__init__(state['feature_cols'], state['categories'], state['mean'], state['scale'],
+                      state['numerical_cols'], state['model'])
+
+
+def save_pipeline(pipeline, path):
+    """Writes a fitted pipeline (including its model) to one joblib file"""
+    if pipeline.model is None:
+        raise ValueError("Cannot save a pipeline without a fitted model")
+    joblib.dump(pipeline, path)
+
+
+def load_pipeline(path):
+    """Reads a pipeline written by save_pipeline"""
+    pipeline = joblib.load(path)
+    if not isinstance(pipeline, FeaturePipeline):
+        raise ValueError(f"{path} does not hold a FeaturePipeline")
+    return pipeline
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import pandas as pd
 import numpy as np
-import joblib
 import os
 import logging
 import matplotlib.pyplot as plt
@@ -9,6 +8,18 @@ from matplotlib.figure import Figure
 import matplotlib
 matplotlib.use('Agg')  # For non-interactive mode
 import seaborn as sns
+import sys
+
+# Run as a script (python app/ai/predict_farmer_plan.py) only app/ai is on the path, not the backend directory
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.ai.explain import ContributionExplainer
+from app.ai.features import NonFiniteValueError, UnknownCategoryError
+from app.ai.forest import CompiledForest
+from app.ai.gauge import draw_gauge
+from app.ai.recommendations import FARMER_RULES
+from app.ai.specs import default_model_specs, load_spec_pipeline
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
@@ -17,24 +28,20 @@ logger = logging.getLogger(__name__)
 
 # Define paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.join(SCRIPT_DIR, 'models')
-MODEL_PATH = os.path.join(MODEL_DIR, 'farmer_approval_model.joblib')
-ENCODER_PATH = os.path.join(MODEL_DIR, 'farmer_label_encoders.joblib')
-SCALER_PATH = os.path.join(MODEL_DIR, 'farmer_scaler.joblib')
+SPEC = default_model_specs(SCRIPT_DIR)['farmer']
 PLOT_DIR = os.path.join(SCRIPT_DIR, 'plots')
 os.makedirs(PLOT_DIR, exist_ok=True)
 
 def load_model():
-    """Loads the trained model and preprocessors"""
+    """Loads the trained pipeline (model and preprocessors) and an explainer for its forest"""
     logger.info("Loading model and preprocessors")
     
     try:
-        model = joblib.load(MODEL_PATH)
-        label_encoders = joblib.load(ENCODER_PATH)
-        scaler = joblib.load(SCALER_PATH)
+        pipeline = load_spec_pipeline(SPEC)
+        explainer = ContributionExplainer(CompiledForest.from_sklearn(pipeline.model), pipeline.feature_cols)
         
         logger.info("Model and preprocessors loaded successfully")
-        return model, label_encoders, scaler
+        return pipeline, explainer
     except Exception as e:
         logger.error("Error loading model: %s", str(e))
         raise
@@ -60,132 +67,71 @@ def get_valid_input(prompt, input_type=float, options=None):
 
 def preprocess_input(years_experience, land_size, previous_loans, credit_score, 
                      annual_income, crop_diversity, has_irrigation, farm_type, 
-                     label_encoders, scaler):
-    """Preprocesses the input data for prediction"""
-    # Create DataFrame with input data
-    input_data = pd.DataFrame({
-        'years_experience': [years_experience],
-        'land_size_hectares': [land_size],
-        'previous_loans': [previous_loans],
-        'credit_score': [credit_score],
-        'annual_income': [annual_income],
-        'crop_diversity': [crop_diversity],
-        'has_irrigation': [has_irrigation],
-        'farm_type': [farm_type]
-    })
-    
-    # Encode categorical variables
-    if 'farm_type' in label_encoders:
-        try:
-            input_data['farm_type'] = label_encoders['farm_type'].transform(input_data['farm_type'])
-        except ValueError as e:
-            logger.error(f"Error encoding farm_type: {e}")
-            farm_types = list(label_encoders['farm_type'].classes_)
-            print(f"Invalid farm type. Valid options are: {', '.join(farm_types)}")
-            return None
-    
-    # Scale numerical features
-    numerical_cols = ['years_experience', 'land_size_hectares', 'previous_loans', 
-                      'credit_score', 'annual_income', 'crop_diversity']
-    
-    input_data[numerical_cols] = scaler.transform(input_data[numerical_cols])
+                     pipeline):
+    """Collects the raw input values, or returns None if the pipeline cannot encode them"""
+    farmer_data = {
+        'years_experience': years_experience,
+        'land_size_hectares': land_size,
+        'previous_loans': previous_loans,
+        'credit_score': credit_score,
+        'annual_income': annual_income,
+        'crop_diversity': crop_diversity,
+        'has_irrigation': has_irrigation,
+        'farm_type': farm_type
+    }
     
-    return input_data
+    try:
+        pipeline.transform_one(farmer_data)
+    except UnknownCategoryError as e:
+        logger.error(f"Error encoding {e.column}: {e}")
+        print(f"Invalid {e.column.replace('_', ' ')}. Valid options are: {', '.join(e.valid_values)}")
+        return None
+    except NonFiniteValueError as e:
+        logger.error(f"Error encoding {e.column}: {e}")
+        print(f"Invalid {e.column.replace('_', ' ')}. It must be a finite number")
+        return None
+    
+    return farmer_data
 
 def get_recommendations(prob, farmer_data):
     """Generate recommendations based on prediction probability"""
-    recommendations = []
-    
-    if prob < 0.3:
-        recommendations.append("Based on the provided information, your profile has a low approval probability.")
-        
-        # Specific recommendations based on data
-        if farmer_data['credit_score'] < 650:
-            recommendations.append("Your credit score is below the recommended threshold. Consider improving it before applying.")
-        
-        if farmer_data['years_experience'] < 3:
-            recommendations.append("Your farming experience is limited. Consider gaining more experience or partnering with experienced farmers.")
-        
-        if farmer_data['has_irrigation'] == 0:
-            recommendations.append("Installing irrigation systems can improve your farm's productivity and increase approval chances.")
-    
-    elif prob < 0.7:
-        recommendations.append("Your profile has a moderate approval probability.")
-        
-        if farmer_data['credit_score'] < 700:
-            recommendations.append("Improving your credit score could increase your approval chances.")
-        
-        if farmer_data['crop_diversity'] < 3:
-            recommendations.append("Consider diversifying your crops to reduce risk and improve approval probability.")
-        
-        recommendations.append("With some improvements, your application could have a higher chance of approval.")
-    
-    else:
-        recommendations.append("Your profile has a high approval probability.")
-        recommendations.append("Your experience and farm management practices show strong potential for success.")
-        
-        if farmer_data['annual_income'] < 50000:
-            recommendations.append("While your profile is strong, increasing farm revenue could help secure larger funding amounts.")
-    
-    return recommendations
+    return FARMER_RULES.recommend(prob, farmer_data)
 
-def plot_farmer_prediction(prob, farmer_data):
-    """Create visual representation of prediction with key factors"""
+def plot_farmer_prediction(prob, explanation):
+    """Create visual representation of prediction with the model's key factors"""
     plt.figure(figsize=(12, 6))
     
     # Gauge chart for probability
     plt.subplot(1, 2, 1)
-    gauge = np.linspace(0, 100, 100)
-    angle = np.linspace(-3*np.pi/4, 3*np.pi/4, 100)
-    x = np.cos(angle)
-    y = np.sin(angle)
-    
-    cmap = plt.cm.RdYlGn
-    color_norm = plt.Normalize(0, 100)
-    colors = cmap(color_norm(gauge))
-    
-    plt.scatter(x, y, c=colors, s=300, alpha=0.8)
+    draw_gauge(plt.gca(), prob)
     
-    # Add needle
     probability = prob * 100
-    needle_angle = -3*np.pi/4 + 3*np.pi/2 * (probability / 100)
-    needle_x = [0, 0.8 * np.cos(needle_angle)]
-    needle_y = [0, 0.8 * np.sin(needle_angle)]
-    plt.plot(needle_x, needle_y, 'k-', linewidth=4)
-    plt.plot([0], [0], 'ko', markersize=10)
-    
     plt.text(0, -0.2, f"{probability:.1f}%", ha='center', va='center', fontsize=16, fontweight='bold')
     plt.title("Approval Probability")
     plt.axis('equal')
     plt.axis('off')
     
-    # Key factors chart
+    # Key factors chart: how far each input moved the model's probability
     plt.subplot(1, 2, 2)
     
-    # Normalize factors to 0-1 scale for visualization
-    # These are simplistic normalizations - in production you'd use proper scaling
-    factors = {
-        'Experience': min(farmer_data['years_experience'] / 20, 1),  # Assume 20 years is max
-        'Credit': (farmer_data['credit_score'] - 500) / 300,  # Scale from 500-800
-        'Land Size': min(farmer_data['land_size_hectares'] / 15, 1),  # Assume 15 hectares is max
-        'Crop Diversity': min(farmer_data['crop_diversity'] / 6, 1),  # Assume 6 crops is max
-        'Income': min(farmer_data['annual_income'] / 100000, 1)  # Assume 100k is max
-    }
-    
-    # Create horizontal bar chart
-    factor_names = list(factors.keys())
-    factor_values = list(factors.values())
-    colors = ['#5cb85c' if v >= 0.7 else '#f0ad4e' if v >= 0.4 else '#d9534f' for v in factor_values]
+    contributions = explanation['contributions']
+    factor_names = sorted(contributions, key=lambda name: abs(contributions[name]))
+    factor_values = [contributions[name] * 100 for name in factor_names]
+    colors = ['#5cb85c' if v >= 0 else '#d9534f' for v in factor_values]
     
     y_pos = np.arange(len(factor_names))
     plt.barh(y_pos, factor_values, color=colors)
-    plt.yticks(y_pos, factor_names)
-    plt.xlim(0, 1)
-    plt.title('Key Factors (Relative Strength)')
+    plt.yticks(y_pos, [name.replace('_', ' ').title() for name in factor_names])
+    limit = max(max(abs(v) for v in factor_values), 1) * 1.3
+    plt.xlim(-limit, limit)
+    plt.axvline(0, color='black', linewidth=1)
+    plt.xlabel(f"Percentage points (baseline {explanation['base_value'] * 100:.1f}%)")
+    plt.title('Key Factors (Contribution to Probability)')
     
     # Add value labels
     for i, v in enumerate(factor_values):
-        plt.text(v + 0.05, i, f"{v:.2f}", va='center')
+        plt.text(v + (0.03 if v >= 0 else -0.03) * limit, i, f"{v:+.1f}",
+                 va='center', ha='left' if v >= 0 else 'right')
     
     plt.tight_layout()
     
@@ -198,31 +144,20 @@ def plot_farmer_prediction(prob, farmer_data):
     logger.info(f"Prediction visualization saved as {filename}")
     return filename
 
-def predict_approval(model, input_data):
-    """Predicts approval based on input data"""
+def predict_approval(pipeline, explainer, farmer_data):
+    """Predicts approval based on the raw input values and explains the prediction"""
     try:
-        # Get prediction probability
-        prob = model.predict_proba(input_data)[0][1]
+        prediction, prob = pipeline.predict_one(farmer_data)
+        explanation = explainer.explain(pipeline.transform_one(farmer_data)).as_dict(0)
         
-        # Make prediction
-        prediction = model.predict(input_data)[0]
-        
-        # Get recommendations
-        recommendations = get_recommendations(prob, {
-            'years_experience': input_data['years_experience'].iloc[0],
-            'land_size_hectares': input_data['land_size_hectares'].iloc[0],
-            'previous_loans': input_data['previous_loans'].iloc[0],
-            'credit_score': input_data['credit_score'].iloc[0],
-            'annual_income': input_data['annual_income'].iloc[0],
-            'crop_diversity': input_data['crop_diversity'].iloc[0],
-            'has_irrigation': input_data['has_irrigation'].iloc[0],
-            'farm_type': input_data['farm_type'].iloc[0]
-        })
+        # Recommendations are based on the raw values, not the scaled model input
+        recommendations = get_recommendations(prob, farmer_data)
         
         return {
-            'prediction': bool(prediction),
-            'probability': float(prob),
-            'recommendations': recommendations
+            'prediction': prediction,
+            'probability': prob,
+            'recommendations': recommendations,
+            'explanation': explanation
         }
     except Exception as e:
         logger.error("Error making prediction: %s", str(e))
@@ -247,7 +182,7 @@ def main():
     
     try:
         # Load model and preprocessors
-        model, label_encoders, scaler = load_model()
+        pipeline, explainer = load_model()
         
         # Get user input
         print("\n===== Farmer Loan Approval Prediction =====\n")
@@ -269,7 +204,7 @@ def main():
         has_irrigation = 1 if has_irrigation_input == 'yes' else 0
         
         # Get farm type
-        farm_types = list(label_encoders['farm_type'].classes_)
+        farm_types = pipeline.features.valid_values['farm_type']
         print(f"\nAvailable farm types: {', '.join(farm_types)}")
         farm_type = get_valid_input("Farm type: ", str, farm_types)
         
@@ -277,7 +212,7 @@ def main():
         input_data = preprocess_input(
             years_experience, land_size, previous_loans, credit_score, 
             annual_income, crop_diversity, has_irrigation, farm_type,
-            label_encoders, scaler
+            pipeline
         )
         
         if input_data is None:
@@ -285,7 +220,7 @@ def main():
             return
         
         # Make prediction
-        result = predict_approval(model, input_data)
+        result = predict_approval(pipeline, explainer, input_data)
         
         # Display result
         print("\n===== Prediction Result =====")
@@ -295,19 +230,7 @@ def main():
         show_probability_bar(result['probability'])
         
         # Generate visualization
-        plot_file = plot_farmer_prediction(
-            result['probability'],
-            {
-                'years_experience': years_experience,
-                'land_size_hectares': land_size,
-                'previous_loans': previous_loans,
-                'credit_score': credit_score,
-                'annual_income': annual_income,
-                'crop_diversity': crop_diversity,
-                'has_irrigation': has_irrigation,
-                'farm_type': farm_type
-            }
-        )
+        plot_file = plot_farmer_prediction(result['probability'], result['explanation'])
         
         # Show recommendations
         print("\n===== Recommendations =====")
@@ -1,7 +1,5 @@
 #!/usr/bin/env python
 import pandas as pd
-import numpy as np
-import joblib
 import os
 import logging
 import matplotlib.pyplot as plt
@@ -11,6 +9,16 @@ matplotlib.use('Agg')  # For non-interactive mode
 import base64
 from io import BytesIO
 import seaborn as sns
+import sys
+
+# Run as a script (python app/ai/predict_plan.py) only app/ai is on the path, not the backend directory
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.ai.features import NonFiniteValueError, UnknownCategoryError
+from app.ai.gauge import draw_gauge
+from app.ai.recommendations import FARM_PLAN_RULES
+from app.ai.specs import default_model_specs, load_spec_pipeline
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
@@ -19,24 +27,19 @@ logger = logging.getLogger(__name__)
 
 # Define paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.join(SCRIPT_DIR, 'models')
-MODEL_PATH = os.path.join(MODEL_DIR, 'farm_plan_model.joblib')
-ENCODER_PATH = os.path.join(MODEL_DIR, 'farm_plan_encoders.joblib')
-SCALER_PATH = os.path.join(MODEL_DIR, 'farm_plan_scaler.joblib')
+SPEC = default_model_specs(SCRIPT_DIR)['farm_plan']
 PLOT_DIR = os.path.join(SCRIPT_DIR, 'plots')
 os.makedirs(PLOT_DIR, exist_ok=True)
 
 def load_models():
-    """Loads the trained model and preprocessors"""
+    """Loads the trained pipeline (model and preprocessors)"""
     logger.info("Loading model and preprocessors")
     
     try:
-        model = joblib.load(MODEL_PATH)
-        label_encoders = joblib.load(ENCODER_PATH)
-        scaler = joblib.load(SCALER_PATH)
+        pipeline = load_spec_pipeline(SPEC)
         
         logger.info("Model and preprocessors loaded successfully")
-        return model, label_encoders, scaler
+        return pipeline
     except Exception as e:
         logger.error("Error loading model: %s", str(e))
         raise
@@ -51,28 +54,20 @@ def get_valid_input(prompt, options=None):
         else:
             return value.lower()
 
-def preprocess_input(data, label_encoders, scaler):
-    """Preprocesses the input data"""
-    # Convert input to DataFrame
-    input_df = pd.DataFrame([data])
-    
-    # Encode categorical variables
-    for col, encoder in label_encoders.items():
-        if col in input_df.columns:
-            try:
-                input_df[col] = encoder.transform([input_df[col].iloc[0]])
-            except ValueError:
-                # Handle unknown categories
-                print(f"Warning: Unknown category '{input_df[col].iloc[0]}' for {col}.")
-                print(f"Available categories: {encoder.classes_}")
-                return None
-    
-    # Scale numerical features
-    numerical_cols = ['area_hectares', 'yield_per_hectare']
-    if all(col in input_df.columns for col in numerical_cols):
-        input_df[numerical_cols] = scaler.transform(input_df[numerical_cols])
-    
-    return input_df
+def preprocess_input(data, pipeline):
+    """Checks that the pipeline can encode the input, returning the raw values or None"""
+    try:
+        pipeline.transform_one(data)
+    except UnknownCategoryError as e:
+        # Handle unknown categories
+        print(f"Warning: Unknown category '{e.value}' for {e.column}.")
+        print(f"Available categories: {e.valid_values}")
+        return None
+    except NonFiniteValueError as e:
+        print(f"Warning: {e.column} must be a finite number, got {e.value}.")
+        return None
+    
+    return data
 
 def show_probability_bar(prob):
     """Displays probability as a colored progress bar"""
@@ -93,25 +88,9 @@ def plot_probability(prob):
     
     # Create gauge chart
     plt.subplot(1, 2, 1)
-    gauge = np.linspace(0, 100, 100)
-    angle = np.linspace(-3*np.pi/4, 3*np.pi/4, 100)
-    x = np.cos(angle)
-    y = np.sin(angle)
-    
-    cmap = plt.cm.RdYlGn
-    color_norm = plt.Normalize(0, 100)
-    colors = cmap(color_norm(gauge))
+    draw_gauge(plt.gca(), prob)
     
-    plt.scatter(x, y, c=colors, s=300, alpha=0.8)
-    
-    # Add needle
     probability = prob * 100
-    needle_angle = -3*np.pi/4 + 3*np.pi/2 * (probability / 100)
-    needle_x = [0, 0.8 * np.cos(needle_angle)]
-    needle_y = [0, 0.8 * np.sin(needle_angle)]
-    plt.plot(needle_x, needle_y, 'k-', linewidth=4)
-    plt.plot([0], [0], 'ko', markersize=10)
-    
     plt.text(0, -0.2, f"{probability:.1f}%", ha='center', va='center', fontsize=16, fontweight='bold')
     plt.axis('equal')
     plt.axis('off')
@@ -139,57 +118,17 @@ def plot_probability(prob):
 
 def get_recommendation(prob, data):
     """Provides recommendations based on prediction probability"""
-    recommendations = []
-    
-    if prob < 0.3:
-        recommendations.append("Your farm plan has a low approval probability.")
-        
-        # Provide specific recommendations based on data
-        if data['yield_per_hectare'] < 3:
-            recommendations.append("Consider crops with higher yield potential for your land area.")
-        
-        if data['crop_type'] == 'cotton' and data['climate'] == 'arid':
-            recommendations.append("Cotton in arid regions often requires extensive irrigation. Consider alternative crops or improved irrigation systems.")
-        
-        recommendations.append("Review your farm plan and consider consulting with an agricultural extension officer.")
-    
-    elif prob < 0.7:
-        recommendations.append("Your farm plan has a moderate approval probability.")
-        
-        if data['soil_type'] == 'sandy' and data['yield_per_hectare'] < 5:
-            recommendations.append("Sandy soils often require additional fertility management. Consider soil amendments or alternative crops.")
-        
-        recommendations.append("With some improvements, your plan could have a higher chance of approval.")
-    
-    else:
-        recommendations.append("Your farm plan has a high approval probability.")
-        recommendations.append("Continue with your current approach, which shows strong potential for success.")
-    
-    return recommendations
+    return FARM_PLAN_RULES.recommend(prob, data)
 
-def predict_approval(model, input_data):
-    """Predicts approval based on input data"""
+def predict_approval(pipeline, input_data):
+    """Predicts approval based on the raw input values"""
     try:
-        # Get prediction probability
-        prob = model.predict_proba(input_data)[0][1]
-        
-        # Convert input data back to unprocessed form for recommendations
-        # This is a simplified version; in a real app you'd reverse the preprocessing
-        original_data = {
-            'crop_type': input_data.columns[0],  # Simplified
-            'soil_type': input_data.columns[1],  # Simplified
-            'climate': input_data.columns[2],    # Simplified
-            'area_hectares': input_data.iloc[0, 3],
-            'yield_per_hectare': input_data.iloc[0, 4]
-        }
-        
-        # Make prediction
-        prediction = model.predict(input_data)[0]
+        prediction, prob = pipeline.predict_one(input_data)
         
         return {
-            'prediction': bool(prediction),
-            'probability': float(prob),
-            'recommendations': get_recommendation(prob, original_data)
+            'prediction': prediction,
+            'probability': prob,
+            'recommendations': get_recommendation(prob, input_data)
         }
     except Exception as e:
         logger.error("Error making prediction: %s", str(e))
@@ -201,15 +140,15 @@ def main():
     
     try:
         # Load model and preprocessors
-        model, label_encoders, scaler = load_models()
+        pipeline = load_models()
         
         # Get user input
         print("\n===== Farm Plan Approval Prediction =====\n")
         
         # Define options for categorical variables
-        crop_options = list(label_encoders['crop_type'].classes_)
-        soil_options = list(label_encoders['soil_type'].classes_)
-        climate_options = list(label_encoders['climate'].classes_)
+        crop_options = pipeline.features.valid_values['crop_type']
+        soil_options = pipeline.features.valid_values['soil_type']
+        climate_options = pipeline.features.valid_values['climate']
         
         print(f"Available crop types: {', '.join(crop_options)}")
         crop_type = get_valid_input("Enter crop type: ", crop_options)
@@ -251,14 +190,14 @@ def main():
         }
         
         # Preprocess input
-        processed_input = preprocess_input(input_data, label_encoders, scaler)
+        processed_input = preprocess_input(input_data, pipeline)
         
         if processed_input is None:
             print("Error processing input. Please try again with valid values.")
             return
         
         # Make prediction
-        result = predict_approval(model, processed_input)
+        result = predict_approval(pipeline, processed_input)
         
         # Display result
         print("\n===== Prediction Result =====")
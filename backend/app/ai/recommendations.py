@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Declarative recommendation rules.
+
+Each model has one ordered table of rules. A rule fires when the approval
+probability falls in its band and every one of its conditions on the raw
+(unencoded) features holds. The same table is evaluated for a single request
+or as boolean masks over a whole batch.
+"""
+import operator
+
+import numpy as np
+
+# Probability bands: low < 0.3 <= moderate < 0.7 <= high
+LOW_BAND_UPPER = 0.3
+MODERATE_BAND_UPPER = 0.7
+BANDS = ('low', 'moderate', 'high')
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+
+class Rule:
+    """A recommendation shown when the probability is in `band` and all conditions hold
+
+    Conditions are (column, operator, value) tuples, e.g. ('credit_score', '<', 650).
+    """
+
+    def __init__(self, band, message, *conditions):
+        if band not in BANDS:
+            raise ValueError(f"Unknown band '{band}'. Valid options are: {', '.join(BANDS)}")
+        for _, op, _ in conditions:
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator '{op}'. Valid options are: {', '.join(OPERATORS)}")
+        self.band = band
+        self.message = message
+        self.conditions = [(column, OPERATORS[op], value) for column, op, value in conditions]
+
+    def matches(self, features):
+        """Evaluates the conditions on scalars or element-wise on arrays"""
+        result = True
+        for column, op, value in self.conditions:
+            result = result & op(features[column], value)
+        return result
+
+
+def band_of(probability):
+    """Probability band of a single prediction"""
+    if probability < LOW_BAND_UPPER:
+        return 'low'
+    elif probability < MODERATE_BAND_UPPER:
+        return 'moderate'
+    return 'high'
+
+
+def band_masks(probabilities):
+    """Boolean mask per band over an array of probabilities"""
+    low = probabilities < LOW_BAND_UPPER
+    moderate = ~low & (probabilities < MODERATE_BAND_UPPER)
+    return {'low': low, 'moderate': moderate, 'high': ~low & ~moderate}
+
+
+class RecommendationRules:
+    """An ordered rule table; recommendations keep the table's order"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        if len(self.rules) > 63:
+            raise ValueError("A rule table supports at most 63 rules")
+        self.columns = sorted({column for rule in self.rules for column, _, _ in rule.conditions})
+
+        # Columns compared only against numbers are gathered as float64, the rest as Python objects
+        self.dtypes = {column: np.float64 for column in self.columns}
+        for rule in self.rules:
+            for column, _, value in rule.conditions:
+                if not isinstance(value, (int, float)):
+                    self.dtypes[column] = object
+
+    def recommend(self, probability, features):
+        """Recommendations for one prediction given its raw feature dict"""
+        band = band_of(probability)
+        return [rule.message for rule in self.rules if rule.band == band and rule.matches(features)]
+
+    def columns_from_rows(self, rows):
+        """Gathers the columns the rules read from a list of raw feature dicts"""
+        return {column: np.fromiter((row[column] for row in rows), dtype=dtype, count=len(rows))
+                for column, dtype in self.dtypes.items()}
+
+    def columns_from_encoded(self, X, encoder):
+        """Views the columns the rules read in an unscaled batch from FeatureEncoder.encode_batch
+
+        Categorical codes are mapped back to their raw values.
+        """
+        columns = {}
+        for column in self.columns:
+            values = X[:, encoder.feature_cols.index(column)]
+            if column in encoder.valid_values:
+                values = np.asarray(encoder.valid_values[column], dtype=object)[values.astype(np.intp)]
+            columns[column] = values
+        return columns
+
+    def recommend_batch(self, probabilities, columns):
+        """Recommendations for many predictions, one list per row
+
+        columns maps each column in self.columns to an array of raw values.
+        Every rule is evaluated once as a mask over the whole batch. Rows that
+        fire the same set of rules share one message list, so callers must not
+        modify the lists they get back.
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if len(probabilities) == 0:
+            return []
+
+        bands = band_masks(probabilities)
+
+        # Bit i of a row's key is set when rule i fired for that row
+        keys = np.zeros(len(probabilities), dtype=np.int64)
+        for index, rule in enumerate(self.rules):
+            keys |= (bands[rule.band] & rule.matches(columns)).astype(np.int64) << index
+
+        patterns, inverse = np.unique(keys, return_inverse=True)
+        messages = [[rule.message for index, rule in enumerate(self.rules) if int(pattern) >> index & 1]
+                    for pattern in patterns]
+        return [messages[pattern] for pattern in inverse.tolist()]
+
+
+FARMER_RULES = RecommendationRules([
+    Rule('low', "Based on the provided information, your profile has a low approval probability."),
+    Rule('low', "Your credit score is below the recommended threshold. Consider improving it before applying.",
+         ('credit_score', '<', 650)),
+    Rule('low', "Your farming experience is limited. Consider gaining more experience or partnering with experienced farmers.",
+         ('years_experience', '<', 3)),
+    Rule('low', "Installing irrigation systems can improve your farm's productivity and increase approval chances.",
+         ('has_irrigation', '==', 0)),
+
+    Rule('moderate', "Your profile has a moderate approval probability."),
+    Rule('moderate', "Improving your credit score could increase your approval chances.",
+         ('credit_score', '<', 700)),
+    Rule('moderate', "Consider diversifying your crops to reduce risk and improve approval probability.",
+         ('crop_diversity', '<', 3)),
+    Rule('moderate', "With some improvements, your application could have a higher chance of approval."),
+
+    Rule('high', "Your profile has a high approval probability."),
+    Rule('high', "Your experience and farm management practices show strong potential for success."),
+    Rule('high', "While your profile is strong, increasing farm revenue could help secure larger funding amounts.",
+         ('annual_income', '<', 50000)),
+])
+
+FARM_PLAN_RULES = RecommendationRules([
+    Rule('low', "Your farm plan has a low approval probability."),
+    Rule('low', "Consider crops with higher yield potential for your land area.",
+         ('yield_per_hectare', '<', 3)),
+    Rule('low', "Cotton in arid regions often requires extensive irrigation. Consider alternative crops or improved irrigation systems.",
+         ('crop_type', '==', 'cotton'), ('climate', '==', 'arid')),
+    Rule('low', "Review your farm plan and consider consulting with an agricultural extension officer."),
+
+    Rule('moderate', "Your farm plan has a moderate approval probability."),
+    Rule('moderate', "Sandy soils often require additional fertility management. Consider soil amendments or alternative crops.",
+         ('soil_type', '==', 'sandy'), ('yield_per_hectare', '<', 5)),
+    Rule('moderate', "With some improvements, your plan could have a higher chance of approval."),
+
+    Rule('high', "Your farm plan has a high approval probability."),
+    Rule('high', "Continue with your current approach, which shows strong potential for success."),
+])
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+Where each model's artifacts live, and loading them into model bundles.
+
+Training, the command-line tools and the server all find a model's files
+through its ModelSpec, and identify a trained model by the same content hash
+of those files, so an export written by training is recognised as current by
+the server.
+
+A bundle groups everything needed to serve one model: the compiled (or
+compact) forest, the feature encoder and a content-hash version, plus the
+fitted pipeline when it was loaded from joblib rather than from a
+memory-mapped export.
+"""
+import hashlib
+import logging
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ai.artifacts import (
+    ARTIFACT_FORMAT_VERSION, artifact_dir_for, export_forest, load_forest_export, read_export_meta
+)
+from app.ai.compact import COMPACT_FORMAT_VERSION, CompactForest, compact_dir_for, verify_compact_forest
+from app.ai.features import (
+    FARMER_FEATURE_COLS, FARMER_NUMERICAL_COLS,
+    FARM_PLAN_FEATURE_COLS, FARM_PLAN_NUMERICAL_COLS
+)
+from app.ai.forest import CompiledForest, verify_compiled_forest
+from app.ai.pipeline import FeaturePipeline, load_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSpec:
+    """Where a model's artifacts live and how its features are laid out
+
+    Training writes a single pipeline file; the separate model, encoders and
+    scaler files are the legacy layout, used only while no pipeline exists.
+    feature_cols and numerical_cols describe that legacy layout, since a
+    pipeline carries its own.
+    """
+
+    def __init__(self, name, models_dir, pipeline_file, model_file, encoders_file, scaler_file,
+                 feature_cols, numerical_cols, smoke_data_path=None):
+        self.name = name
+        self.models_dir = models_dir
+        self.pipeline_path = os.path.join(models_dir, pipeline_file)
+        self.model_path = os.path.join(models_dir, model_file)
+        self.encoders_path = os.path.join(models_dir, encoders_file)
+        self.scaler_path = os.path.join(models_dir, scaler_file)
+        self.feature_cols = list(feature_cols)
+        self.numerical_cols = list(numerical_cols)
+        self.smoke_data_path = smoke_data_path
+        self.artifact_dir = artifact_dir_for(self.model_path)
+        self.compact_dir = compact_dir_for(self.model_path)
+
+    @property
+    def legacy_paths(self):
+        return [self.model_path, self.encoders_path, self.scaler_path]
+
+    @property
+    def artifact_paths(self):
+        """The files a bundle is loaded from: the pipeline, or the legacy files if there is none"""
+        if os.path.exists(self.pipeline_path):
+            return [self.pipeline_path]
+        return self.legacy_paths
+
+    def artifacts_exist(self):
+        return all(os.path.exists(path) for path in self.artifact_paths)
+
+    def fingerprint(self):
+        """Cheap change detector: (mtime, size) of every artifact, or None if any is missing"""
+        try:
+            return tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in self.artifact_paths)
+        except FileNotFoundError:
+            return None
+
+
+def default_model_specs(ai_dir):
+    """Specs for the farmer approval and farm plan models under app/ai"""
+    models_dir = os.path.join(ai_dir, 'models')
+    datasets_dir = os.path.join(ai_dir, 'datasets')
+    return {
+        'farmer': ModelSpec(
+            'farmer', models_dir, 'farmer_approval_pipeline.joblib',
+            'farmer_approval_model.joblib', 'farmer_label_encoders.joblib', 'farmer_scaler.joblib',
+            FARMER_FEATURE_COLS, FARMER_NUMERICAL_COLS,
+            smoke_data_path=os.path.join(datasets_dir, 'farmer_data.csv')
+        ),
+        'farm_plan': ModelSpec(
+            'farm_plan', models_dir, 'farm_plan_pipeline.joblib',
+            'farm_plan_model.joblib', 'farm_plan_encoders.joblib', 'farm_plan_scaler.joblib',
+            FARM_PLAN_FEATURE_COLS, FARM_PLAN_NUMERICAL_COLS,
+            smoke_data_path=os.path.join(datasets_dir, 'farm_data.csv')
+        ),
+    }
+
+
+def artifact_version(*paths):
+    """Short content hash identifying a model bundle"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def load_spec_pipeline(spec):
+    """Loads the spec's fitted pipeline, assembling it from the legacy files if training has not written one"""
+    if os.path.exists(spec.pipeline_path):
+        return load_pipeline(spec.pipeline_path)
+    return FeaturePipeline.from_sklearn(spec.feature_cols, joblib.load(spec.encoders_path),
+                                        joblib.load(spec.scaler_path), spec.numerical_cols,
+                                        model=joblib.load(spec.model_path))
+
+
+class ModelBundle:
+    """One loaded, immutable version of a model and its preprocessors
+
+    pipeline (and with it the sklearn model) is only set for bundles loaded
+    from joblib; smoke is the (X, probabilities) pair recorded when an export
+    was written. predictor answers predictions: the forest itself, or an
+    exact probability surface built from it. explainer, when set, breaks
+    predictions down into per-feature contributions.
+    """
+
+    def __init__(self, spec, version, features, forest, pipeline=None, smoke=None):
+        self.spec = spec
+        self.name = spec.name
+        self.version = version
+        self.loaded_at = time.time()
+        self.features = features
+        self.forest = forest
+        self.predictor = forest
+        self.explainer = None
+        self.pipeline = pipeline
+        self.model = pipeline.model if pipeline is not None else None
+        self.smoke = smoke
+
+
+def load_bundle(spec):
+    """Loads a model bundle from the spec's joblib artifacts"""
+    # Hash first so the version always describes the bytes that were loaded
+    version = artifact_version(*spec.artifact_paths)
+    pipeline = load_spec_pipeline(spec)
+    return ModelBundle(spec, version, pipeline.features, CompiledForest.from_sklearn(pipeline.model),
+                       pipeline=pipeline)
+
+
+def load_mmap_bundle(spec):
+    """Loads a model bundle from its memory-mapped serving artifact
+
+    The artifact is (re)exported from the joblib files first when it is
+    missing or was built from different joblib bytes, so the joblib files stay
+    the source of truth and every worker ends up mapping the same arrays.
+    """
+    return _load_export_bundle(spec, spec.artifact_dir, CompiledForest, ARTIFACT_FORMAT_VERSION)
+
+
+def load_compact_bundle(spec):
+    """Loads a model bundle that serves from the memory-mapped compact forest
+
+    Exported like the mmap artifact. The training scripts export it too,
+    after checking it on the whole training set. Nothing is unpickled when
+    the export is current.
+    """
+    return _load_export_bundle(spec, spec.compact_dir, CompactForest, COMPACT_FORMAT_VERSION)
+
+
+def _load_export_bundle(spec, path, forest_type, format_version):
+    """Loads a bundle from the forest export at path, (re)exporting it first when it is missing or stale
+
+    A new export is validated against sklearn before it is written, and
+    records the smoke batch and sklearn's probabilities for it.
+    """
+    version = artifact_version(*spec.artifact_paths)
+    meta = read_export_meta(path, format_version)
+    if meta is None or meta['version'] != version:
+        logger.info("Exporting %s %s for version %s", spec.name, forest_type.__name__, version)
+        pipeline = load_spec_pipeline(spec)
+        bundle = ModelBundle(spec, version, pipeline.features, forest_type.from_sklearn(pipeline.model),
+                             pipeline=pipeline)
+        validate_bundle(bundle)
+        smoke_X = smoke_features(bundle)
+        smoke_proba = pipeline.model.predict_proba(smoke_X) if smoke_X is not None else None
+        export_forest(path, bundle.forest, bundle.features, version, format_version, smoke_X, smoke_proba)
+
+    forest, features, meta, smoke = load_forest_export(path, forest_type, format_version)
+    return ModelBundle(spec, meta['version'], features, forest, smoke=smoke)
+
+
+def smoke_features(bundle):
+    """Encodes the spec's smoke dataset, or returns None if it has none"""
+    spec = bundle.spec
+    if spec.smoke_data_path is None or not os.path.exists(spec.smoke_data_path):
+        return None
+    rows = pd.read_csv(spec.smoke_data_path)[bundle.features.feature_cols].to_dict('records')
+    return np.vstack([bundle.features.transform_one(row).copy() for row in rows])
+
+
+def validate_bundle(bundle):
+    """Smoke-tests a bundle on its training dataset before it is allowed to serve
+
+    Checks that every row encodes, that the compiled or compact forest agrees
+    exactly with sklearn (or, for a memory-mapped export, with the
+    probabilities sklearn gave at export time) and that the probabilities are
+    well formed.
+    """
+    spec = bundle.spec
+    X = smoke_features(bundle)
+    if X is None:
+        logger.warning("No smoke dataset for %s, skipping validation", spec.name)
+        return
+
+    if bundle.model is not None:
+        verify = verify_compact_forest if isinstance(bundle.forest, CompactForest) else verify_compiled_forest
+        verify(bundle.model, bundle.forest, X)
+    elif bundle.smoke is not None:
+        smoke_X, smoke_proba = bundle.smoke
+        if not np.array_equal(X, smoke_X):
+            raise ValueError(f"{spec.name} export encodes the smoke batch differently")
+        if not np.array_equal(bundle.forest.predict_proba(smoke_X), smoke_proba):
+            raise ValueError(f"{spec.name} export disagrees with sklearn on the smoke batch")
+
+    _, probabilities = bundle.forest.predict(X)
+    if not np.all(np.isfinite(probabilities)) or not np.allclose(probabilities.sum(axis=1), 1.0):
+        raise ValueError(f"{spec.name} model produced invalid probabilities on the smoke batch")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+Precomputed probability surfaces for forests over few, coarse inputs.
+
+A random forest is piecewise constant: its output only changes where an input
+crosses one of the split thresholds. For a model whose categorical inputs
+have few values and whose numerical inputs have few distinct thresholds, the
+exact probabilities can be tabulated once per category combination over the
+grid of threshold cells. Serving a row is then one binary search per
+numerical input and an array lookup, with no tree traversal.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+# Rows evaluated per forest pass while tabulating a surface
+BUILD_CHUNK_ROWS = 65536
+
+
+def _cell_representatives(thresholds):
+    """One float32 input inside each threshold cell
+
+    Cell i holds the inputs x with thresholds[i - 1] < x <= thresholds[i]
+    (the last cell is everything above the largest threshold), matching the
+    trees' float32 `x <= threshold` test. A cell that contains no float32
+    value is never looked up, so its representative does not matter.
+    """
+    below = thresholds.astype(np.float32)
+    rounded_up = below.astype(np.float64) > thresholds
+    below[rounded_up] = np.nextafter(below[rounded_up], np.float32(-np.inf))
+    above = np.nextafter(np.float32(thresholds[-1]), np.float32(np.inf)) if len(thresholds) else np.float32(0)
+    if len(thresholds) and np.float64(above) <= thresholds[-1]:
+        above = np.nextafter(above, np.float32(np.inf))
+    return np.append(below, above)
+
+
+class ProbabilitySurface:
+    """Exact lookup table of a forest's class probabilities
+
+    `proba` has one axis per categorical feature (indexed by code), one axis
+    per numerical feature (indexed by threshold cell) and a final class axis.
+    """
+
+    def __init__(self, n_features, categorical_idx, numerical_idx, thresholds, proba, classes):
+        self.n_features = n_features
+        self.categorical_idx = np.asarray(categorical_idx, dtype=np.intp)
+        self.numerical_idx = np.asarray(numerical_idx, dtype=np.intp)
+        self.thresholds = [np.asarray(t, dtype=np.float64) for t in thresholds]
+        self.proba = proba
+        self.classes = classes
+        self._flat_proba = proba.reshape(-1, proba.shape[-1])
+
+        # Plain-Python copies for the single-row path, where NumPy call overhead dominates
+        shape = proba.shape[:-1]
+        strides = [int(np.prod(shape[axis + 1:])) for axis in range(len(shape))]
+        n_categorical = len(self.categorical_idx)
+        self._categorical_axes = list(zip(self.categorical_idx.tolist(), strides[:n_categorical]))
+        self._numerical_axes = [(idx, t.tolist(), stride) for idx, t, stride
+                                in zip(self.numerical_idx.tolist(), self.thresholds, strides[n_categorical:])]
+
+    @classmethod
+    def from_forest(cls, forest, features, max_cells):
+        """Tabulates a forest over every category combination and threshold cell
+
+        `features` is the model's FeatureEncoder, which says which columns are
+        categorical and how many codes each has.
+        """
+        n_features = len(features.feature_cols)
+        categorical_idx = [idx for idx, col in enumerate(features.feature_cols) if col in features.codes]
+        numerical_idx = [idx for idx in range(n_features) if idx not in categorical_idx]
+
+        thresholds = [forest.split_thresholds(idx) for idx in numerical_idx]
+
+        axes = [np.arange(len(features.codes[features.feature_cols[idx]]), dtype=np.float32)
+                for idx in categorical_idx]
+        axes += [_cell_representatives(t) for t in thresholds]
+        shape = tuple(len(axis) for axis in axes)
+        n_cells = int(np.prod(shape))
+        if n_cells > max_cells:
+            raise ValueError(f"Probability surface would need {n_cells} cells (limit {max_cells})")
+
+        # Evaluate the forest once at a representative input of every cell
+        order = categorical_idx + numerical_idx
+        proba = np.empty((n_cells, len(forest.classes)), dtype=np.float64)
+        for start in range(0, n_cells, BUILD_CHUNK_ROWS):
+            cells = np.unravel_index(np.arange(start, min(start + BUILD_CHUNK_ROWS, n_cells)), shape)
+            X = np.empty((len(cells[0]), n_features), dtype=np.float32)
+            for axis, idx in enumerate(order):
+                X[:, idx] = axes[axis][cells[axis]]
+            proba[start:start + len(X)] = forest.predict_proba(X)
+
+        return cls(n_features, categorical_idx, numerical_idx, thresholds,
+                   proba.reshape(shape + (len(forest.classes),)), forest.classes)
+
+    @property
+    def n_cells(self):
+        return int(np.prod(self.proba.shape[:-1]))
+
+    @property
+    def nbytes(self):
+        return self.proba.nbytes + sum(t.nbytes for t in self.thresholds)
+
+    def cells(self, X):
+        """Flat cell index of each row of an encoded, scaled feature matrix"""
+        X = np.asarray(X)
+        # Same float32 rounding the trees apply before comparing
+        numerical = X[:, self.numerical_idx].astype(np.float32).astype(np.float64)
+
+        index = [X[:, idx].astype(np.intp) for idx in self.categorical_idx]
+        index += [np.searchsorted(t, numerical[:, axis], side='left') for axis, t in enumerate(self.thresholds)]
+        return np.ravel_multi_index(index, self.proba.shape[:-1])
+
+    def _cell_one(self, row):
+        """cells() for a single row"""
+        cell = 0
+        for idx, stride in self._categorical_axes:
+            cell += int(row[idx]) * stride
+        for idx, thresholds, stride in self._numerical_axes:
+            # float32 rounding as in cells(); NaN sorts after every threshold there
+            value = float(np.float32(row[idx]))
+            cell += (len(thresholds) if value != value else bisect_left(thresholds, value)) * stride
+        return cell
+
+    def predict_proba(self, X):
+        """Class probabilities, identical to the forest's predict_proba"""
+        if len(X) == 1:
+            return self._flat_proba[[self._cell_one(X[0])]]
+        return self._flat_proba[self.cells(X)]
+
+    def predict(self, X):
+        """Returns (decisions, probabilities) without traversing any tree"""
+        proba = self.predict_proba(X)
+        return self.classes.take(np.argmax(proba, axis=1)), proba
+
+
+def verify_surface(forest, surface, X, seed=0):
+    """Raises AssertionError unless the surface matches the forest exactly
+
+    Checks the given rows, and the same rows moved onto both sides of every
+    numerical threshold and the outermost cells, where an off-by-one cell
+    lookup would show. Both the batch and the single-row lookup are checked.
+    """
+    rng = np.random.default_rng(seed)
+    probes = [np.asarray(X, dtype=np.float64)]
+
+    for axis, idx in enumerate(surface.numerical_idx):
+        thresholds = surface.thresholds[axis]
+        if not len(thresholds):
+            continue
+        edges = np.concatenate([
+            _cell_representatives(thresholds)[:-1],
+            np.nextafter(thresholds.astype(np.float32), np.float32(np.inf)),
+            [-np.inf, np.inf, np.nan],
+        ]).astype(np.float64)
+        rows = probes[0][rng.integers(0, len(probes[0]), len(edges))].copy()
+        rows[:, idx] = edges
+        probes.append(rows)
+
+    probes = np.vstack(probes)
+    expected_decisions, expected = forest.predict(probes)
+    decisions, proba = surface.predict(probes)
+    if not np.array_equal(proba, expected, equal_nan=True):
+        raise AssertionError("Probability surface differs from the forest")
+    if not np.array_equal(decisions, expected_decisions):
+        raise AssertionError("Probability surface decisions differ from the forest")
+    for row, expected_row in zip(probes, expected):
+        if not np.array_equal(surface.predict_proba(row[np.newaxis]), expected_row[np.newaxis]):
+            raise AssertionError("Probability surface single-row lookup differs from the forest")
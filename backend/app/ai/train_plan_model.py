@@ -3,11 +3,19 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
-import joblib
 import os
 import logging
+import sys
+
+# Run as a script (python app/ai/train_plan_model.py) only app/ai is on the path, not the backend directory
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.ai.compact import CompactForest, export_compact, verify_compact_forest
+from app.ai.features import FARM_PLAN_NUMERICAL_COLS
+from app.ai.pipeline import FeaturePipeline, save_pipeline
+from app.ai.specs import artifact_version, default_model_specs
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
@@ -17,10 +25,10 @@ logger = logging.getLogger(__name__)
 # Define paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(SCRIPT_DIR, 'datasets', 'farm_data.csv')
-MODEL_DIR = os.path.join(SCRIPT_DIR, 'models')
-MODEL_PATH = os.path.join(MODEL_DIR, 'farm_plan_model.joblib')
-ENCODER_PATH = os.path.join(MODEL_DIR, 'farm_plan_encoders.joblib')
-SCALER_PATH = os.path.join(MODEL_DIR, 'farm_plan_scaler.joblib')
+SPEC = default_model_specs(SCRIPT_DIR)['farm_plan']
+MODEL_DIR = SPEC.models_dir
+PIPELINE_PATH = SPEC.pipeline_path
+COMPACT_PATH = SPEC.compact_dir
 
 def load_data():
     """Load and prepare dataset for training"""
@@ -42,32 +50,18 @@ def preprocess_data(df):
     X = df.drop('approved', axis=1).copy()
     y = df['approved'].copy()
     
-    # Initialize encoders dictionary
-    label_encoders = {}
-    
-    # Categorical columns
-    cat_cols = ['crop_type', 'soil_type', 'climate']
-    
-    # Encode categorical variables
-    for col in cat_cols:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col])
-        label_encoders[col] = le
-    
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
     
-    # Normalize numerical features
-    scaler = StandardScaler()
-    numerical_cols = ['area_hectares', 'yield_per_hectare']
-    
-    X_train[numerical_cols] = scaler.fit_transform(X_train[numerical_cols])
-    X_test[numerical_cols] = scaler.transform(X_test[numerical_cols])
+    # Fit the categorical codes and scaler once, then transform both splits with the same pipeline
+    pipeline = FeaturePipeline.fit(X, X_train, FARM_PLAN_NUMERICAL_COLS)
+    X_train = pd.DataFrame(pipeline.transform_frame(X_train), columns=pipeline.feature_cols, index=X_train.index)
+    X_test = pd.DataFrame(pipeline.transform_frame(X_test), columns=pipeline.feature_cols, index=X_test.index)
     
     logger.info("Data preprocessing completed")
-    return X_train, X_test, y_train, y_test, label_encoders, scaler
+    return X_train, X_test, y_train, y_test, pipeline
 
 def train_model(X_train, y_train, X_test, y_test):
     """Train the Random Forest model"""
@@ -100,22 +94,27 @@ def train_model(X_train, y_train, X_test, y_test):
     
     return model
 
-def save_model(model, label_encoders, scaler):
-    """Save the trained model and preprocessors"""
+def save_model(model, pipeline):
+    """Save the trained model together with its preprocessing as one pipeline"""
     # Create model directory if it doesn't exist
     os.makedirs(MODEL_DIR, exist_ok=True)
     
-    logger.info("Saving model to %s", MODEL_PATH)
-    joblib.dump(model, MODEL_PATH)
-    
-    logger.info("Saving label encoders to %s", ENCODER_PATH)
-    joblib.dump(label_encoders, ENCODER_PATH)
-    
-    logger.info("Saving scaler to %s", SCALER_PATH)
-    joblib.dump(scaler, SCALER_PATH)
+    pipeline.set_model(model)
+    logger.info("Saving pipeline to %s", PIPELINE_PATH)
+    save_pipeline(pipeline, PIPELINE_PATH)
     
     logger.info("Model and preprocessors saved successfully")
 
+def save_compact_model(pipeline, X):
+    """Export the forest in the compact serving layout after checking it against sklearn on X"""
+    model = pipeline.model
+    compact = CompactForest.from_sklearn(model)
+    verify_compact_forest(model, compact, X)
+    
+    logger.info("Saving compact forest to %s (%.1f KB for %d split nodes and %d leaves)",
+                COMPACT_PATH, compact.nbytes / 1024, compact.n_splits, compact.n_leaves)
+    export_compact(COMPACT_PATH, compact, pipeline.features, artifact_version(*SPEC.artifact_paths))
+
 def main():
     """Main function to execute the training process"""
     logger.info("Starting farm plan approval model training")
@@ -125,13 +124,14 @@ def main():
         df = load_data()
         
         # Preprocess data
-        X_train, X_test, y_train, y_test, label_encoders, scaler = preprocess_data(df)
+        X_train, X_test, y_train, y_test, pipeline = preprocess_data(df)
         
         # Train model
         model = train_model(X_train, y_train, X_test, y_test)
         
         # Save model
-        save_model(model, label_encoders, scaler)
+        save_model(model, pipeline)
+        save_compact_model(pipeline, pd.concat([X_train, X_test]))
         
         logger.info("Farm plan approval model training completed successfully")
         
@@ -1,15 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import firebase_admin
 from firebase_admin import credentials, firestore
-from typing import List, Optional
+from typing import List, Optional, Union
 import os
 from dotenv import load_dotenv
 
+from app.serving.pagination import (
+    NDJSON_MEDIA_TYPE, InvalidPageToken, InvalidProjection, ListingView, decode_page_token, encode_json,
+    json_array_chunks, listing_projection, ndjson_chunks, ordered_query, read_page,
+)
+
 # Load environment variables
 load_dotenv()
 
+# Farmers per page of GET /farmers when the client pages without asking for a size, and the largest size allowed
+FARMERS_PAGE_SIZE = int(os.getenv("FARMERS_PAGE_SIZE", "100"))
+FARMERS_PAGE_SIZE_MAX = int(os.getenv("FARMERS_PAGE_SIZE_MAX", "1000"))
+
 # Initialize FastAPI app
 app = FastAPI(title="Farmer Registration API")
 
@@ -71,6 +81,10 @@ class Farmer(FarmerBase):
     class Config:
         from_attributes = True
 
+class FarmerPage(BaseModel):
+    farmers: List[Farmer]
+    next_page_token: Optional[str] = None
+
 # API Endpoints
 @app.post("/register", response_model=Farmer)
 async def register_farmer(farmer: FarmerCreate):
@@ -82,37 +96,67 @@ async def register_farmer(farmer: FarmerCreate):
         
         # Add to Firestore
         doc_ref = db.collection("farmers").document()
-        doc_ref.set(farmer_data)
+        write_result = doc_ref.set(farmer_data)
         
-        # Get the created document
-        doc = doc_ref.get()
-        if not doc.exists:
-            raise HTTPException(status_code=500, detail="Failed to create farmer record")
-            
-        # Return the created farmer data
-        farmer_data["id"] = doc.id
-        farmer_data["created_at"] = doc.get("created_at").isoformat() if doc.get("created_at") else None
+        # The server timestamp resolves to the write's commit time, so no read-back is needed
+        farmer_data["id"] = doc_ref.id
+        farmer_data["created_at"] = write_result.update_time.isoformat()
         return farmer_data
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/farmers", response_model=List[Farmer])
-async def get_farmers():
+def farmer_record(doc):
+    farmer_data = doc.to_dict()
+    farmer_data["id"] = doc.id
+    farmer_data["created_at"] = farmer_data.get("created_at").isoformat() if farmer_data.get("created_at") else None
+    return farmer_data
+
+# Rows of the farmers table (GET /farmers?view=summary)
+FARMER_SUMMARY_VIEW = ListingView({
+    "name": "name",
+    "email": "email",
+    "farm_name": "farm_name",
+    "farm_type": "farm_type",
+    "funding_required": "funding_required",
+    "status": "status",
+    "created_at": "created_at",
+})
+
+@app.get("/farmers", response_model=Union[FarmerPage, List[Farmer]])
+async def get_farmers(page_size: Optional[int] = None, start_after: Optional[str] = None, stream: bool = False,
+                      fields: Optional[str] = None, view: str = "full"):
     try:
-        # Get all farmers from Firestore
-        farmers_ref = db.collection("farmers")
-        docs = farmers_ref.stream()
+        if page_size is not None and not 1 <= page_size <= FARMERS_PAGE_SIZE_MAX:
+            raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {FARMERS_PAGE_SIZE_MAX}")
+        try:
+            cursor = decode_page_token(start_after) if start_after else None
+            field_paths, transform = listing_projection(fields, view, FARMER_SUMMARY_VIEW, farmer_record)
+        except (InvalidPageToken, InvalidProjection) as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        farmers = []
-        for doc in docs:
-            farmer_data = doc.to_dict()
-            farmer_data["id"] = doc.id
-            farmer_data["created_at"] = farmer_data.get("created_at").isoformat() if farmer_data.get("created_at") else None
-            farmers.append(farmer_data)
-            
-        return farmers
+        # Stream every farmer as NDJSON, written as the documents arrive from Firestore
+        if stream:
+            docs = ordered_query(db.collection("farmers"), cursor, page_size, field_paths).stream()
+            return StreamingResponse(ndjson_chunks(docs, transform), media_type=NDJSON_MEDIA_TYPE)
+        
+        # Without page_size or start_after, every farmer as a bare array, as before pagination
+        if page_size is None and cursor is None:
+            docs = ordered_query(db.collection("farmers"), fields=field_paths).stream()
+            return StreamingResponse(json_array_chunks(docs, transform), media_type="application/json")
+        
+        # Get one page of farmers from Firestore, reading only the selected fields
+        farmers, next_page_token = read_page(
+            db.collection("farmers"), page_size or FARMERS_PAGE_SIZE, cursor, transform, field_paths)
+        page = {"farmers": farmers, "next_page_token": next_page_token}
+        
+        # Partial records are not Farmer models, so they skip response validation
+        if field_paths is not None:
+            return Response(encode_json(page), media_type="application/json")
+        return page
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,6 @@
+"""
+UniAgric Serving
+
+Runtime infrastructure for the prediction API: request batching, the
+bounded inference executor, result caching and in-process metrics.
+"""
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Micro-batching request coalescer.
+
+Concurrent single-row predictions are held for at most a few milliseconds and
+scored together in one batched inference call; each caller's future is then
+resolved with its own row of the result.
+"""
+import asyncio
+import time
+
+from app.serving.metrics import REGISTRY, SIZE_BUCKETS
+
+
+class MicroBatcher:
+    """Coalesces concurrent submit() calls into batched predict_batch() calls
+
+    predict_batch receives a list of items and must return a list of the same
+    length holding either the result for each item or an Exception instance,
+    which is raised to that item's caller only. If runner is given, batches
+    are executed through `await runner(predict_batch, items)` (e.g. a
+    BoundedExecutor.run) instead of on the event loop.
+    """
+
+    def __init__(self, name, predict_batch, max_batch_size=64, max_wait_ms=2.0,
+                 runner=None, registry=REGISTRY):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.name = name
+        self.predict_batch = predict_batch
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        labels = {'model': name}
+        self.queue_wait = registry.histogram(
+            'predict_coalesce_queue_wait_seconds',
+            "Time a request waited in the coalescing queue before its batch ran", labels)
+        self.batch_size = registry.histogram(
+            'predict_coalesce_batch_size',
+            "Number of requests scored per coalesced batch", labels, buckets=SIZE_BUCKETS)
+
+    async def submit(self, item):
+        """Queues one item and waits for its row of the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Hands everything queued so far to a batch task"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, items):
+        if self.runner is not None:
+            return await self.runner(self.predict_batch, items)
+        return self.predict_batch(items)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_wait.observe(started - enqueued)
+        self.batch_size.observe(len(batch))
+
+        try:
+            results = await self._execute([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            # Callers that went away (e.g. client disconnects) have cancelled futures
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Bounded LRU cache with a per-entry TTL.
+
+Used in front of the prediction endpoints, where the cache is tied to a model
+version: switching to a new version drops every entry so predictions from an
+old model are never served.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from app.serving.metrics import REGISTRY
+
+
+def estimate_size(obj):
+    """Approximate memory footprint of a cached key or value in bytes"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key) + estimate_size(value) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(estimate_size(item) for item in obj)
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a maximum entry count and a TTL"""
+
+    def __init__(self, name, max_entries, ttl_seconds, registry=REGISTRY):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.version = None
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        labels = {'cache': name}
+        self.hits = registry.counter('cache_hits_total', "Cache lookups served from the cache", labels)
+        self.misses = registry.counter('cache_misses_total', "Cache lookups that missed or had expired", labels)
+        self.evictions = registry.counter('cache_evictions_total', "Entries evicted to respect the size bound", labels)
+        registry.gauge('cache_entries', "Entries currently cached", labels).set_function(lambda: len(self._entries))
+        registry.gauge('cache_memory_bytes', "Approximate memory held by cached entries", labels).set_function(
+            lambda: self._bytes)
+        registry.gauge('cache_hit_ratio', "Fraction of lookups served from the cache", labels).set_function(
+            self.hit_ratio)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def hit_ratio(self):
+        lookups = self.hits.value + self.misses.value
+        return self.hits.value / lookups if lookups else 0.0
+
+    def set_version(self, version):
+        """Drops all entries when the version they were computed with changes"""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self._bytes = 0
+                self.version = version
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._entries[key]
+                self._bytes -= size
+
+        self.misses.inc()
+        return None
+
+    def put(self, key, value, version=None):
+        """Caches value, unless it was computed by a version other than the current one"""
+        if not self.enabled:
+            return
+
+        size = estimate_size(key) + estimate_size(value)
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions.inc()
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
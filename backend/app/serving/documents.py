@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Read-through cache of Firestore documents.
+
+Dashboards poll the same farmers again and again, and every poll used to be
+a Firestore round-trip. DocumentCache keeps recently read documents in a
+bounded LRUCache with a TTL. The server's own writes invalidate the written
+document, so a worker always reads back what it wrote. With a snapshot
+listener, writes from other workers and services invalidate it too;
+without one, they are seen within one TTL.
+
+A read that overlaps an invalidation of the same cache is not stored, so a
+document read just before a write cannot outlive that write in the cache.
+"""
+import logging
+import threading
+
+from app.serving.cache import LRUCache
+from app.serving.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Snapshot changes that make a cached copy stale (new documents were never cached)
+STALE_CHANGE_TYPES = ('MODIFIED', 'REMOVED')
+
+
+class DocumentCache:
+    """Read-through cache in front of document(doc_id).get() for one collection"""
+
+    def __init__(self, collection, max_entries, ttl_seconds, registry=REGISTRY):
+        self.collection = collection
+        self.cache = LRUCache(f"{collection.id}_document", max_entries, ttl_seconds, registry)
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self._watch = None
+
+        self.listener_invalidations = registry.counter(
+            'document_cache_listener_invalidations_total',
+            "Cached documents invalidated by the Firestore snapshot listener", {'cache': self.cache.name})
+
+    @property
+    def enabled(self):
+        return self.cache.enabled
+
+    def get(self, doc_id):
+        """Document data, or None if it does not exist
+
+        The returned dict is shared with the cache and must not be modified.
+        """
+        data = self.cache.get(doc_id)
+        if data is not None:
+            return data
+
+        with self._lock:
+            invalidations = self._invalidations
+        doc = self.collection.document(doc_id).get()
+        if not doc.exists:
+            return None
+
+        data = doc.to_dict()
+        with self._lock:
+            # Only store what was read if nothing was invalidated meanwhile
+            if invalidations == self._invalidations:
+                self.cache.put(doc_id, data)
+        return data
+
+    def invalidate(self, doc_id):
+        """Drops a document after it was written"""
+        with self._lock:
+            self._invalidations += 1
+            self.cache.invalidate(doc_id)
+
+    def listen(self):
+        """Invalidates documents changed anywhere, through a snapshot listener on the collection
+
+        The listener's first snapshot reads every document of the collection
+        once; after that only changes are sent.
+        """
+        if self._watch is None:
+            self._watch = self.collection.on_snapshot(self._on_snapshot)
+            logger.info(f"Listening for changes to {self.collection.id} to invalidate cached documents")
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, snapshot, changes, read_time):
+        # Runs on the listener's own thread
+        for change in changes:
+            if change.type.name in STALE_CHANGE_TYPES:
+                self.invalidate(change.document.id)
+                self.listener_invalidations.inc()
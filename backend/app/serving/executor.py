@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Bounded executor for CPU-bound inference.
+
+Runs model work on a fixed-size thread pool so the asyncio event loop stays
+free for other requests. Work beyond the pool size waits in a bounded queue;
+once that is full, new work is rejected immediately instead of piling up.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.serving.metrics import REGISTRY
+
+
+class ExecutorFullError(RuntimeError):
+    """Raised when the executor's queue is full and work is rejected"""
+
+
+class BoundedExecutor:
+    """A thread pool that accepts at most max_workers + max_queue jobs at once"""
+
+    def __init__(self, name, max_workers, max_queue, registry=REGISTRY):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue < 0:
+            raise ValueError("max_queue must not be negative")
+
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.capacity = max_workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+        labels = {'executor': name}
+        self.inflight = registry.gauge(
+            'executor_inflight_jobs', "Jobs running or queued on the executor", labels)
+        self.inflight.set_function(lambda: self._inflight)
+        self.rejected = registry.counter(
+            'executor_rejected_total', "Jobs rejected because the executor queue was full", labels)
+        self.queue_wait = registry.histogram(
+            'executor_queue_wait_seconds', "Time jobs waited for a free worker", labels)
+
+    def _timed(self, enqueued, fn, args):
+        self.queue_wait.observe(time.perf_counter() - enqueued)
+        return fn(*args)
+
+    def _release(self, future):
+        with self._lock:
+            self._inflight -= 1
+
+    async def run(self, fn, *args):
+        """Runs fn(*args) on the pool, raising ExecutorFullError if no slot is free
+
+        A job holds its slot until it has actually finished (or was cancelled
+        before it started): cancelling the awaiting task does not stop a job
+        that is already running on a worker, so the slot is released by the
+        job's own future rather than by the caller.
+        """
+        with self._lock:
+            if self._inflight >= self.capacity:
+                self.rejected.inc()
+                raise ExecutorFullError(f"{self.name} executor is at capacity ({self.capacity} jobs)")
+            self._inflight += 1
+
+        try:
+            future = self._executor.submit(self._timed, time.perf_counter(), fn, args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
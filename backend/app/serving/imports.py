@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+"""
+Bulk imports of Firestore documents from CSV or NDJSON files.
+
+An import is read from the spooled upload one row at a time and handled in
+batches: each batch is validated, prepared and stored with one Firestore
+batched write, and several batches can be committing at once. The server
+holds only the batches in flight, never the whole file, and a file of
+thousands of rows costs a few dozen commits instead of a request and a write
+per row.
+
+Problems with the file as a whole (unknown format, text that is not UTF-8,
+a CSV header without the required columns) are found by check_import_file
+before anything is written. Problems with single rows are reported per row:
+each row is created, invalid (with its validation errors) or failed (its
+batch did not commit). A batch's results are encoded as soon as it commits,
+and the report keeps only that JSON text, a fraction of the size of the rows,
+and sends it piece by piece.
+"""
+import asyncio
+import codecs
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+
+from pydantic import BaseModel, ValidationError
+
+from app.serving.pagination import encode_json
+
+# Most writes Firestore accepts in one batched write
+MAX_BATCH_WRITES = 500
+
+FORMAT_MEDIA_TYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+FORMAT_SUFFIXES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# The encoding check reads the file in pieces of this size
+CHECK_PIECE_BYTES = 1024 * 1024
+
+ROW_STATUSES = ('created', 'invalid', 'failed')
+
+
+class InvalidImport(ValueError):
+    """Raised for an import file that cannot be read at all, before any row is written"""
+
+
+class ImportRow:
+    """One row of an import file: its line, the parsed data, the validated model or the errors,
+    and the document it is stored as"""
+
+    __slots__ = ('line', 'data', 'record', 'errors', 'doc_ref', 'document')
+
+    def __init__(self, line, data=None, errors=None):
+        self.line = line
+        self.data = data
+        self.record = None
+        self.errors = errors
+        self.doc_ref = None
+        self.document = None
+
+
+def import_format(filename, content_type, requested=None):
+    """'csv' or 'ndjson': the requested format, else the one the file name or content type implies"""
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise InvalidImport(f"Unknown import format: {requested}. Use one of {', '.join(IMPORT_FORMATS)}")
+        return requested
+
+    suffix = os.path.splitext(filename or '')[1].lower()
+    if suffix in FORMAT_SUFFIXES:
+        return FORMAT_SUFFIXES[suffix]
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in FORMAT_MEDIA_TYPES:
+        return FORMAT_MEDIA_TYPES[media_type]
+    raise InvalidImport("Cannot tell the import format from the file; name it .csv or .ndjson, or pass format=")
+
+
+def model_columns(model):
+    """CSV columns of a model with nested sections: {section: (field, ...)}
+
+    Sections are the model's fields; their own fields become the columns, so
+    field names must be unique across sections.
+    """
+    columns = {}
+    for section, field in model.model_fields.items():
+        if not (isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel)):
+            raise TypeError(f"{model.__name__}.{section} is not a nested model")
+        columns[section] = tuple(field.annotation.model_fields)
+    return columns
+
+
+def _text(binary):
+    """Text reader over a binary file, from the start; detach() it afterwards to keep the file open"""
+    binary.seek(0)
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+def check_import_file(binary, fmt, columns):
+    """Raises InvalidImport unless the whole file is UTF-8 and, for CSV, has every column
+
+    Reads the file once in fixed-size pieces, so it never holds the file in memory.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    binary.seek(0)
+    offset = 0
+    try:
+        for piece in iter(lambda: binary.read(CHECK_PIECE_BYTES), b''):
+            decoder.decode(piece)
+            offset += len(piece)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError as e:
+        raise InvalidImport(f"Import file is not UTF-8 text (byte {offset + e.start})")
+
+    if fmt == 'csv':
+        text = _text(binary)
+        try:
+            header = next(csv.reader(text), [])
+        finally:
+            text.detach()
+        missing = [name for fields in columns.values() for name in fields if name not in header]
+        if missing:
+            raise InvalidImport(f"CSV header is missing columns: {', '.join(missing)}")
+
+
+def _csv_rows(text, columns):
+    reader = csv.DictReader(text)
+    for values in reader:
+        # Missing cells are left as None so validation reports them
+        data = {section: {name: values.get(name) for name in fields} for section, fields in columns.items()}
+        yield ImportRow(reader.line_num, data)
+
+
+def _ndjson_rows(text):
+    for line, content in enumerate(text, 1):
+        if not content.strip():
+            continue
+        try:
+            data = json.loads(content)
+        except ValueError as e:
+            yield ImportRow(line, errors=[f"Invalid JSON: {e}"])
+            continue
+        if not isinstance(data, dict):
+            yield ImportRow(line, errors=["Row is not a JSON object"])
+            continue
+        yield ImportRow(line, data)
+
+
+def read_rows(binary, fmt, columns):
+    """Yields the rows of a checked import file one at a time, as ImportRow
+
+    Blocking file reads; iterate it off the event loop.
+    """
+    text = _text(binary)
+    try:
+        yield from (_csv_rows(text, columns) if fmt == 'csv' else _ndjson_rows(text))
+    finally:
+        text.detach()
+
+
+def validate_rows(rows, model):
+    """Validates each row's data against model, setting its record or its errors; returns the rows"""
+    for row in rows:
+        if row.errors is not None:
+            continue
+        try:
+            row.record = model(**row.data)
+        except ValidationError as e:
+            row.errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+        row.data = None
+    return rows
+
+
+def next_batch(rows, size):
+    """The next size rows of an iterator, validated or not, as a list (empty at the end)"""
+    return list(itertools.islice(rows, size))
+
+
+def commit_batch(db, rows):
+    """Stores the documents of a batch of rows with one batched write; blocks until it commits"""
+    writes = [row for row in rows if row.document is not None]
+    if not writes:
+        return []
+    if len(writes) > MAX_BATCH_WRITES:
+        raise ValueError(f"A batched write takes at most {MAX_BATCH_WRITES} documents, got {len(writes)}")
+    batch = db.batch()
+    for row in writes:
+        batch.set(row.doc_ref, row.document)
+    return batch.commit()
+
+
+def row_results(rows, error, fields=()):
+    """Report entries of a batch of rows, with the given fields of each stored document
+
+    error is the exception the batch's commit raised, or None if it committed.
+    """
+    results = []
+    for row in rows:
+        if row.errors is not None:
+            results.append({'line': row.line, 'status': 'invalid', 'errors': row.errors})
+        elif error is not None:
+            results.append({'line': row.line, 'status': 'failed', 'error': str(error)})
+        else:
+            result = {'line': row.line, 'status': 'created', 'id': row.doc_ref.id}
+            result.update((field, row.document[field]) for field in fields)
+            results.append(result)
+    return results
+
+
+async def run_batches(prepare, commit, summarize, max_concurrent):
+    """Prepares batches until prepare() returns None and commits them, max_concurrent at a time
+
+    prepare() and commit(batch) both block and run on worker threads. A new
+    batch is only prepared once a commit slot is free, and each batch is
+    replaced by summarize(batch, error) as soon as its commit is done, so at
+    most max_concurrent + 1 batches are held at once. Returns the summaries
+    in the order the batches were prepared; error is None for a batch that
+    committed.
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_concurrent)
+
+    async def committed(batch):
+        error = None
+        try:
+            await loop.run_in_executor(None, commit, batch)
+        except Exception as e:
+            error = e
+        finally:
+            slots.release()
+        return summarize(batch, error)
+
+    commits = []
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                batch = await loop.run_in_executor(None, prepare)
+            except BaseException:
+                slots.release()
+                raise
+            if batch is None:
+                slots.release()
+                break
+            commits.append(asyncio.ensure_future(committed(batch)))
+    finally:
+        # Batches already sent are waited for, even if preparing a later one failed
+        summaries = await asyncio.gather(*commits)
+    return summaries
+
+
+def batch_report(rows, error, fields=()):
+    """Counts by status and the JSON text of the results of a batch of rows"""
+    results = row_results(rows, error, fields)
+    counts = collections.Counter(result['status'] for result in results)
+    return counts, ','.join(encode_json(result) for result in results)
+
+
+def import_report(batch_reports):
+    """Yields the JSON text of the report of an import in pieces: counts by status, then the per-row
+    results in file order
+
+    batch_reports are batch_report() values in the order of the batches. Each
+    piece is whole JSON tokens (a member, a run of array elements or a
+    bracket), so the pieces only ever join into a well-formed object.
+    """
+    counts = dict.fromkeys(ROW_STATUSES, 0)
+    for batch_counts, _ in batch_reports:
+        for status, count in batch_counts.items():
+            counts[status] += count
+
+    yield '{'
+    for status, count in counts.items():
+        yield f"{encode_json(status)}:{encode_json(count)},"
+    yield '"results":['
+    separator = ''
+    for _, text in batch_reports:
+        if text:
+            yield separator + text
+            separator = ','
+    yield ']}'
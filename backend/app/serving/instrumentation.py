@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Request counts, in-flight gauges and per-stage latency histograms.
+
+RequestMetricsMiddleware is a plain ASGI middleware (no per-request task or
+response buffering) that counts requests by route template and status.
+StageTimers time the steps inside an endpoint. Each timed stage costs two
+perf_counter calls and one histogram update.
+"""
+import time
+from contextvars import ContextVar
+
+from app.serving.metrics import REGISTRY
+
+# perf_counter() at the moment the current request entered the middleware
+_request_started = ContextVar('request_started', default=None)
+
+
+class RequestMetricsMiddleware:
+    """Counts HTTP requests per route and status and tracks requests in flight"""
+
+    def __init__(self, app, registry=REGISTRY):
+        self.app = app
+        self.registry = registry
+        self.in_flight = registry.gauge('http_requests_in_flight', "HTTP requests currently being handled")
+        self._children = {}
+
+    def _metrics(self, method, route, status):
+        """Counter and latency histogram for one (method, route, status), created on first use"""
+        key = (method, route, status)
+        metrics = self._children.get(key)
+        if metrics is None:
+            labels = {'method': method, 'route': route}
+            metrics = (
+                self.registry.counter('http_requests_total', "HTTP requests handled",
+                                      dict(labels, status=str(status))),
+                self.registry.histogram('http_request_duration_seconds', "HTTP request latency", labels),
+            )
+            self._children[key] = metrics
+        return metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = _request_started.set(start)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            _request_started.reset(token)
+
+            # The router stores the matched route in the scope; label by its template, not the raw path
+            route = scope.get('route')
+            requests, latency = self._metrics(scope['method'], getattr(route, 'path', 'unmatched'), status)
+            requests.inc()
+            latency.observe(time.perf_counter() - start)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class StageTimers:
+    """Latency histograms for the stages of one endpoint
+
+    Use `with timers.time('encode'):` around a stage, or
+    `timers.since_request('validation')` as the first line of a handler to
+    record the time spent reading, parsing and validating the request before
+    the handler ran.
+    """
+
+    def __init__(self, endpoint, stages, registry=REGISTRY):
+        self.endpoint = endpoint
+        self.histograms = {
+            stage: registry.histogram('request_stage_seconds', "Time spent in each stage of an endpoint",
+                                      {'endpoint': endpoint, 'stage': stage})
+            for stage in stages
+        }
+
+    def time(self, stage):
+        return _Timer(self.histograms[stage])
+
+    def observe(self, stage, seconds):
+        self.histograms[stage].observe(seconds)
+
+    def since_request(self, stage):
+        start = _request_started.get()
+        if start is not None:
+            self.histograms[stage].observe(time.perf_counter() - start)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Lightweight in-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and fixed-bucket histograms cost a lock and a few additions
+per update, so they are cheap enough to leave on in the request hot path.
+"""
+import bisect
+import threading
+
+# Default latency buckets in seconds (100us up to 10s)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default buckets for counts such as batch sizes
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _format_labels(labels, extra=None):
+    """Renders a label dict as {key="value",...}"""
+    items = list(labels.items())
+    if extra:
+        items.extend(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count"""
+    kind = 'counter'
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name):
+        yield name + _format_labels(self.labels), self.value
+
+
+class Gauge:
+    """A value that can go up and down, or be read from a callback at render time"""
+    kind = 'gauge'
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set_function(self, function):
+        """Reads the gauge value from function() whenever metrics are rendered"""
+        self._function = function
+
+    def samples(self, name):
+        value = self._function() if self._function is not None else self.value
+        yield name + _format_labels(self.labels), value
+
+
+class Histogram:
+    """Counts observations into fixed cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, labels, buckets):
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield name + "_bucket" + _format_labels(self.labels, {'le': _format_value(bound)}), cumulative
+        yield name + "_sum" + _format_labels(self.labels), self.sum
+        yield name + "_count" + _format_labels(self.labels), self.count
+
+
+class MetricsRegistry:
+    """Holds named metric families and renders them for a /metrics endpoint"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, factory):
+        labels = dict(labels or {})
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = {'kind': kind, 'help': help, 'children': {}}
+                self._families[name] = family
+            elif family['kind'] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family['kind']}")
+
+            metric = family['children'].get(key)
+            if metric is None:
+                metric = factory(labels)
+                family['children'][key] = metric
+            return metric
+
+    def counter(self, name, help, labels=None):
+        return self._get('counter', name, help, labels, Counter)
+
+    def gauge(self, name, help, labels=None):
+        return self._get('gauge', name, help, labels, Gauge)
+
+    def histogram(self, name, help, labels=None, buckets=LATENCY_BUCKETS):
+        return self._get('histogram', name, help, labels, lambda labels: Histogram(labels, buckets))
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format"""
+        with self._lock:
+            families = [(name, dict(family, children=list(family['children'].values())))
+                        for name, family in sorted(self._families.items())]
+
+        lines = []
+        for name, family in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for metric in family['children']:
+                for sample, value in metric.samples(name):
+                    lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the API
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Cursor pagination and NDJSON streaming for Firestore collection listings.
+
+Listings read a collection in document id order. A page is a limit() query
+that starts after the last document of the previous page, so each request
+reads only that page, and its memory and latency depend on the page size,
+not on the size of the collection. Clients get the cursor as an opaque page
+token. The NDJSON mode writes each document as stream() yields it, so the
+server holds one chunk of documents at a time however many it sends; the
+unpaged JSON array that listings returned before pagination is written the
+same way.
+
+Listings can also be narrowed to some fields: the field paths are pushed
+down to Firestore as a select(), so fields a view does not need are neither
+read nor sent. ListingView names a fixed projection, such as the summary
+rows of an admin table, and flattens it into a small record.
+"""
+import base64
+import binascii
+import json
+import re
+from datetime import date, datetime
+
+from fastapi.encoders import jsonable_encoder
+
+# Firestore's name for the document id in order_by() and cursors
+DOCUMENT_ID = '__name__'
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+# Lines are sent in chunks of about this size; one document per send would spend more time in the
+# thread pool hop and the ASGI send than in Firestore and the encoding
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+# Simple Firestore field paths: dot-separated identifiers such as personal_info.full_name
+FIELD_PATH_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*')
+MAX_PROJECTED_FIELDS = 32
+
+
+def _encode_value(value):
+    """JSON value of what json.dumps cannot encode itself, as FastAPI's JSON responses would encode it"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+
+def encode_json(obj):
+    """Compact JSON text, encoding datetimes as ISO 8601 strings"""
+    return json.dumps(obj, separators=(',', ':'), default=_encode_value)
+
+
+class InvalidPageToken(ValueError):
+    """Raised for a page token that was not issued by encode_page_token"""
+
+
+class InvalidProjection(ValueError):
+    """Raised for fields= or view= parameters that do not describe a projection"""
+
+
+def encode_page_token(doc_id):
+    """Opaque, URL-safe token for the page that starts after a document"""
+    return base64.urlsafe_b64encode(doc_id.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+
+def decode_page_token(token):
+    """Document id a page token starts after"""
+    try:
+        doc_id = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+    except (binascii.Error, ValueError):
+        raise InvalidPageToken("Invalid page token")
+    # Document ids are non-empty and never contain a path separator
+    if not doc_id or '/' in doc_id:
+        raise InvalidPageToken("Invalid page token")
+    return doc_id
+
+
+def parse_fields(value):
+    """Field paths of a comma-separated fields= parameter
+
+    The document id is part of every record, so "id" is accepted but not
+    read from the document.
+    """
+    paths = []
+    for path in value.split(','):
+        path = path.strip()
+        if not path or path == 'id' or path in paths:
+            continue
+        if not FIELD_PATH_PATTERN.fullmatch(path):
+            raise InvalidProjection(f"Invalid field path: {path!r}")
+        paths.append(path)
+    if len(paths) > MAX_PROJECTED_FIELDS:
+        raise InvalidProjection(f"At most {MAX_PROJECTED_FIELDS} fields can be selected")
+    return paths
+
+
+def field_value(data, path):
+    """Value at a dotted field path of a document, or None if it is missing"""
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def document_record(doc):
+    """A document's fields and its id"""
+    record = doc.to_dict() or {}
+    record['id'] = doc.id
+    return record
+
+
+class ListingView:
+    """Fixed projection of a listing, flattened into records with one key per field
+
+    fields maps each record key to the document field path it is read from.
+    """
+
+    def __init__(self, fields):
+        self.fields = dict(fields)
+        self.field_paths = list(dict.fromkeys(self.fields.values()))
+
+    def record(self, doc):
+        data = doc.to_dict() or {}
+        record = {'id': doc.id}
+        for name, path in self.fields.items():
+            record[name] = field_value(data, path)
+        return record
+
+
+def listing_projection(fields, view, summary, full_record=document_record):
+    """Field paths to select and the record transform for a listing's fields= and view= parameters
+
+    view is 'full' or 'summary'; fields narrows a full listing to some field
+    paths. The field paths are None when every field is read.
+    """
+    if view == 'summary':
+        if fields:
+            raise InvalidProjection("fields cannot be combined with view=summary")
+        return summary.field_paths, summary.record
+    if view != 'full':
+        raise InvalidProjection(f"Unknown view: {view!r}")
+    if fields:
+        return parse_fields(fields), document_record
+    return None, full_record
+
+
+def ordered_query(collection, start_after=None, limit=None, fields=None):
+    """Query over a collection in document id order
+
+    Optionally starts after a document id, is limited, and reads only the
+    given field paths.
+    """
+    query = collection.order_by(DOCUMENT_ID)
+    if fields is not None:
+        query = query.select(fields)
+    if start_after is not None:
+        query = query.start_after({DOCUMENT_ID: start_after})
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def read_page(collection, page_size, start_after=None, transform=document_record, fields=None):
+    """Reads one page of a collection
+
+    Returns (records, next_page_token); the token is None on the last page.
+    transform turns a document snapshot into the record returned for it.
+    """
+    records = []
+    last_id = None
+    # One document beyond the page tells whether another page follows
+    for doc in ordered_query(collection, start_after, page_size + 1, fields).stream():
+        if len(records) == page_size:
+            return records, encode_page_token(last_id)
+        records.append(transform(doc))
+        last_id = doc.id
+    return records, None
+
+
+def ndjson_chunks(docs, transform=document_record, chunk_bytes=NDJSON_CHUNK_BYTES):
+    """Yields the documents as JSON lines, in chunks of about chunk_bytes, as they arrive"""
+    lines = []
+    size = 0
+    for doc in docs:
+        line = encode_json(transform(doc)) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
+
+
+def json_array_chunks(docs, transform=document_record, chunk_bytes=NDJSON_CHUNK_BYTES):
+    """Yields the documents as one JSON array, in chunks of about chunk_bytes, as they arrive"""
+    parts = ['[']
+    size = 1
+    separator = ''
+    for doc in docs:
+        item = separator + encode_json(transform(doc))
+        separator = ','
+        parts.append(item)
+        size += len(item)
+        if size >= chunk_bytes:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+    parts.append(']')
+    yield ''.join(parts)
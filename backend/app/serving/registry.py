@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Serving extras for model bundles and an atomically swappable registry.
+
+Bundles are loaded by app.ai.specs; the attach_* helpers here give a loaded
+bundle a faster predictor or explanations once they have been verified
+against its forest. Requests take a reference to the current bundle once and
+use it throughout, so a reload that swaps in a new bundle never affects
+requests already in flight.
+"""
+import threading
+
+import numpy as np
+
+from app.ai.explain import ContributionExplainer, verify_explanations
+from app.ai.specs import smoke_features
+from app.ai.surface import ProbabilitySurface, verify_surface
+
+
+class ModelNotReadyError(RuntimeError):
+    """Raised when a model is requested before any bundle has been loaded"""
+
+
+def attach_surface(bundle, max_cells):
+    """Switches a bundle to serving from a probability surface of its forest
+
+    The surface is verified against the forest on the smoke dataset and on
+    both sides of every threshold before it is used. Raises ValueError if the
+    surface would be too large and AssertionError if it does not match.
+    """
+    surface = ProbabilitySurface.from_forest(bundle.forest, bundle.features, max_cells)
+    X = smoke_features(bundle)
+    if X is None:
+        X = np.zeros((1, len(bundle.features.feature_cols)))
+    verify_surface(bundle.forest, surface, X)
+    bundle.predictor = surface
+    return surface
+
+
+def attach_explainer(bundle):
+    """Gives a bundle per-feature contribution explanations
+
+    The explanations must add up to the forest's probability on every smoke
+    row before they are used. Raises ValueError if the bundle's forest keeps
+    no per-node probabilities (compact bundles) and AssertionError if the
+    explanations do not add up.
+    """
+    explainer = ContributionExplainer(bundle.forest, bundle.features.feature_cols)
+    X = smoke_features(bundle)
+    if X is None:
+        X = np.zeros((1, len(bundle.features.feature_cols)))
+    verify_explanations(explainer, X)
+    bundle.explainer = explainer
+    return explainer
+
+
+class ModelRegistry:
+    """Holds the active bundle and load state for each model name and swaps bundles atomically
+
+    A model is 'pending' until loading starts, then 'training' (artifacts
+    missing) and/or 'loading', and finally 'ready' once a bundle is swapped in
+    or 'failed' if the startup load raised.
+    """
+
+    def __init__(self):
+        self._bundles = {}
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Returns the active bundle; hold on to it for the whole request"""
+        bundle = self._bundles.get(name)
+        if bundle is None:
+            state, _ = self.state(name)
+            raise ModelNotReadyError(f"The {name} model is not ready yet ({state})")
+        return bundle
+
+    def peek(self, name):
+        """Returns the active bundle or None"""
+        return self._bundles.get(name)
+
+    def swap(self, bundle):
+        """Makes bundle the active version and returns the one it replaced"""
+        with self._lock:
+            previous = self._bundles.get(bundle.name)
+            self._bundles[bundle.name] = bundle
+            self._states[bundle.name] = ('ready', None)
+        return previous
+
+    def set_state(self, name, state, error=None):
+        """Records the load progress of a model that has no active bundle yet"""
+        with self._lock:
+            if name not in self._bundles:
+                self._states[name] = (state, error)
+
+    def state(self, name):
+        """Returns (state, error) for a model"""
+        return self._states.get(name, ('pending', None))
+
+    def is_ready(self, name):
+        return name in self._bundles
+
+    def status(self, names):
+        """Per-model state, active version and last load error"""
+        status = {}
+        for name in names:
+            state, error = self.state(name)
+            bundle = self._bundles.get(name)
+            status[name] = {"state": state, "version": bundle.version if bundle else None, "error": error}
+        return status
+
+    def versions(self):
+        return {name: bundle.version for name, bundle in self._bundles.items()}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Streaming document uploads with a size limit.
+
+The multipart parser already spools an upload to a temporary file (in memory
+up to 1 MB, then on disk). stream_to_blob hands that spool to Cloud Storage
+as a file object instead of reading it into memory. Files over 8 MB go up as
+a resumable upload, one fixed-size chunk at a time, and each chunk is
+retried on its own after a transient failure. A worker therefore holds at
+most one chunk per upload, however large the file.
+
+RequestBodyLimitMiddleware rejects oversized uploads with 413 before they
+are spooled: at once when Content-Length is too large, otherwise as soon as
+the body read so far passes the limit.
+"""
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Resumable upload chunks must be a multiple of 256 KiB
+CHUNK_SIZE_MULTIPLE = 256 * 1024
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def resumable_chunk_size(chunk_bytes):
+    """Nearest valid resumable upload chunk size at or below chunk_bytes (at least 256 KiB)"""
+    return max(CHUNK_SIZE_MULTIPLE, chunk_bytes // CHUNK_SIZE_MULTIPLE * CHUNK_SIZE_MULTIPLE)
+
+
+def upload_size(file):
+    """Size in bytes of a spooled UploadFile"""
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, 2)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+
+def stream_to_blob(blob, file, size, chunk_bytes):
+    """Uploads a spooled UploadFile to a blob without reading it into memory
+
+    Blocks until the upload is done, so call it off the event loop.
+    """
+    blob.chunk_size = resumable_chunk_size(chunk_bytes)
+    blob.upload_from_file(file.file, rewind=True, size=size, content_type=file.content_type)
+
+
+class RequestBodyLimitMiddleware:
+    """Rejects request bodies larger than max_bytes on the given paths with 413"""
+
+    def __init__(self, app, max_bytes, paths):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+    def _detail(self):
+        return f"Request body too large. At most {self.max_bytes} bytes are accepted"
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope['headers']).get(b'content-length')
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({'detail': self._detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        # Chunked bodies have no length up front, so count them as they arrive
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
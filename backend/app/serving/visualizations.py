@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Pre-rendered probability gauges for prediction responses.
+
+Drawing the matplotlib gauge takes tens of milliseconds, far too long for a
+request. GaugeAssets renders the gauge once for every integer percentage,
+keeps the PNGs on disk (so restarts and other workers reuse them) and in
+memory, and composes the per-request overlay (the exact percentage and the
+band) as a small SVG around the cached PNG, which takes microseconds. Predict
+responses only build the URL of that SVG.
+"""
+import base64
+import logging
+import os
+import threading
+from io import BytesIO
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.ai.gauge import draw_gauge
+from app.ai.recommendations import BANDS, band_of
+from app.serving.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Bump when the gauge drawing changes so stale files on disk are not reused
+GAUGE_STYLE_VERSION = 1
+GAUGE_SIZE_PX = 400
+# Data coordinates shown by the gauge axes, shared by the PNG and the SVG overlay
+GAUGE_LIMIT = 1.2
+
+BAND_COLORS = {'low': '#d9534f', 'moderate': '#f0ad4e', 'high': '#5cb85c'}
+
+
+def render_gauge_png(percent):
+    """Renders the gauge with its needle at an integer percentage, without any text, as PNG bytes"""
+    dpi = 100
+    fig = Figure(figsize=(GAUGE_SIZE_PX / dpi, GAUGE_SIZE_PX / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    draw_gauge(ax, percent / 100)
+    ax.set_xlim(-GAUGE_LIMIT, GAUGE_LIMIT)
+    ax.set_ylim(-GAUGE_LIMIT, GAUGE_LIMIT)
+    ax.axis('off')
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def percent_of(probability):
+    """Integer percentage whose pre-rendered gauge shows a probability"""
+    return min(100, max(0, int(round(probability * 100))))
+
+
+def gauge_path(probability):
+    """URL path of the gauge overlay for a probability
+
+    The percentage is rounded to the one decimal the overlay shows, so equal
+    gauges share a URL and can be cached by clients and CDNs. The URL carries
+    GAUGE_STYLE_VERSION, so a new drawing gets new URLs instead of stale
+    cached images.
+    """
+    return (f"/api/visualizations/gauge.svg?percent={round(probability * 100, 1)}"
+            f"&band={band_of(probability)}&v={GAUGE_STYLE_VERSION}")
+
+
+class GaugeAssets:
+    """Gauge PNGs for every integer percentage, cached on disk and in memory"""
+
+    def __init__(self, cache_dir, registry=REGISTRY):
+        self.cache_dir = cache_dir
+        self._png = {}
+        self._data_uri = {}
+        self._lock = threading.Lock()
+
+        self.renders = registry.counter('visualization_renders_total', "Gauges rendered with matplotlib")
+        registry.gauge('visualization_gauges_cached', "Pre-rendered gauges held in memory").set_function(
+            lambda: len(self._png))
+
+    def path(self, percent):
+        return os.path.join(self.cache_dir, f"gauge-v{GAUGE_STYLE_VERSION}-{percent:03d}.png")
+
+    def cached(self, percent):
+        """True if the gauge is already in memory, so png() will not touch disk or matplotlib"""
+        return percent in self._png
+
+    def png(self, percent):
+        """PNG bytes of the gauge at an integer percentage, loading or rendering it the first time"""
+        png = self._png.get(percent)
+        if png is not None:
+            return png
+
+        # One loader at a time, so concurrent misses render each gauge only once
+        with self._lock:
+            png = self._png.get(percent)
+            if png is not None:
+                return png
+
+            path = self.path(percent)
+            try:
+                with open(path, 'rb') as f:
+                    png = f.read()
+            except FileNotFoundError:
+                png = render_gauge_png(percent)
+                self.renders.inc()
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Written under a temporary name and renamed, so other workers never read a partial file
+                tmp_path = f"{path}.tmp-{os.getpid()}"
+                with open(tmp_path, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp_path, path)
+
+            self._data_uri[percent] = "data:image/png;base64," + base64.b64encode(png).decode('ascii')
+            self._png[percent] = png
+            return png
+
+    def prerender(self):
+        """Loads or renders the gauge for every integer percentage"""
+        for percent in range(101):
+            self.png(percent)
+        logger.info(f"{len(self._png)} probability gauges ready in {self.cache_dir}")
+
+    def compose_svg(self, percent, band=None):
+        """SVG of the cached gauge nearest to percent, overlaid with the exact percentage and band"""
+        probability = percent / 100
+        gauge = percent_of(probability)
+        self.png(gauge)
+        if band not in BANDS:
+            band = band_of(probability)
+
+        size = GAUGE_SIZE_PX
+        # Gauge data coordinates to SVG pixels
+        def y_px(y):
+            return (GAUGE_LIMIT - y) / (2 * GAUGE_LIMIT) * size
+
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+            f'<image width="{size}" height="{size}" href="{self._data_uri[gauge]}"/>'
+            f'<text x="{size / 2}" y="{y_px(-0.3):.1f}" text-anchor="middle" font-family="sans-serif" '
+            f'font-size="32" font-weight="bold">{percent:.1f}%</text>'
+            f'<text x="{size / 2}" y="{y_px(-0.55):.1f}" text-anchor="middle" font-family="sans-serif" '
+            f'font-size="20" fill="{BAND_COLORS[band]}">{band.capitalize()} approval probability</text>'
+            '</svg>'
+        )
@@ -0,0 +1,6 @@
+"""
+UniAgric Backend - Benchmarks
+
+Standalone benchmark scripts for the serving hot paths. Run them from the
+backend directory, e.g. `python -m benchmarks.bench_feature_path`.
+"""
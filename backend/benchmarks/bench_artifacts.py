@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-worker joblib loading vs shared memory-mapped serving artifacts.
+
+Starts N worker processes per format, each loading both models the way a
+uvicorn worker does and scoring the smoke datasets so the model pages are
+resident. Once every worker is loaded, each one reports its load time, RSS
+and PSS (proportional set size, which splits shared pages between the
+processes mapping them) from /proc/self/smaps_rollup.
+
+Usage: python -m benchmarks.bench_artifacts [--workers N]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import warnings
+
+from app.ai.specs import default_model_specs, load_bundle, load_mmap_bundle, smoke_features, validate_bundle
+from benchmarks.bench_feature_path import AI_DIR, BACKEND_DIR
+
+warnings.filterwarnings("ignore")
+
+LOADERS = {'joblib': load_bundle, 'mmap': load_mmap_bundle}
+
+
+def memory_kb():
+    """RSS and PSS of this process in kB"""
+    usage = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                usage[key.lower()] = int(value.split()[0])
+    return usage
+
+
+def worker(artifact_format):
+    """Loads both models, waits until every worker is loaded, then reports memory"""
+    start = time.perf_counter()
+    bundles = [LOADERS[artifact_format](spec) for spec in default_model_specs(AI_DIR).values()]
+    load_s = time.perf_counter() - start
+
+    # Touch every tree so the mapped pages are actually resident
+    for bundle in bundles:
+        bundle.forest.predict(smoke_features(bundle))
+
+    print(json.dumps({'load_ms': round(load_s * 1e3, 1)}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps(memory_kb()), flush=True)
+
+
+def run_workers(artifact_format, n_workers):
+    """Runs n_workers concurrently and aggregates what they report"""
+    processes = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.bench_artifacts', '--worker', artifact_format],
+            cwd=BACKEND_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(n_workers)
+    ]
+    loads = [json.loads(process.stdout.readline())['load_ms'] for process in processes]
+
+    # All workers are alive and loaded, so shared pages are split between them
+    memory = []
+    for process in processes:
+        process.stdin.write('\n')
+        process.stdin.flush()
+        memory.append(json.loads(process.stdout.readline()))
+        process.wait()
+
+    return {
+        'workers': n_workers,
+        'load_ms_mean': round(sum(loads) / n_workers, 1),
+        'rss_mb_per_worker': round(sum(m['rss'] for m in memory) / n_workers / 1024, 1),
+        'pss_mb_per_worker': round(sum(m['pss'] for m in memory) / n_workers / 1024, 1),
+        'pss_mb_total': round(sum(m['pss'] for m in memory) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help="worker processes per format")
+    parser.add_argument('--worker', choices=sorted(LOADERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker)
+        return
+
+    # Export (and validate) the serving artifacts once up front, as a deploy step would
+    for spec in default_model_specs(AI_DIR).values():
+        validate_bundle(load_mmap_bundle(spec))
+
+    results = {artifact_format: run_workers(artifact_format, args.workers) for artifact_format in LOADERS}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
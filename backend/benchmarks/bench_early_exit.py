@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Benchmark: full forest traversal vs early-exit band evaluation.
+
+For both models, tunes the tree order on the training dataset, verifies that
+early exit gives the forest's band and decision on the training rows and on
+random perturbations of them, then reports how many trees rows needed (tuned
+vs natural tree order) and times both paths over a range of batch sizes.
+
+Usage: python -m benchmarks.bench_early_exit [--rows N] [--block-size N]
+"""
+import argparse
+import json
+import timeit
+import warnings
+
+import numpy as np
+
+from app.ai.early_exit import EarlyExitForest, verify_early_exit
+from app.ai.specs import default_model_specs, load_bundle, smoke_features
+from benchmarks.bench_feature_path import AI_DIR
+
+warnings.filterwarnings("ignore")
+
+BATCH_SIZES = (1, 100, 1000, 10000)
+
+
+def perturbed_rows(bundle, X, n_rows, rng):
+    """Training rows with noise on their numerical inputs"""
+    numerical = np.array([col not in bundle.features.codes for col in bundle.features.feature_cols])
+    rows = X[rng.integers(0, len(X), n_rows)]
+    return rows + rng.normal(scale=0.5, size=rows.shape) * numerical
+
+
+def bench_model(bundle, n_rows, block_size):
+    forest = bundle.forest
+    X_train = smoke_features(bundle)
+    rng = np.random.default_rng(42)
+    X = perturbed_rows(bundle, X_train, n_rows, rng)
+
+    tuned = EarlyExitForest.tuned(forest, X_train, block_size=block_size)
+    natural = EarlyExitForest(forest, np.arange(forest.n_trees), block_size=block_size)
+    for evaluator in (tuned, natural):
+        verify_early_exit(evaluator, X_train)
+        verify_early_exit(evaluator, X)
+
+    result = {
+        'trees': forest.n_trees,
+        'rows_verified': len(X_train) + len(X),
+        'mean_trees_train_tuned': round(float(tuned.evaluate(X_train).trees.mean()), 1),
+        'mean_trees_train_natural': round(float(natural.evaluate(X_train).trees.mean()), 1),
+    }
+    perturbed = tuned.evaluate(X)
+    result['mean_trees_perturbed_tuned'] = round(float(perturbed.trees.mean()), 1)
+    result['mean_trees_perturbed_natural'] = round(float(natural.evaluate(X).trees.mean()), 1)
+    result['exited_early_pct'] = round(100 * float(np.mean(perturbed.trees < forest.n_trees)), 1)
+
+    for size in BATCH_SIZES:
+        batch = perturbed_rows(bundle, X_train, size, rng)
+        number = max(1, 2000 // size)
+        forest_s = min(timeit.repeat(lambda: forest.predict(batch), number=number, repeat=3)) / number
+        early_s = min(timeit.repeat(lambda: tuned.predict(batch), number=number, repeat=3)) / number
+        result[f'batch_{size}_forest_ms'] = round(forest_s * 1e3, 3)
+        result[f'batch_{size}_early_exit_ms'] = round(early_s * 1e3, 3)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="perturbed rows used for verification")
+    parser.add_argument('--block-size', type=int, default=20, help="trees walked between settle checks")
+    args = parser.parse_args()
+
+    specs = default_model_specs(AI_DIR)
+    results = {name: bench_model(load_bundle(spec), args.rows, args.block_size) for name, spec in specs.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-feature contribution explanations.
+
+For both models, checks the vectorized path-tracing explainer against a
+tree-by-tree reference built from sklearn's decision_path on the training
+rows, checks that explanations add up to the forest's probability on random
+perturbations of them, then times explanations against plain prediction over
+a range of batch sizes.
+
+Usage: python -m benchmarks.bench_explain [--rows N]
+"""
+import argparse
+import json
+import timeit
+import warnings
+
+import numpy as np
+
+from app.ai.explain import ContributionExplainer, verify_explanations
+from app.ai.specs import default_model_specs, load_bundle, smoke_features
+from benchmarks.bench_early_exit import perturbed_rows
+from benchmarks.bench_feature_path import AI_DIR
+
+warnings.filterwarnings("ignore")
+
+BATCH_SIZES = (1, 100, 1000)
+
+
+def reference_contributions(model, X):
+    """Contributions summed one tree and one decision path at a time from the sklearn estimators"""
+    X = np.asarray(X, dtype=np.float32)
+    contributions = np.zeros(X.shape, dtype=np.float64)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        value = tree.value[:, 0, :] / tree.value[:, 0, :].sum(axis=1, keepdims=True)
+        paths = estimator.decision_path(X)
+        for row in range(len(X)):
+            path = paths.indices[paths.indptr[row]:paths.indptr[row + 1]]
+            for parent, child in zip(path[:-1], path[1:]):
+                contributions[row, tree.feature[parent]] += value[child, 1] - value[parent, 1]
+    return contributions / len(model.estimators_)
+
+
+def bench_model(bundle, n_rows):
+    explainer = ContributionExplainer(bundle.forest, bundle.features.feature_cols)
+    X_train = smoke_features(bundle)
+    rng = np.random.default_rng(42)
+    X = perturbed_rows(bundle, X_train, n_rows, rng)
+
+    expected = reference_contributions(bundle.model, X_train)
+    max_diff = float(np.max(np.abs(explainer.explain(X_train).contributions - expected)))
+    if max_diff > 1e-12:
+        raise AssertionError(f"{bundle.name}: contributions differ from the decision_path reference by {max_diff}")
+    verify_explanations(explainer, X_train)
+    verify_explanations(explainer, X)
+
+    result = {
+        'rows_verified': len(X_train) + len(X),
+        'max_diff_vs_reference': max_diff,
+    }
+    for size in BATCH_SIZES:
+        batch = perturbed_rows(bundle, X_train, size, rng)
+        number = max(1, 2000 // size)
+        predict_s = min(timeit.repeat(lambda: bundle.forest.predict(batch), number=number, repeat=3)) / number
+        explain_s = min(timeit.repeat(lambda: explainer.explain(batch), number=number, repeat=3)) / number
+        result[f'batch_{size}_predict_ms'] = round(predict_s * 1e3, 3)
+        result[f'batch_{size}_explain_ms'] = round(explain_s * 1e3, 3)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="perturbed rows used for verification")
+    args = parser.parse_args()
+
+    specs = default_model_specs(AI_DIR)
+    results = {name: bench_model(load_bundle(spec), args.rows) for name, spec in specs.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Benchmark: GET /api/farmer/{farmer_id} with and without the farmer document cache.
+
+Seeds the in-memory Firestore stand-in with farmers, then polls them the way
+dashboards do: a small set of farmers gets most of the requests (Zipf
+distributed). The same request sequence runs with the cache disabled and
+enabled, and each run reports Firestore reads per request, the cache hit
+ratio and p50/p95 latency, with a blocking delay on every Firestore call.
+
+It also checks invalidation: a document uploaded through the API is visible
+on the next GET, and a write made directly to Firestore (as another worker
+would) is visible once the snapshot listener is on.
+
+Usage: python -m benchmarks.bench_farmer_cache [--farmers N] [--requests N] [--firestore-latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, multipart_request, seed_farmers
+
+warnings.filterwarnings("ignore")
+
+
+async def get_farmer(app, farmer_id):
+    status, body = await asgi_request(app, 'GET', f"/api/farmer/{farmer_id}")
+    if status != 200:
+        raise AssertionError(f"GET farmer returned {status}: {body[:200]!r}")
+    return json.loads(body)
+
+
+async def poll(app, db, documents, farmer_ids):
+    """Runs the request sequence, returns reads per request, hit ratio and latency"""
+    latencies = np.empty(len(farmer_ids), dtype=np.float64)
+    hits, misses = documents.cache.hits.value, documents.cache.misses.value
+    db.latency.reset()
+
+    for i, farmer_id in enumerate(farmer_ids):
+        start = time.perf_counter()
+        await get_farmer(app, farmer_id)
+        latencies[i] = time.perf_counter() - start
+
+    hits, misses = documents.cache.hits.value - hits, documents.cache.misses.value - misses
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1e3
+    return {
+        'firestore_reads_per_request': db.latency.counts['read'] / len(farmer_ids),
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        'latency_ms': {'p50': round(float(p50), 3), 'p95': round(float(p95), 3)},
+    }
+
+
+async def check_invalidation(app, db, documents, farmer_id):
+    """Writes through the API and behind the server's back, returns what the next GETs saw"""
+    checks = {}
+
+    # This server's own upload invalidates the cached farmer
+    before = len((await get_farmer(app, farmer_id)).get('documents', []))
+    status, body = await asgi_request(app, *multipart_request(
+        '/api/farmer/upload-document', f"farmer_id={farmer_id}".encode(), "cache_check.pdf", b'%PDF-1.4',
+        'application/pdf'))
+    if status != 200:
+        raise AssertionError(f"Upload returned {status}: {body[:200]!r}")
+    checks['upload_visible'] = len((await get_farmer(app, farmer_id)).get('documents', [])) == before + 1
+
+    # A write from another worker is only seen once the cached copy expires, unless the listener is on
+    await get_farmer(app, farmer_id)
+    db.collection("farmers").document(farmer_id).update({'status': 'approved'})
+    checks['other_writer_visible_without_listener'] = (await get_farmer(app, farmer_id))['status'] == 'approved'
+
+    documents.listen()
+    try:
+        await get_farmer(app, farmer_id)
+        db.collection("farmers").document(farmer_id).update({'status': 'rejected'})
+        checks['other_writer_visible_with_listener'] = (await get_farmer(app, farmer_id))['status'] == 'rejected'
+    finally:
+        documents.stop()
+
+    if not checks['upload_visible'] or not checks['other_writer_visible_with_listener']:
+        raise AssertionError(f"Cached farmer was not invalidated: {checks}")
+    return checks
+
+
+async def run(args):
+    db, _ = inmemory_firebase.install()
+    import main
+
+    app = main.app
+    documents = main.farmer_documents
+    rng = np.random.default_rng(args.seed)
+    farmer_ids = seed_farmers(db, rng, args.farmers)
+    # A few farmers get most of the polls
+    requests = [farmer_ids[(rank - 1) % len(farmer_ids)] for rank in rng.zipf(args.zipf, args.requests)]
+    db.latency.seconds = args.firestore_latency_ms / 1e3
+
+    max_entries = documents.cache.max_entries
+    documents.cache.max_entries = 0
+    uncached = await poll(app, db, documents, requests)
+    documents.cache.max_entries = max_entries
+    documents.cache.clear()
+    cached = await poll(app, db, documents, requests)
+
+    return {
+        'config': {'farmers': args.farmers, 'requests': args.requests, 'zipf': args.zipf,
+                   'cache_max_entries': max_entries, 'cache_ttl_s': documents.cache.ttl,
+                   'firestore_latency_ms': args.firestore_latency_ms, 'seed': args.seed},
+        'uncached': uncached,
+        'cached': cached,
+        'invalidation': await check_invalidation(app, db, documents, requests[0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--farmers', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--zipf', type=float, default=1.3, help="Zipf exponent of the farmer popularity")
+    parser.add_argument('--firestore-latency-ms', type=float, default=5.0,
+                        help="simulated blocking latency of every Firestore call")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Benchmark: memory, latency and size of GET /api/farmers as the collection grows.
+
+Seeds the in-memory Firestore stand-in with growing numbers of farmers, each
+with a few uploaded documents, and at each size measures these ways of
+listing them:
+
+- single_response: the previous endpoint, which read the whole collection
+  into a list and returned it as one JSON document (reproduced here)
+- first_page: one cursor-paginated page (GET /api/farmers?page_size=N)
+- summary_page: the same page in the summary view, read with a select()
+- ndjson_stream: the whole collection streamed (GET /api/farmers?stream=true),
+  with the client consuming lines as they arrive
+- summary_stream: the whole collection streamed in the summary view
+
+Peak memory is the tracemalloc peak while serving one request, and latency
+is measured in a separate, untraced run. It also walks every page by cursor
+and checks that the pages and the stream both return each farmer exactly
+once, in the same order.
+
+Usage: python -m benchmarks.bench_farmers_listing [--sizes 1000,5000,20000] [--page-size N]
+                                                  [--documents-per-farmer N]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, seed_farmers
+
+warnings.filterwarnings("ignore")
+
+
+def single_response(db):
+    """What the endpoint did before pagination: every farmer in one JSON body"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    farmers = []
+    for doc in db.collection("farmers").stream():
+        farmer_data = doc.to_dict()
+        farmer_data["id"] = doc.id
+        farmers.append(farmer_data)
+    return JSONResponse(jsonable_encoder(farmers)).body
+
+
+async def get_page(app, query):
+    """Body of one listing page"""
+    status, body = await asgi_request(app, 'GET', '/api/farmers', query=query.encode())
+    if status != 200:
+        raise AssertionError(f"Listing returned {status}: {body[:200]!r}")
+    return body
+
+
+async def drain_stream(app, query):
+    """Consumes an NDJSON stream without keeping it, returns (lines, bytes)"""
+    counts = {'lines': 0, 'bytes': 0}
+
+    def on_body(chunk):
+        counts['lines'] += chunk.count(b'\n')
+        counts['bytes'] += len(chunk)
+
+    status, _ = await asgi_request(app, 'GET', '/api/farmers', query=query.encode(), on_body=on_body)
+    if status != 200:
+        raise AssertionError(f"Streaming listing returned {status}")
+    return counts['lines'], counts['bytes']
+
+
+async def measure(run):
+    """(seconds, peak traced bytes, response bytes) of one awaited call returning its response size"""
+    start = time.perf_counter()
+    size = await run()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    await run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, size
+
+
+def add_documents(db, farmer_ids, n):
+    """Gives every farmer n uploaded document entries, like the upload endpoint records them"""
+    collection = db.collection("farmers")
+    for farmer_id in farmer_ids:
+        collection.document(farmer_id).update({'documents': [{
+            'name': f"document_{i}.pdf",
+            'url': f"https://storage.googleapis.com/inmemory-bucket/farmers/{farmer_id}/document_{i}.pdf",
+            'content_type': 'application/pdf',
+            'upload_date': '2024-01-01T00:00:00',
+        } for i in range(n)]})
+
+
+async def check_consistency(app, page_size, expected):
+    """Walks every page by cursor and the stream, both must list each farmer once, in id order"""
+    paged_ids = []
+    token = None
+    while True:
+        query = f"page_size={page_size}" + (f"&start_after={token}" if token else "")
+        status, body = await asgi_request(app, 'GET', '/api/farmers', query=query.encode())
+        if status != 200:
+            raise AssertionError(f"Listing returned {status}: {body[:200]!r}")
+        page = json.loads(body)
+        paged_ids.extend(farmer['id'] for farmer in page['farmers'])
+        token = page['next_page_token']
+        if token is None:
+            break
+
+    streamed_ids = []
+
+    def on_body(chunk, buffer=bytearray()):
+        buffer.extend(chunk)
+        *lines, rest = buffer.split(b'\n')
+        streamed_ids.extend(json.loads(line)['id'] for line in lines)
+        buffer[:] = rest
+
+    await asgi_request(app, 'GET', '/api/farmers', query=b'stream=true', on_body=on_body)
+
+    if paged_ids != sorted(expected) or streamed_ids != paged_ids:
+        raise AssertionError("Pages and stream do not list every farmer exactly once in id order")
+
+
+async def run(args):
+    db, _ = inmemory_firebase.install()
+    import main
+
+    app = main.app
+    rng = np.random.default_rng(args.seed)
+    farmer_ids = []
+    results = []
+
+    for size in args.sizes:
+        new_ids = seed_farmers(db, rng, size - len(farmer_ids))
+        add_documents(db, new_ids, args.documents_per_farmer)
+        farmer_ids += new_ids
+        await check_consistency(app, args.page_size, farmer_ids)
+
+        async def run_single():
+            return len(single_response(db))
+
+        def page(query):
+            async def run_page():
+                return len(await get_page(app, query))
+            return run_page
+
+        def stream(query):
+            async def run_stream():
+                lines, size_bytes = await drain_stream(app, query)
+                if lines != size:
+                    raise AssertionError(f"Stream sent {lines} farmers, expected {size}")
+                return size_bytes
+            return run_stream
+
+        modes = {
+            'single_response': run_single,
+            'first_page': page(f"page_size={args.page_size}"),
+            'summary_page': page(f"page_size={args.page_size}&view=summary"),
+            'ndjson_stream': stream("stream=true"),
+            'summary_stream': stream("stream=true&view=summary"),
+        }
+        result = {'farmers': size}
+        for name, mode in modes.items():
+            seconds, peak, size_bytes = await measure(mode)
+            result[name] = {'latency_ms': round(seconds * 1e3, 2), 'peak_memory_kb': round(peak / 1024, 1),
+                            'response_kb': round(size_bytes / 1024, 1)}
+        results.append(result)
+
+    return {
+        'config': {'sizes': args.sizes, 'page_size': args.page_size,
+                   'documents_per_farmer': args.documents_per_farmer, 'seed': args.seed},
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=lambda value: sorted(int(size) for size in value.split(',')),
+                        default=[1000, 5000, 20000], help="comma-separated collection sizes")
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--documents-per-farmer', type=int, default=3, help="uploaded documents stored per farmer")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: DataFrame request preprocessing vs the FeatureEncoder fast path.
+
+Checks that both paths produce identical feature rows and probabilities for
+every row of the training datasets, then times single-request encoding. The
+same rows are also pushed through the fitted FeaturePipeline as one frame and
+as one batch of dicts, which must match the per-row DataFrame path exactly.
+
+Usage: python -m benchmarks.bench_feature_path [--repeat N]
+"""
+import argparse
+import json
+import os
+import timeit
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ai.features import (
+    FeatureEncoder,
+    FARMER_FEATURE_COLS, FARMER_NUMERICAL_COLS,
+    FARM_PLAN_FEATURE_COLS, FARM_PLAN_NUMERICAL_COLS
+)
+from app.ai.pipeline import FeaturePipeline
+
+warnings.filterwarnings("ignore")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_DIR = os.path.join(BACKEND_DIR, 'app', 'ai')
+MODELS_DIR = os.path.join(AI_DIR, 'models')
+DATASETS_DIR = os.path.join(AI_DIR, 'datasets')
+
+MODELS = {
+    'farmer': {
+        'model': 'farmer_approval_model.joblib',
+        'encoders': 'farmer_label_encoders.joblib',
+        'scaler': 'farmer_scaler.joblib',
+        'dataset': 'farmer_data.csv',
+        'feature_cols': FARMER_FEATURE_COLS,
+        'numerical_cols': FARMER_NUMERICAL_COLS,
+    },
+    'farm_plan': {
+        'model': 'farm_plan_model.joblib',
+        'encoders': 'farm_plan_encoders.joblib',
+        'scaler': 'farm_plan_scaler.joblib',
+        'dataset': 'farm_data.csv',
+        'feature_cols': FARM_PLAN_FEATURE_COLS,
+        'numerical_cols': FARM_PLAN_NUMERICAL_COLS,
+    },
+}
+
+
+def dataframe_transform(row, encoders, scaler, numerical_cols):
+    """The per-request DataFrame preprocessing the endpoints used before the fast path"""
+    input_data = pd.DataFrame({col: [value] for col, value in row.items()})
+    for col, encoder in encoders.items():
+        input_data[col] = encoder.transform(input_data[col])
+    input_data[numerical_cols] = scaler.transform(input_data[numerical_cols])
+    return input_data
+
+
+def bench_model(name, spec, repeat):
+    """Verifies and times both preprocessing paths for one model"""
+    model = joblib.load(os.path.join(MODELS_DIR, spec['model']))
+    encoders = joblib.load(os.path.join(MODELS_DIR, spec['encoders']))
+    scaler = joblib.load(os.path.join(MODELS_DIR, spec['scaler']))
+    encoder = FeatureEncoder.from_sklearn(spec['feature_cols'], encoders, scaler, spec['numerical_cols'])
+
+    df = pd.read_csv(os.path.join(DATASETS_DIR, spec['dataset']))
+    rows = df[spec['feature_cols']].to_dict('records')
+
+    # Both paths must agree bit for bit on features and probabilities
+    for row in rows:
+        expected = dataframe_transform(row, encoders, scaler, spec['numerical_cols'])
+        actual = encoder.transform_one(row)
+        if not np.array_equal(expected.to_numpy(dtype=np.float64), actual):
+            raise AssertionError(f"{name}: feature mismatch for {row}")
+        if not np.array_equal(model.predict_proba(expected), model.predict_proba(actual)):
+            raise AssertionError(f"{name}: probability mismatch for {row}")
+
+    # The fused pipeline's batch paths must give the same matrix in one pass
+    pipeline = FeaturePipeline.from_sklearn(spec['feature_cols'], encoders, scaler, spec['numerical_cols'], model)
+    expected_X = np.vstack([encoder.transform_one(row).copy() for row in rows])
+    frame_X = pipeline.transform_frame(df)
+    batch_X, _, errors = pipeline.transform_batch(rows)
+    if errors or not np.array_equal(frame_X, expected_X) or not np.array_equal(batch_X, expected_X):
+        raise AssertionError(f"{name}: pipeline batch transform disagrees with the per-row path")
+
+    row = rows[0]
+    dataframe_s = min(timeit.repeat(
+        lambda: dataframe_transform(row, encoders, scaler, spec['numerical_cols']),
+        number=repeat, repeat=5)) / repeat
+    fast_s = min(timeit.repeat(lambda: encoder.transform_one(row), number=repeat, repeat=5)) / repeat
+    frame_s = min(timeit.repeat(lambda: pipeline.transform_frame(df), number=5, repeat=5)) / 5
+    batch_s = min(timeit.repeat(lambda: pipeline.transform_batch(rows), number=5, repeat=5)) / 5
+
+    return {
+        'rows_verified': len(rows),
+        'dataframe_us': round(dataframe_s * 1e6, 2),
+        'fast_path_us': round(fast_s * 1e6, 2),
+        'speedup': round(dataframe_s / fast_s, 1),
+        'pipeline_frame_us_per_row': round(frame_s / len(rows) * 1e6, 3),
+        'pipeline_batch_us_per_row': round(batch_s / len(rows) * 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help="calls per timing run")
+    args = parser.parse_args()
+
+    results = {name: bench_model(name, spec, args.repeat) for name, spec in MODELS.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
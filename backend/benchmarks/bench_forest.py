@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark: sklearn predict + predict_proba vs the CompiledForest single pass.
+
+Verifies that the compiled forests match sklearn bit for bit on the training
+datasets and on random perturbations of them, then times single-row and
+batch inference.
+
+Usage: python -m benchmarks.bench_forest [--rows N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import timeit
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ai.features import FeatureEncoder
+from app.ai.forest import CompiledForest, verify_compiled_forest
+from benchmarks.bench_feature_path import MODELS, MODELS_DIR, DATASETS_DIR
+
+warnings.filterwarnings("ignore")
+
+
+def load_features(spec):
+    """Loads the model and the encoded, scaled training rows"""
+    model = joblib.load(os.path.join(MODELS_DIR, spec['model']))
+    encoders = joblib.load(os.path.join(MODELS_DIR, spec['encoders']))
+    scaler = joblib.load(os.path.join(MODELS_DIR, spec['scaler']))
+    encoder = FeatureEncoder.from_sklearn(spec['feature_cols'], encoders, scaler, spec['numerical_cols'])
+
+    df = pd.read_csv(os.path.join(DATASETS_DIR, spec['dataset']))
+    X = np.vstack([encoder.transform_one(row).copy()
+                   for row in df[spec['feature_cols']].to_dict('records')])
+    return model, X
+
+
+def bench_model(spec, n_rows, repeat):
+    """Verifies and times sklearn vs the compiled forest for one model"""
+    model, X_train = load_features(spec)
+    forest = CompiledForest.from_sklearn(model)
+
+    # Perturb the training rows so every split is exercised on both sides
+    rng = np.random.default_rng(42)
+    X = X_train[rng.integers(0, len(X_train), n_rows)]
+    X = X + rng.normal(scale=0.5, size=X.shape) * (X.std(axis=0) > 0)
+
+    verify_compiled_forest(model, forest, X_train)
+    verify_compiled_forest(model, forest, X)
+
+    row = X[:1]
+    sklearn_one = min(timeit.repeat(lambda: (model.predict(row), model.predict_proba(row)),
+                                    number=repeat, repeat=3)) / repeat
+    compiled_one = min(timeit.repeat(lambda: forest.predict(row), number=repeat * 10, repeat=3)) / (repeat * 10)
+    sklearn_batch = min(timeit.repeat(lambda: (model.predict(X), model.predict_proba(X)), number=1, repeat=3))
+    compiled_batch = min(timeit.repeat(lambda: forest.predict(X), number=1, repeat=3))
+
+    return {
+        'trees': forest.n_trees,
+        'nodes': forest.n_nodes,
+        'rows_verified': len(X_train) + len(X),
+        'single_row_sklearn_us': round(sklearn_one * 1e6, 1),
+        'single_row_compiled_us': round(compiled_one * 1e6, 1),
+        'batch_rows': len(X),
+        'batch_sklearn_ms': round(sklearn_batch * 1e3, 2),
+        'batch_compiled_ms': round(compiled_batch * 1e3, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="rows in the batch benchmark")
+    parser.add_argument('--repeat', type=int, default=20, help="sklearn calls per single-row timing run")
+    args = parser.parse_args()
+
+    results = {name: bench_model(spec, args.rows, args.repeat) for name, spec in MODELS.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
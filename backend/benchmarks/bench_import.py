@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Benchmark: bulk farmer import vs one registration request per farmer.
+
+Generates farmers as CSV and NDJSON import files and sends them to
+POST /api/farmers/import, and registers a sample of the same farmers one
+request at a time through /api/farmer/register, against the in-memory
+Firestore stand-in with a blocking delay on every Firestore call. Reports
+rows per second and Firestore writes per farmer for each, and for the import
+how throughput changes with the number of batches committing at once. The
+import files are written to a temporary directory first and sent from there
+in 1 MB pieces; peak memory is the tracemalloc peak while serving one import.
+
+It checks that every imported farmer is stored like a registered one, with
+the risk level and score assess_risk gives, that invalid rows are reported
+by line without stopping the import, and that the rows of a batch whose
+commit fails are reported as failed while the other batches are stored.
+
+Usage: python -m benchmarks.bench_import [--rows N] [--register-rows N] [--firestore-latency-ms MS]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, json_request, random_registration
+
+warnings.filterwarnings("ignore")
+
+BOUNDARY = b'benchimportboundary7MA4YWxkTrZu0gW'
+PIECE_BYTES = 1024 * 1024
+# Lines of the generated file that hold an invalid row
+INVALID_EVERY = 997
+
+
+def registrations(seed, n):
+    """The farmers of an import, with every INVALID_EVERY-th one made invalid"""
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        registration = random_registration(rng, i)
+        if i % INVALID_EVERY == INVALID_EVERY - 1:
+            registration['farm_details']['years_operation'] = "unknown"
+        yield registration
+
+
+def write_csv(main, f, seed, n):
+    writer = csv.writer(f)
+    writer.writerow([name for fields in main.IMPORT_COLUMNS.values() for name in fields])
+    for registration in registrations(seed, n):
+        writer.writerow([registration[section][name]
+                         for section, fields in main.IMPORT_COLUMNS.items() for name in fields])
+
+
+def write_ndjson(main, f, seed, n):
+    for registration in registrations(seed, n):
+        f.write(json.dumps(registration) + '\n')
+
+
+FORMATS = {'csv': write_csv, 'ndjson': write_ndjson}
+
+
+def write_import_file(main, directory, fmt, seed, n):
+    path = os.path.join(directory, f"farmers_{seed}_{n}.{fmt}")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        FORMATS[fmt](main, f, seed, n)
+    return path
+
+
+def multipart_stream(path):
+    yield b''.join([
+        b'--', BOUNDARY, b'\r\n',
+        b'Content-Disposition: form-data; name="file"; filename="', os.path.basename(path).encode(), b'"\r\n',
+        b'Content-Type: application/octet-stream\r\n\r\n',
+    ])
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(PIECE_BYTES), b'')
+    yield b'\r\n--' + BOUNDARY + b'--\r\n'
+
+
+async def import_file(main, path):
+    status, body = await asgi_request(
+        main.app, 'POST', '/api/farmers/import', b'', multipart_stream(path),
+        [(b'content-type', b'multipart/form-data; boundary=' + BOUNDARY)])
+    if status != 200:
+        raise AssertionError(f"Import returned {status}: {body[:200]!r}")
+    return json.loads(body)
+
+
+def check_report(report, fmt, n):
+    """Invalid rows are reported by line; every other row was created"""
+    header_lines = 1 if fmt == 'csv' else 0
+    invalid = {i + 1 + header_lines for i in range(n) if i % INVALID_EVERY == INVALID_EVERY - 1}
+    reported = {result['line'] for result in report['results'] if result['status'] == 'invalid'}
+    if reported != invalid or report['created'] != n - len(invalid) or report['failed']:
+        raise AssertionError(f"Unexpected report: {report['created']} created, {report['failed']} failed, "
+                             f"invalid lines {sorted(reported)[:5]} instead of {sorted(invalid)[:5]}")
+
+
+async def check_stored(main, db, report, seed, n):
+    """Imported farmers are stored as registration would store them, with the same risk assessment"""
+    created = iter(result for result in report['results'] if result['status'] == 'created')
+    farmers = db.collection("farmers")
+    for i, registration in enumerate(registrations(seed, n)):
+        if i % INVALID_EVERY == INVALID_EVERY - 1:
+            continue
+        result = next(created)
+        stored = farmers.document(result['id']).get().to_dict()
+        assessment = await main.assess_risk(registration)
+        expected = (assessment['risk_level'], assessment['risk_score'])
+        if (stored['risk_level'], stored['risk_score']) != expected or \
+                (result['risk_level'], result['risk_score']) != expected:
+            raise AssertionError(f"Farmer {i} was stored with a different risk assessment")
+        if any(stored[section] != registration[section] for section in main.IMPORT_COLUMNS) or \
+                stored['status'] != 'pending':
+            raise AssertionError(f"Farmer {i} was stored differently from its registration")
+
+
+async def bench_register(main, db, args):
+    """Registers farmers one request at a time"""
+    requests = [json_request('POST', '/api/farmer/register', registration)
+                for registration in registrations(args.seed, args.register_rows)
+                if not isinstance(registration['farm_details']['years_operation'], str)]
+    db.latency.reset()
+    start = time.perf_counter()
+    for request in requests:
+        status, body = await asgi_request(main.app, *request)
+        if status != 200:
+            raise AssertionError(f"Register returned {status}: {body[:200]!r}")
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': len(requests),
+        'rows_per_s': round(len(requests) / elapsed, 1),
+        'firestore_writes_per_row': db.latency.counts['write'] / len(requests),
+    }
+
+
+async def bench_import(main, db, path, fmt, max_concurrent, args):
+    main.IMPORT_MAX_CONCURRENT_BATCHES = max_concurrent
+    db.latency.reset()
+    start = time.perf_counter()
+    report = await import_file(main, path)
+    elapsed = time.perf_counter() - start
+    check_report(report, fmt, args.rows)
+    return report, {
+        'rows_per_s': round(args.rows / elapsed, 1),
+        'firestore_writes_per_row': round(db.latency.counts['write'] / args.rows, 4),
+    }
+
+
+class DiscardingBatch(inmemory_firebase.WriteBatch):
+    """A batched write that is committed but not stored, so memory shows what the server holds, not the stand-in"""
+
+    def commit(self):
+        self._latency('write')
+        results = [inmemory_firebase.WriteResult(None) for _ in self._writes]
+        self._writes = []
+        return results
+
+
+async def peak_memory(main, db, path):
+    batch = db.batch
+    db.batch = lambda: DiscardingBatch(db.latency)
+    try:
+        tracemalloc.start()
+        await import_file(main, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.batch = batch
+    return {'file_mb': round(os.path.getsize(path) / 2**20, 2), 'peak_memory_mb': round(peak / 2**20, 2)}
+
+
+async def check_failed_batch(main, db, directory, args):
+    """A batch whose commit fails is reported row by row as failed; the others are stored"""
+    batch = db.batch
+    commits = 0
+
+    def failing_batch():
+        write_batch = batch()
+        commit = write_batch.commit
+
+        def fail_second():
+            nonlocal commits
+            commits += 1
+            if commits == 2:
+                raise RuntimeError("simulated commit failure")
+            return commit()
+
+        write_batch.commit = fail_second
+        return write_batch
+
+    db.batch = failing_batch
+    try:
+        rows = 3 * main.IMPORT_BATCH_SIZE
+        report = await import_file(main, write_import_file(main, directory, 'ndjson', args.seed + 1, rows))
+    finally:
+        db.batch = batch
+
+    failed = [result['line'] for result in report['results'] if result['status'] == 'failed']
+    first, last = main.IMPORT_BATCH_SIZE + 1, 2 * main.IMPORT_BATCH_SIZE
+    if not failed or failed[0] < first or failed[-1] > last or report['created'] + report['invalid'] + len(failed) != rows:
+        raise AssertionError(f"Failed batch reported wrongly: lines {failed[:3]}..{failed[-3:]}")
+    return {'rows': rows, 'created': report['created'], 'failed': report['failed'], 'invalid': report['invalid']}
+
+
+async def run(args):
+    db, _ = inmemory_firebase.install()
+    import main
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {fmt: write_import_file(main, directory, fmt, args.seed, args.rows) for fmt in FORMATS}
+
+        db.latency.seconds = args.firestore_latency_ms / 1e3
+        register = await bench_register(main, db, args)
+        imports, reports = {}, {}
+        for fmt, path in paths.items():
+            imports[fmt] = {}
+            for max_concurrent in args.concurrency:
+                reports[fmt], imports[fmt][f"concurrent_batches_{max_concurrent}"] = await bench_import(
+                    main, db, path, fmt, max_concurrent, args)
+
+        # Checks and memory run without the delay, which would only make them slower
+        db.latency.seconds = 0.0
+        for report in reports.values():
+            await check_stored(main, db, report, args.seed, args.rows)
+        memory = {fmt: await peak_memory(main, db, path) for fmt, path in paths.items()}
+        failed_batch = await check_failed_batch(main, db, directory, args)
+
+    return {
+        'config': {'rows': args.rows, 'register_rows': args.register_rows, 'batch_size': main.IMPORT_BATCH_SIZE,
+                   'concurrency': args.concurrency, 'firestore_latency_ms': args.firestore_latency_ms,
+                   'seed': args.seed},
+        'register': register,
+        'import': imports,
+        'memory': memory,
+        'failed_batch': failed_batch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="farmers per import file")
+    parser.add_argument('--register-rows', type=int, default=500, help="farmers registered one request at a time")
+    parser.add_argument('--concurrency', type=lambda value: [int(n) for n in value.split(',')], default=[1, 4],
+                        help="comma-separated numbers of batches committing at once")
+    parser.add_argument('--firestore-latency-ms', type=float, default=20.0,
+                        help="simulated blocking latency of every Firestore call")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
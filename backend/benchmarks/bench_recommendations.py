@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-row if/elif recommendations vs the vectorized rule tables.
+
+Checks that the rule tables reproduce the original hand-written chains for
+rows of the training datasets at probabilities spread over all three bands
+(including the band edges), then times batch evaluation on the columns of an
+encoded batch, which is how the batch endpoint calls it.
+
+Usage: python -m benchmarks.bench_recommendations [--rows N]
+"""
+import argparse
+import json
+import os
+import timeit
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ai.features import FeatureEncoder
+from app.ai.recommendations import FARMER_RULES, FARM_PLAN_RULES
+from benchmarks.bench_feature_path import MODELS, MODELS_DIR, DATASETS_DIR
+
+
+def farmer_if_elif(probability, farmer_data):
+    """The farmer recommendation chain the endpoints used before the rule table"""
+    recommendations = []
+    if probability < 0.3:
+        recommendations.append("Based on the provided information, your profile has a low approval probability.")
+        if farmer_data['credit_score'] < 650:
+            recommendations.append("Your credit score is below the recommended threshold. Consider improving it before applying.")
+        if farmer_data['years_experience'] < 3:
+            recommendations.append("Your farming experience is limited. Consider gaining more experience or partnering with experienced farmers.")
+        if farmer_data['has_irrigation'] == 0:
+            recommendations.append("Installing irrigation systems can improve your farm's productivity and increase approval chances.")
+    elif probability < 0.7:
+        recommendations.append("Your profile has a moderate approval probability.")
+        if farmer_data['credit_score'] < 700:
+            recommendations.append("Improving your credit score could increase your approval chances.")
+        if farmer_data['crop_diversity'] < 3:
+            recommendations.append("Consider diversifying your crops to reduce risk and improve approval probability.")
+        recommendations.append("With some improvements, your application could have a higher chance of approval.")
+    else:
+        recommendations.append("Your profile has a high approval probability.")
+        recommendations.append("Your experience and farm management practices show strong potential for success.")
+        if farmer_data['annual_income'] < 50000:
+            recommendations.append("While your profile is strong, increasing farm revenue could help secure larger funding amounts.")
+    return recommendations
+
+
+def farm_plan_if_elif(probability, data):
+    """The farm plan recommendation chain the endpoints used before the rule table"""
+    recommendations = []
+    if probability < 0.3:
+        recommendations.append("Your farm plan has a low approval probability.")
+        if data['yield_per_hectare'] < 3:
+            recommendations.append("Consider crops with higher yield potential for your land area.")
+        if data['crop_type'] == 'cotton' and data['climate'] == 'arid':
+            recommendations.append("Cotton in arid regions often requires extensive irrigation. Consider alternative crops or improved irrigation systems.")
+        recommendations.append("Review your farm plan and consider consulting with an agricultural extension officer.")
+    elif probability < 0.7:
+        recommendations.append("Your farm plan has a moderate approval probability.")
+        if data['soil_type'] == 'sandy' and data['yield_per_hectare'] < 5:
+            recommendations.append("Sandy soils often require additional fertility management. Consider soil amendments or alternative crops.")
+        recommendations.append("With some improvements, your plan could have a higher chance of approval.")
+    else:
+        recommendations.append("Your farm plan has a high approval probability.")
+        recommendations.append("Continue with your current approach, which shows strong potential for success.")
+    return recommendations
+
+
+TABLES = {
+    'farmer': (FARMER_RULES, farmer_if_elif),
+    'farm_plan': (FARM_PLAN_RULES, farm_plan_if_elif),
+}
+
+
+def bench_model(name, spec, n_rows):
+    """Verifies and times the rule table against the if/elif chain for one model"""
+    rules, if_elif = TABLES[name]
+    df = pd.read_csv(os.path.join(DATASETS_DIR, spec['dataset']))
+    rng = np.random.default_rng(42)
+
+    rows = df[spec['feature_cols']].to_dict('records')
+    rows = [rows[i] for i in rng.integers(0, len(rows), n_rows)]
+    probabilities = rng.random(n_rows)
+    probabilities[:6] = [0.0, 0.3, np.nextafter(0.3, 0), 0.7, np.nextafter(0.7, 0), 1.0]
+
+    encoder = FeatureEncoder.from_sklearn(
+        spec['feature_cols'],
+        joblib.load(os.path.join(MODELS_DIR, spec['encoders'])),
+        joblib.load(os.path.join(MODELS_DIR, spec['scaler'])),
+        spec['numerical_cols']
+    )
+    encoded, _, _ = encoder.encode_batch(rows)
+
+    expected = [if_elif(p, row) for p, row in zip(probabilities, rows)]
+    if [rules.recommend(p, row) for p, row in zip(probabilities, rows)] != expected:
+        raise AssertionError(f"{name}: single-row rule table disagrees with the if/elif chain")
+    if rules.recommend_batch(probabilities, rules.columns_from_rows(rows)) != expected:
+        raise AssertionError(f"{name}: batch rule table on raw rows disagrees with the if/elif chain")
+    if rules.recommend_batch(probabilities, rules.columns_from_encoded(encoded, encoder)) != expected:
+        raise AssertionError(f"{name}: batch rule table on an encoded batch disagrees with the if/elif chain")
+
+    if_elif_s = min(timeit.repeat(lambda: [if_elif(p, row) for p, row in zip(probabilities, rows)],
+                                  number=1, repeat=5))
+    batch_s = min(timeit.repeat(
+        lambda: rules.recommend_batch(probabilities, rules.columns_from_encoded(encoded, encoder)),
+        number=1, repeat=5))
+
+    return {
+        'rows_verified': n_rows,
+        'if_elif_ms': round(if_elif_s * 1e3, 2),
+        'rule_table_batch_ms': round(batch_s * 1e3, 2),
+        'speedup': round(if_elif_s / batch_s, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="rows per batch")
+    args = parser.parse_args()
+
+    results = {name: bench_model(name, spec, args.rows) for name, spec in MODELS.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Benchmark: Firestore round-trips and latency of farmer registration.
+
+Runs registrations through both registration routes (/api/farmer/register in
+main.py and /register in app/main.py) against the in-memory Firestore
+stand-in. The stand-in counts every read and write, and can add a blocking
+delay per call. Checks that each registration is one write with no reads and
+that the stored record is complete, and reports latency per registration.
+
+Usage: python -m benchmarks.bench_register [--requests N] [--firestore-latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, json_request, random_registration
+
+warnings.filterwarnings("ignore")
+
+# Fields every registration must be stored with after its single write
+MAIN_REQUIRED_FIELDS = ('personal_info', 'farm_details', 'financial_info', 'registration_date', 'status',
+                        'risk_level', 'risk_score', 'assessment_date')
+APP_REQUIRED_FIELDS = ('name', 'email', 'created_at', 'status')
+
+
+def flat_registration(rng, i):
+    """Registration payload in the flat layout app/main.py expects"""
+    nested = random_registration(rng, i)
+    personal, farm, financial = nested['personal_info'], nested['farm_details'], nested['financial_info']
+    return {
+        'name': personal['full_name'],
+        'email': personal['email'],
+        'phone': personal['phone_number'],
+        'id_type': personal['id_type'],
+        'id_number': personal['id_number'],
+        **farm,
+        **financial,
+        'monthly_returns': round(float(rng.uniform(100, 5_000)), 2),
+        'repayment_timeframe': '12 months',
+        'funding_description': "Generated by the registration benchmark",
+    }
+
+
+async def bench_route(app, db, path, payloads, required_fields):
+    """Sends the registrations one at a time, returns round-trips per registration and latency"""
+    collection = db.collection("farmers")
+    latencies = np.empty(len(payloads), dtype=np.float64)
+    reads = writes = 0
+
+    for i, payload in enumerate(payloads):
+        db.latency.reset()
+        start = time.perf_counter()
+        status, body = await asgi_request(app, *json_request('POST', path, payload))
+        latencies[i] = time.perf_counter() - start
+        if status != 200:
+            raise AssertionError(f"{path} returned {status}: {body[:200]!r}")
+        reads += db.latency.counts['read']
+        writes += db.latency.counts['write']
+
+        response = json.loads(body)
+        farmer_id = response.get('farmer_id') or response.get('id')
+        stored = collection.document(farmer_id).get().to_dict()
+        missing = [field for field in required_fields if stored.get(field) is None]
+        if missing:
+            raise AssertionError(f"{path} stored a record without {', '.join(missing)}")
+
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1e3
+    return {
+        'registrations': len(payloads),
+        'firestore_reads_per_registration': reads / len(payloads),
+        'firestore_writes_per_registration': writes / len(payloads),
+        'latency_ms': {'p50': round(float(p50), 2), 'p95': round(float(p95), 2)},
+    }
+
+
+async def run(args):
+    db, _ = inmemory_firebase.install(args.firestore_latency_ms / 1e3)
+    # app/main.py reads its service account from the environment; the stand-in ignores it
+    os.environ.setdefault('FIREBASE_PRIVATE_KEY', '')
+    import main
+    import app.main
+
+    rng = np.random.default_rng(args.seed)
+    results = {
+        'main /api/farmer/register': await bench_route(
+            main.app, db, '/api/farmer/register',
+            [random_registration(rng, i) for i in range(args.requests)], MAIN_REQUIRED_FIELDS),
+        'app.main /register': await bench_route(
+            app.main.app, db, '/register',
+            [flat_registration(rng, i) for i in range(args.requests)], APP_REQUIRED_FIELDS),
+    }
+    for name, result in results.items():
+        if result['firestore_reads_per_registration'] or result['firestore_writes_per_registration'] != 1:
+            raise AssertionError(f"{name} is not a single write: {result}")
+
+    return {
+        'config': {'requests': args.requests, 'firestore_latency_ms': args.firestore_latency_ms, 'seed': args.seed},
+        'routes': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help="registrations per route")
+    parser.add_argument('--firestore-latency-ms', type=float, default=5.0,
+                        help="simulated blocking latency of every Firestore call")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
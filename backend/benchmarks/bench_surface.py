@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Benchmark: compiled forest traversal vs the farm plan probability surface.
+
+Builds the surface, verifies it against the forest on the training dataset,
+on random perturbations of it and on both sides of every threshold, then
+times single-row and batch inference.
+
+Usage: python -m benchmarks.bench_surface [--rows N] [--repeat N]
+"""
+import argparse
+import json
+import time
+import timeit
+import warnings
+
+import numpy as np
+
+from app.ai.surface import ProbabilitySurface, verify_surface
+from app.ai.specs import default_model_specs, load_bundle, smoke_features
+from benchmarks.bench_feature_path import AI_DIR
+
+warnings.filterwarnings("ignore")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help="rows in the batch benchmark")
+    parser.add_argument('--repeat', type=int, default=2000, help="calls per single-row timing run")
+    args = parser.parse_args()
+
+    bundle = load_bundle(default_model_specs(AI_DIR)['farm_plan'])
+    forest = bundle.forest
+
+    start = time.perf_counter()
+    surface = ProbabilitySurface.from_forest(forest, bundle.features, max_cells=50_000_000)
+    build_s = time.perf_counter() - start
+
+    # Perturb the numerical inputs of the training rows across their whole range
+    X_train = smoke_features(bundle)
+    rng = np.random.default_rng(42)
+    X = X_train[rng.integers(0, len(X_train), args.rows)]
+    X[:, surface.numerical_idx] += rng.normal(scale=1.0, size=(len(X), len(surface.numerical_idx)))
+
+    verify_surface(forest, surface, X_train)
+    verify_surface(forest, surface, X)
+
+    row = X[:1]
+    forest_one = min(timeit.repeat(lambda: forest.predict(row), number=args.repeat, repeat=3)) / args.repeat
+    surface_one = min(timeit.repeat(lambda: surface.predict(row), number=args.repeat, repeat=3)) / args.repeat
+    forest_batch = min(timeit.repeat(lambda: forest.predict(X), number=1, repeat=3))
+    surface_batch = min(timeit.repeat(lambda: surface.predict(X), number=1, repeat=3))
+
+    print(json.dumps({
+        'cells': surface.n_cells,
+        'surface_mb': round(surface.nbytes / 1e6, 2),
+        'build_ms': round(build_s * 1e3, 1),
+        'rows_verified': len(X_train) + len(X),
+        'single_row_forest_us': round(forest_one * 1e6, 1),
+        'single_row_surface_us': round(surface_one * 1e6, 1),
+        'batch_rows': len(X),
+        'batch_forest_ms': round(forest_batch * 1e3, 2),
+        'batch_surface_ms': round(surface_batch * 1e3, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Benchmark: many parallel document uploads to one farmer.
+
+Two measurements against the in-memory Firestore stand-in, with a blocking
+delay on every Firestore and Storage call:
+
+- route: concurrent POST /api/farmer/upload-document requests for one
+  farmer through the app. Reports throughput, Firestore reads and writes
+  per upload, and whether every upload is in the farmer's documents list.
+- workers: several threads append to one farmer's documents list at once,
+  as separate workers would. The previous read-modify-write (get, append in
+  Python, update with the whole list) is compared with the server-side
+  ArrayUnion append, counting entries lost to the race.
+
+Usage: python -m benchmarks.bench_upload_concurrency [--uploads N] [--concurrency N] [--workers N]
+                                                     [--firestore-latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, multipart_request, seed_farmers
+
+warnings.filterwarnings("ignore")
+
+
+def document_entry(i):
+    return {
+        'name': f"document_{i}.pdf",
+        'url': f"https://storage.googleapis.com/inmemory-bucket/document_{i}.pdf",
+        'content_type': 'application/pdf',
+        'upload_date': f"2024-01-01T00:00:{i:06d}",
+    }
+
+
+def append_read_modify_write(doc_ref, i):
+    """The previous append: the whole list is read, extended and written back"""
+    documents = doc_ref.get().to_dict().get('documents', [])
+    documents.append(document_entry(i))
+    doc_ref.update({'documents': documents})
+
+
+def append_array_union(doc_ref, i):
+    from firebase_admin import firestore
+
+    doc_ref.update({'documents': firestore.ArrayUnion([document_entry(i)])})
+
+
+def documents_of(db, farmer_id):
+    return db.collection("farmers").document(farmer_id).get().to_dict().get('documents', [])
+
+
+async def bench_route(app, db, farmer_id, args):
+    """Concurrent uploads through the app; every upload must end up in the documents list"""
+    rng = np.random.default_rng(args.seed)
+    requests = [multipart_request('/api/farmer/upload-document', f"farmer_id={farmer_id}".encode(),
+                                  f"route_{i}.pdf", rng.bytes(args.document_kb * 1024), 'application/pdf')
+                for i in range(args.uploads)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses = []
+
+    async def send(request):
+        async with semaphore:
+            status, _ = await asgi_request(app, *request)
+            statuses.append(status)
+
+    db.latency.reset()
+    start = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    elapsed = time.perf_counter() - start
+    reads, writes = db.latency.counts['read'], db.latency.counts['write']
+
+    stored = {entry['name'] for entry in documents_of(db, farmer_id)}
+    missing = sum(f"route_{i}.pdf" not in stored for i in range(args.uploads))
+    if missing or any(status != 200 for status in statuses):
+        raise AssertionError(f"{missing} uploads missing from the farmer, statuses {set(statuses)}")
+    return {
+        'uploads': args.uploads,
+        'throughput_per_s': round(args.uploads / elapsed, 1),
+        'firestore_reads_per_upload': reads / args.uploads,
+        'firestore_writes_per_upload': writes / args.uploads,
+        'entries_missing': missing,
+    }
+
+
+def bench_workers(db, farmer_id, append, args):
+    """Appends from several threads at once, returns throughput and entries lost"""
+    doc_ref = db.collection("farmers").document(farmer_id)
+    doc_ref.update({'documents': []})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.workers) as pool:
+        list(pool.map(lambda i: append(doc_ref, i), range(args.uploads)))
+    elapsed = time.perf_counter() - start
+
+    stored = len(documents_of(db, farmer_id))
+    return {
+        'appends': args.uploads,
+        'throughput_per_s': round(args.uploads / elapsed, 1),
+        'entries_stored': stored,
+        'entries_lost': args.uploads - stored,
+    }
+
+
+async def run(args):
+    # Seeding runs without the simulated latency
+    db, bucket = inmemory_firebase.install()
+    import main
+
+    farmer_ids = seed_farmers(db, np.random.default_rng(args.seed), 2)
+    db.latency.seconds = bucket.latency.seconds = args.firestore_latency_ms / 1e3
+
+    route = await bench_route(main.app, db, farmer_ids[0], args)
+    workers = {
+        'read_modify_write': bench_workers(db, farmer_ids[1], append_read_modify_write, args),
+        'array_union': bench_workers(db, farmer_ids[1], append_array_union, args),
+    }
+    if workers['array_union']['entries_lost']:
+        raise AssertionError(f"ArrayUnion appends lost entries: {workers['array_union']}")
+
+    return {
+        'config': {'uploads': args.uploads, 'concurrency': args.concurrency, 'workers': args.workers,
+                   'document_kb': args.document_kb, 'firestore_latency_ms': args.firestore_latency_ms,
+                   'seed': args.seed},
+        'route': route,
+        'workers': workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uploads', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32, help="concurrent upload requests")
+    parser.add_argument('--workers', type=int, default=8, help="threads appending at once")
+    parser.add_argument('--document-kb', type=int, default=16)
+    parser.add_argument('--firestore-latency-ms', type=float, default=5.0,
+                        help="simulated blocking latency of every Firestore and Storage call")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Benchmark: memory of document uploads as the file size grows.
+
+Uploads generated files of growing size to POST /api/farmer/upload-document,
+which streams the spooled upload to Storage in chunks, and to a copy of the
+previous handler, which read the whole file into memory and uploaded it as
+one string. The request body is generated and sent in 1 MB pieces, and the
+Storage stand-in writes objects to a temporary directory, so neither the
+client nor the stand-in holds the file. Peak memory is the tracemalloc peak
+while serving one upload.
+
+It checks that every stored object matches what was sent, byte for byte,
+and that oversized bodies are rejected with 413, whether they announce their
+length or are sent chunked.
+
+Usage: python -m benchmarks.bench_uploads [--sizes-mb 4,32,128]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, seed_farmers
+
+warnings.filterwarnings("ignore")
+
+BOUNDARY = b'benchuploadboundary7MA4YWxkTrZu0gW'
+PIECE_BYTES = 1024 * 1024
+
+
+def previous_upload_app(bucket):
+    """The upload handler as it was before streaming: the whole file is read into memory"""
+    from fastapi import FastAPI, File, UploadFile
+
+    app = FastAPI()
+
+    @app.post("/api/farmer/upload-document")
+    async def upload_document(farmer_id: str, file: UploadFile = File(...)):
+        blob = bucket.blob(f"farmer_documents/{farmer_id}/{file.filename}")
+        content = await file.read()
+        blob.upload_from_string(content, content_type=file.content_type)
+        return {"status": "success"}
+
+    return app
+
+
+def multipart_stream(size, seed, digest):
+    """Multipart body with a size-byte file, generated in pieces and hashed into digest as it goes"""
+    yield b''.join([
+        b'--', BOUNDARY, b'\r\n',
+        b'Content-Disposition: form-data; name="file"; filename="land_title_scan.pdf"\r\n',
+        b'Content-Type: application/pdf\r\n\r\n',
+    ])
+    rng = np.random.default_rng(seed)
+    remaining = size
+    while remaining > 0:
+        piece = rng.bytes(min(PIECE_BYTES, remaining))
+        digest.update(piece)
+        remaining -= len(piece)
+        yield piece
+    yield b'\r\n--' + BOUNDARY + b'--\r\n'
+
+
+async def upload(app, farmer_id, size, seed):
+    """Sends one upload, returns the SHA-256 of the file sent"""
+    digest = hashlib.sha256()
+    status, body = await asgi_request(
+        app, 'POST', '/api/farmer/upload-document', f"farmer_id={farmer_id}".encode(),
+        multipart_stream(size, seed, digest),
+        [(b'content-type', b'multipart/form-data; boundary=' + BOUNDARY)])
+    if status != 200:
+        raise AssertionError(f"Upload returned {status}: {body[:200]!r}")
+    return digest.hexdigest()
+
+
+def stored_digest(bucket, farmer_id):
+    digest = hashlib.sha256()
+    with open(bucket.objects[f"farmer_documents/{farmer_id}/land_title_scan.pdf"], 'rb') as f:
+        for piece in iter(lambda: f.read(PIECE_BYTES), b''):
+            digest.update(piece)
+    return digest.hexdigest()
+
+
+async def measure(app, bucket, farmer_id, size, seed):
+    """Seconds and peak traced bytes of one upload, checking what was stored"""
+    start = time.perf_counter()
+    sent = await upload(app, farmer_id, size, seed)
+    seconds = time.perf_counter() - start
+    if stored_digest(bucket, farmer_id) != sent:
+        raise AssertionError("Stored document differs from the upload")
+
+    tracemalloc.start()
+    await upload(app, farmer_id, size, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': round(seconds, 3), 'peak_memory_mb': round(peak / 2**20, 2)}
+
+
+async def check_limits(app, farmer_id, max_bytes):
+    """Oversized uploads are rejected with 413, by Content-Length or while a chunked body arrives"""
+    from app.serving.uploads import RequestBodyLimitMiddleware
+
+    headers = [(b'content-type', b'multipart/form-data; boundary=' + BOUNDARY)]
+    path, query = '/api/farmer/upload-document', f"farmer_id={farmer_id}".encode()
+    announced, _ = await asgi_request(app, 'POST', path, query, iter([b'']),
+                                      headers + [(b'content-length', str(max_bytes * 2).encode())])
+
+    # Without a Content-Length the body is counted as it arrives; a small limit keeps this quick
+    limited = RequestBodyLimitMiddleware(app, max_bytes=2**20, paths=[path])
+    chunked, _ = await asgi_request(limited, 'POST', path, query,
+                                    multipart_stream(4 * 2**20, 0, hashlib.sha256()), headers)
+
+    if announced != 413 or chunked != 413:
+        raise AssertionError(f"Oversized uploads returned {announced} and {chunked}, expected 413")
+    return {'content_length_status': announced, 'chunked_status': chunked}
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as storage_dir:
+        db, bucket = inmemory_firebase.install(storage_dir=storage_dir)
+        import main
+
+        farmer_id, = seed_farmers(db, np.random.default_rng(args.seed), 1)
+        previous = previous_upload_app(bucket)
+
+        results = []
+        for size_mb in args.sizes_mb:
+            size = int(size_mb * 2**20)
+            results.append({
+                'file_mb': size_mb,
+                'streamed': await measure(main.app, bucket, farmer_id, size, args.seed),
+                'read_into_memory': await measure(previous, bucket, farmer_id, size, args.seed),
+            })
+
+        return {
+            'config': {'sizes_mb': args.sizes_mb, 'upload_max_bytes': main.UPLOAD_MAX_BYTES,
+                       'upload_chunk_bytes': main.UPLOAD_CHUNK_BYTES, 'seed': args.seed},
+            'results': results,
+            'oversized': await check_limits(main.app, farmer_id, main.UPLOAD_MAX_BYTES),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes-mb', type=lambda value: [float(size) for size in value.split(',')],
+                        default=[4, 32, 128], help="comma-separated file sizes in MB")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
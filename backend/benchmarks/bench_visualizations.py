@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Benchmark: per-request matplotlib gauge vs the pre-rendered gauge overlay.
+
+Renders every gauge into a temporary cache directory, then times loading them
+back from disk, rendering one gauge with matplotlib and composing the
+per-request SVG overlay from the in-memory cache.
+
+Usage: python -m benchmarks.bench_visualizations [--repeat N]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import timeit
+
+from app.serving.metrics import MetricsRegistry
+from app.serving.visualizations import GaugeAssets, render_gauge_png
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=1000, help="overlays composed per timing run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        assets = GaugeAssets(cache_dir, registry=MetricsRegistry())
+        started = time.perf_counter()
+        assets.prerender()
+        prerender_s = time.perf_counter() - started
+
+        reloaded = GaugeAssets(cache_dir, registry=MetricsRegistry())
+        started = time.perf_counter()
+        reloaded.prerender()
+        reload_s = time.perf_counter() - started
+        if reloaded.renders.value:
+            raise AssertionError("Gauges were rendered again although they were cached on disk")
+
+        disk_bytes = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+        render_s = min(timeit.repeat(lambda: render_gauge_png(61), number=3, repeat=3)) / 3
+        compose_s = min(timeit.repeat(lambda: assets.compose_svg(61.5), number=args.repeat, repeat=5)) / args.repeat
+
+    print(json.dumps({
+        'gauges': 101,
+        'prerender_s': round(prerender_s, 2),
+        'reload_from_disk_ms': round(reload_s * 1e3, 1),
+        'disk_kb': round(disk_bytes / 1024, 1),
+        'matplotlib_render_ms': round(render_s * 1e3, 2),
+        'overlay_compose_us': round(compose_s * 1e6, 2),
+        'speedup': round(render_s / compose_s, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
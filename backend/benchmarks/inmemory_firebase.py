@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+"""
+In-memory stand-ins for the Firestore client and the Storage bucket.
+
+They cover the subset of the firebase_admin API that main.py uses, keep
+everything in process memory and can add a fixed per-call latency to
+approximate real network round-trips. Calls block like the real clients do,
+so a slow stand-in stalls the event loop exactly where production would.
+Every round-trip is counted by kind ('read' or 'write'), so benchmarks can
+check how many calls a route makes. The bucket can keep objects in a local
+directory instead, so large uploads can be measured without the stand-in
+holding them in memory.
+
+install() patches firebase_admin so that importing main.py afterwards
+initializes against these stand-ins instead of the real project.
+"""
+import bisect
+import collections
+import copy
+import enum
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import InvalidArgument, NotFound
+
+
+class _Latency:
+    """Sleeps for a fixed time on every simulated round-trip and counts the round-trips by kind"""
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+        self.calls = 0
+        self.counts = collections.Counter()
+
+    def __call__(self, kind='call'):
+        self.calls += 1
+        self.counts[kind] += 1
+        if self.seconds > 0:
+            time.sleep(self.seconds)
+
+    def reset(self):
+        self.calls = 0
+        self.counts.clear()
+
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+def _commit(data):
+    """Copies data for storage, resolving SERVER_TIMESTAMP to the commit time like the server does
+
+    Returns (stored data, commit time).
+    """
+    from firebase_admin import firestore
+
+    commit_time = datetime.now(timezone.utc)
+    data = copy.deepcopy(data)
+    for key, value in data.items():
+        if value is firestore.SERVER_TIMESTAMP:
+            data[key] = commit_time
+    return data, commit_time
+
+
+def _apply_transforms(current, data):
+    """Resolves ArrayUnion values against the stored fields, like the server does on commit"""
+    from firebase_admin import firestore
+
+    for key, value in data.items():
+        if isinstance(value, firestore.ArrayUnion):
+            existing = current.get(key)
+            existing = list(existing) if isinstance(existing, list) else []
+            data[key] = existing + [item for item in value.values if item not in existing]
+    return data
+
+
+ChangeType = enum.Enum('ChangeType', 'ADDED REMOVED MODIFIED')
+
+
+class DocumentChange:
+    def __init__(self, change_type, document):
+        self.type = change_type
+        self.document = document
+
+
+class Watch:
+    def __init__(self, collection, callback):
+        self._collection = collection
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._collection._lock:
+            if self in self._collection._watches:
+                self._collection._watches.remove(self)
+
+
+class DocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class DocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data):
+        self._collection._latency('write')
+        data, commit_time = _commit(data)
+        change_type = self._store(data)
+        self._collection._notify(self.id, change_type)
+        return WriteResult(commit_time)
+
+    def _store(self, data):
+        with self._collection._lock:
+            change_type = ChangeType.MODIFIED if self.id in self._collection._documents else ChangeType.ADDED
+            if change_type is ChangeType.ADDED:
+                bisect.insort(self._collection._order, self.id)
+            self._collection._documents[self.id] = data
+        return change_type
+
+    def update(self, data):
+        self._collection._latency('write')
+        data, commit_time = _commit(data)
+        with self._collection._lock:
+            current = self._collection._documents.get(self.id)
+            if current is None:
+                raise NotFound(f"No document to update: {self._collection.name}/{self.id}")
+            # Stored documents are replaced, never changed in place, so snapshots already taken stay intact
+            self._collection._documents[self.id] = {**current, **_apply_transforms(current, data)}
+        self._collection._notify(self.id, ChangeType.MODIFIED)
+        return WriteResult(commit_time)
+
+    def get(self):
+        self._collection._latency('read')
+        with self._collection._lock:
+            return DocumentSnapshot(self.id, self._collection._documents.get(self.id))
+
+
+def _project(data, field_paths):
+    """Copy of the fields of data at the given dotted paths, like a Firestore select()"""
+    projected = {}
+    for path in field_paths:
+        *parents, leaf = path.split('.')
+        source = data
+        for key in parents:
+            source = source.get(key) if isinstance(source, dict) else None
+        # Missing fields are left out, parents included
+        if not isinstance(source, dict) or leaf not in source:
+            continue
+        target = projected
+        for key in parents:
+            target = target.setdefault(key, {})
+        target[leaf] = copy.deepcopy(source[leaf])
+    return projected
+
+
+class Query:
+    """Query stand-in: document id order, a start_after cursor, a limit and a field projection"""
+
+    def __init__(self, collection, start_after=None, limit=None, fields=None):
+        self._collection = collection
+        self._start_after = start_after
+        self._limit = limit
+        self._fields = fields
+
+    def order_by(self, field_path):
+        if field_path != '__name__':
+            raise NotImplementedError("The stand-in only orders by document id")
+        return self
+
+    def start_after(self, fields):
+        return Query(self._collection, fields['__name__'], self._limit, self._fields)
+
+    def limit(self, count):
+        return Query(self._collection, self._start_after, count, self._fields)
+
+    def select(self, field_paths):
+        return Query(self._collection, self._start_after, self._limit, list(field_paths))
+
+    def stream(self):
+        """Yields matching documents one at a time, like the real server-streamed results"""
+        collection = self._collection
+        collection._latency('read')
+        position = 0
+        if self._start_after is not None:
+            with collection._lock:
+                position = bisect.bisect_right(collection._order, self._start_after)
+        sent = 0
+        while self._limit is None or sent < self._limit:
+            with collection._lock:
+                if position >= len(collection._order):
+                    return
+                doc_id = collection._order[position]
+                data = collection._documents[doc_id]
+                if self._fields is not None:
+                    data = _project(data, self._fields)
+            position += 1
+            sent += 1
+            yield DocumentSnapshot(doc_id, data)
+
+
+class CollectionReference:
+    def __init__(self, name, latency):
+        self.name = name
+        self._latency = latency
+        self._documents = {}
+        # Document ids in sorted order, for queries and streams
+        self._order = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._watches = []
+
+    @property
+    def id(self):
+        return self.name
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            doc_id = f"{next(self._ids):020d}"
+        return DocumentReference(self, doc_id)
+
+    def order_by(self, field_path):
+        return Query(self).order_by(field_path)
+
+    def select(self, field_paths):
+        return Query(self).select(field_paths)
+
+    def on_snapshot(self, callback):
+        """Calls callback(snapshot, changes, read_time) with every document, then on every write
+
+        Unlike the real listener, changes are delivered synchronously on the
+        writing thread, so a write is visible to listeners as soon as it returns.
+        """
+        watch = Watch(self, callback)
+        with self._lock:
+            docs = [DocumentSnapshot(doc_id, self._documents[doc_id]) for doc_id in self._order]
+            self._watches.append(watch)
+        callback(docs, [DocumentChange(ChangeType.ADDED, doc) for doc in docs], datetime.now(timezone.utc))
+        return watch
+
+    def _notify(self, doc_id, change_type):
+        with self._lock:
+            watches = list(self._watches)
+            data = self._documents.get(doc_id)
+        for watch in watches:
+            doc = DocumentSnapshot(doc_id, data)
+            watch.callback([doc], [DocumentChange(change_type, doc)], datetime.now(timezone.utc))
+
+    def stream(self):
+        return Query(self).stream()
+
+    def clear(self):
+        """Removes every document without notifying listeners (not part of the real API)"""
+        with self._lock:
+            self._documents.clear()
+            self._order.clear()
+
+
+# Most writes the server accepts in one batched write
+MAX_BATCH_WRITES = 500
+
+
+class WriteBatch:
+    """Batched set() calls, committed in one round-trip"""
+
+    def __init__(self, latency):
+        self._latency = latency
+        self._writes = []
+
+    def set(self, reference, data):
+        self._writes.append((reference, data))
+        return self
+
+    def commit(self):
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(f"maximum {MAX_BATCH_WRITES} writes allowed per request")
+        self._latency('write')
+        # Everything is copied first, so a batch that cannot be stored writes nothing
+        commit_time = datetime.now(timezone.utc)
+        writes = [(reference, _commit(data)[0]) for reference, data in self._writes]
+        changes = [(reference, reference._store(data)) for reference, data in writes]
+        for reference, change_type in changes:
+            reference._collection._notify(reference.id, change_type)
+        return [WriteResult(commit_time) for _ in writes]
+
+
+class InMemoryFirestore:
+    """Firestore client stand-in holding collections of plain dicts"""
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency = _Latency(latency_seconds)
+        self._collections = {}
+
+    def collection(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections.setdefault(name, CollectionReference(name, self.latency))
+        return collection
+
+    def batch(self):
+        return WriteBatch(self.latency)
+
+
+# Largest upload the real client sends in one multipart request; bigger ones are resumable
+MAX_MULTIPART_BYTES = 8 * 1024 * 1024
+DEFAULT_CHUNK_BYTES = 100 * 1024 * 1024
+
+
+class Blob:
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.chunk_size = None
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self._bucket.name}/{self.name}"
+
+    def upload_from_string(self, data, content_type=None):
+        self._bucket.latency('write')
+        if isinstance(data, str):
+            data = data.encode()
+        self.content_type = content_type
+        self._bucket.write_object(self.name, [bytes(data)])
+
+    def upload_from_file(self, file_obj, rewind=False, size=None, content_type=None, **kwargs):
+        """Copies a file object like the real client: one request up to 8 MB, else one per chunk_size"""
+        if rewind:
+            file_obj.seek(0)
+        self.content_type = content_type
+        if size is not None and size <= MAX_MULTIPART_BYTES:
+            self.upload_from_string(file_obj.read(size), content_type)
+            return
+
+        chunk_size = self.chunk_size or DEFAULT_CHUNK_BYTES
+
+        def chunks():
+            remaining = size
+            while remaining is None or remaining > 0:
+                chunk = file_obj.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                self._bucket.latency('write')
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+        self._bucket.write_object(self.name, chunks())
+
+    def make_public(self):
+        self._bucket.latency('write')
+
+    def delete(self):
+        self._bucket.latency('write')
+        self._bucket.delete_object(self.name)
+
+
+class InMemoryBucket:
+    """Storage bucket stand-in keeping uploaded objects in a dict, or as files in a directory
+
+    objects maps each object name to its bytes, or to its file path when a
+    directory is given.
+    """
+
+    def __init__(self, name='inmemory-bucket', latency_seconds=0.0, directory=None):
+        self.name = name
+        self.latency = _Latency(latency_seconds)
+        self.directory = directory
+        self.objects = {}
+
+    def blob(self, name):
+        return Blob(self, name)
+
+    def write_object(self, name, chunks):
+        if self.directory is None:
+            self.objects[name] = b''.join(chunks)
+            return
+
+        path = os.path.join(self.directory, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.objects[name] = path
+
+    def delete_object(self, name):
+        if name not in self.objects:
+            raise NotFound(f"No such object: {self.name}/{name}")
+        stored = self.objects.pop(name)
+        if self.directory is not None:
+            os.remove(stored)
+
+
+def install(latency_seconds=0.0, storage_dir=None):
+    """Points firebase_admin at fresh in-memory stand-ins; call before importing main
+
+    Storage objects are kept in storage_dir when it is given. Returns (db, bucket).
+    """
+    from firebase_admin import credentials, firestore, storage
+    import firebase_admin
+
+    db = InMemoryFirestore(latency_seconds)
+    bucket = InMemoryBucket(latency_seconds=latency_seconds, directory=storage_dir)
+
+    credentials.Certificate = lambda *args, **kwargs: None
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: db
+    storage.bucket = lambda *args, **kwargs: bucket
+    return db, bucket
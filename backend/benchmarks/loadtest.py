@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+Load test: drives every public route of main.py in-process.
+
+The app runs against the in-memory Firestore and Storage stand-ins from
+benchmarks.inmemory_firebase, so no Firebase project or network is needed.
+Requests go straight into the ASGI app (startup hooks, middleware, routing,
+validation and serialization included) from N concurrent client coroutines.
+Inputs are drawn from a seeded generator, so two runs with the same arguments
+send the same requests.
+
+For each scenario it reports throughput, p50/p95/p99/max latency, errors and
+the process's peak RSS so far, as JSON.
+
+Usage: python -m benchmarks.loadtest [--concurrency N] [--requests N]
+                                     [--scenarios a,b] [--firestore-latency-ms MS]
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks import inmemory_firebase
+
+warnings.filterwarnings("ignore")
+
+FARM_TYPES = ['crop', 'livestock', 'mixed']
+CROP_TYPES = ['maize', 'wheat', 'rice', 'cotton', 'soybeans', 'beans', 'coffee', 'tea']
+SOIL_TYPES = ['clay', 'loam', 'sandy']
+CLIMATES = ['arid', 'mediterranean', 'temperate', 'tropical']
+
+# Seconds to wait for /ready after startup before giving up
+READY_TIMEOUT_S = 300
+
+
+async def asgi_request(app, method, path, query=b'', body=b'', headers=(), on_body=None):
+    """Sends one HTTP request through the ASGI app, returns (status, body)
+
+    body is bytes, or an iterator of byte chunks sent one message at a time
+    (without a Content-Length unless headers has one). When on_body is given,
+    every response body chunk is passed to it instead of being buffered, and
+    the returned body is empty.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query,
+        'headers': [(b'host', b'loadtest'), *headers],
+        'client': ('127.0.0.1', 50000),
+        'server': ('loadtest', 80),
+    }
+    if isinstance(body, bytes):
+        scope['headers'].insert(1, (b'content-length', str(len(body)).encode()))
+        body = iter([body])
+    status = None
+    chunks = []
+    request_sent = False
+    next_chunk = next(body, b'')
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent, next_chunk
+        if not request_sent:
+            chunk, next_chunk = next_chunk, next(body, None)
+            request_sent = next_chunk is None
+            return {'type': 'http.request', 'body': chunk, 'more_body': not request_sent}
+        # Only reached by code waiting for the client to go away
+        await response_done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            if on_body is not None:
+                on_body(message.get('body', b''))
+            else:
+                chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    response_done.set()
+    return status, b''.join(chunks)
+
+
+def json_request(method, path, payload=None, query=b''):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    return method, path, query, body, [(b'content-type', b'application/json')]
+
+
+def multipart_request(path, query, filename, content, content_type):
+    boundary = b'loadtestboundary7MA4YWxkTrZu0gW'
+    body = b''.join([
+        b'--', boundary, b'\r\n',
+        b'Content-Disposition: form-data; name="file"; filename="', filename.encode(), b'"\r\n',
+        b'Content-Type: ', content_type.encode(), b'\r\n\r\n',
+        content, b'\r\n',
+        b'--', boundary, b'--\r\n',
+    ])
+    return 'POST', path, query, body, [(b'content-type', b'multipart/form-data; boundary=' + boundary)]
+
+
+def random_registration(rng, i):
+    return {
+        'personal_info': {
+            'full_name': f"Load Test Farmer {i}",
+            'email': f"farmer{i}@example.com",
+            'phone_number': f"+2547{rng.integers(10_000_000, 99_999_999)}",
+            'id_type': 'national_id',
+            'id_number': str(rng.integers(10_000_000, 99_999_999)),
+        },
+        'farm_details': {
+            'farm_name': f"Farm {i}",
+            'farm_type': str(rng.choice(FARM_TYPES)),
+            'ownership_type': str(rng.choice(['owned', 'leased', 'communal'])),
+            'farm_location': str(rng.choice(['Nakuru', 'Eldoret', 'Kisumu', 'Meru'])),
+            'land_size': round(float(rng.uniform(0.5, 50)), 2),
+            'years_operation': int(rng.integers(0, 30)),
+            'main_crops': ', '.join(rng.choice(CROP_TYPES, size=2, replace=False).tolist()),
+            'farm_description': "Generated by the load test",
+        },
+        'financial_info': {
+            'funding_required': round(float(rng.uniform(1_000, 200_000)), 2),
+            'funding_purpose': str(rng.choice(['equipment', 'seeds', 'irrigation', 'livestock'])),
+        },
+    }
+
+
+def random_farmer_features(rng):
+    return {
+        'years_experience': round(float(rng.uniform(0, 30)), 1),
+        'land_size_hectares': round(float(rng.uniform(0.5, 100)), 2),
+        'previous_loans': int(rng.integers(0, 6)),
+        'credit_score': int(rng.integers(300, 850)),
+        'annual_income': round(float(rng.uniform(5_000, 200_000)), 2),
+        'crop_diversity': int(rng.integers(1, 8)),
+        'has_irrigation': bool(rng.integers(0, 2)),
+        'farm_type': str(rng.choice(FARM_TYPES)),
+    }
+
+
+def random_farm_plan(rng):
+    return {
+        'crop_type': str(rng.choice(CROP_TYPES)),
+        'soil_type': str(rng.choice(SOIL_TYPES)),
+        'climate': str(rng.choice(CLIMATES)),
+        'area_hectares': round(float(rng.uniform(0.5, 100)), 2),
+        'yield_per_hectare': round(float(rng.uniform(0.5, 10)), 2),
+    }
+
+
+def build_requests(scenario, rng, n, farmer_ids, args):
+    """The n requests of one scenario, generated up front so generation is not timed"""
+    if scenario == 'register':
+        return [json_request('POST', '/api/farmer/register', random_registration(rng, i)) for i in range(n)]
+    if scenario == 'upload_document':
+        return [multipart_request('/api/farmer/upload-document',
+                                  f"farmer_id={farmer_ids[rng.integers(len(farmer_ids))]}".encode(),
+                                  f"document_{i}.pdf", rng.bytes(args.document_kb * 1024), 'application/pdf')
+                for i in range(n)]
+    if scenario == 'get_farmer':
+        return [json_request('GET', f"/api/farmer/{farmer_ids[rng.integers(len(farmer_ids))]}") for _ in range(n)]
+    if scenario == 'list_farmers':
+        return [json_request('GET', '/api/farmers') for _ in range(n)]
+    if scenario == 'predict_farmer':
+        return [json_request('POST', '/api/predict/farmer', random_farmer_features(rng)) for _ in range(n)]
+    if scenario == 'predict_farmer_batch':
+        return [json_request('POST', '/api/predict/farmer/batch',
+                             {'farmers': [random_farmer_features(rng) for _ in range(args.batch_size)]})
+                for _ in range(n)]
+    if scenario == 'predict_farm_plan':
+        return [json_request('POST', '/api/predict/farm-plan', random_farm_plan(rng)) for _ in range(n)]
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+SCENARIOS = ['register', 'upload_document', 'get_farmer', 'list_farmers',
+             'predict_farmer', 'predict_farmer_batch', 'predict_farm_plan']
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (1e6 if sys.platform == 'darwin' else 1e3), 1)
+
+
+async def run_scenario(app, requests, concurrency):
+    """Sends the requests from `concurrency` client coroutines, returns the scenario report"""
+    latencies = np.empty(len(requests), dtype=np.float64)
+    statuses = [None] * len(requests)
+    pending = iter(range(len(requests)))
+
+    async def client():
+        for i in pending:
+            method, path, query, body, headers = requests[i]
+            start = time.perf_counter()
+            try:
+                statuses[i], _ = await asgi_request(app, method, path, query, body, headers)
+            except Exception:
+                statuses[i] = 'exception'
+            latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    status_counts = {}
+    for status in statuses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    errors = sum(1 for status in statuses if not (isinstance(status, int) and 200 <= status < 300))
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+
+    return {
+        'requests': len(requests),
+        'errors': errors,
+        'status_counts': status_counts,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(requests) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2),
+            'max': round(float(latencies.max() * 1e3), 2),
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+async def wait_until_ready(app):
+    deadline = time.monotonic() + READY_TIMEOUT_S
+    while time.monotonic() < deadline:
+        status, _ = await asgi_request(app, 'GET', '/ready')
+        if status == 200:
+            return
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"App was not ready after {READY_TIMEOUT_S}s")
+
+
+def seed_farmers(db, rng, n):
+    """Writes n registered farmers straight into the stand-in, returns their ids"""
+    collection = db.collection("farmers")
+    ids = []
+    for i in range(n):
+        doc_ref = collection.document()
+        registration = random_registration(rng, f"seed-{i}")
+        doc_ref.set(dict(registration, registration_date='2024-01-01T00:00:00', status='pending',
+                         risk_level='medium', risk_score=0.5, documents=[]))
+        ids.append(doc_ref.id)
+    return ids
+
+
+async def run(args):
+    db, _ = inmemory_firebase.install(args.firestore_latency_ms / 1e3)
+    import main
+
+    app = main.app
+    start = time.perf_counter()
+    await app.router.startup()
+    await wait_until_ready(app)
+    startup_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(args.seed)
+    # Seeding is not timed, so it runs without the simulated latency
+    latency, db.latency.seconds = db.latency.seconds, 0.0
+    farmer_ids = seed_farmers(db, rng, args.seed_farmers)
+    db.latency.seconds = latency
+
+    # Warm every route once so first-call costs do not land in the first scenario
+    for scenario in args.scenarios:
+        for request in build_requests(scenario, np.random.default_rng(args.seed), 1, farmer_ids, args):
+            await asgi_request(app, *request)
+
+    results = {}
+    try:
+        for scenario in args.scenarios:
+            requests = build_requests(scenario, rng, args.requests, farmer_ids, args)
+            results[scenario] = await run_scenario(app, requests, args.concurrency)
+    finally:
+        await app.router.shutdown()
+
+    return {
+        'config': {
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'seed': args.seed,
+            'seed_farmers': args.seed_farmers,
+            'batch_size': args.batch_size,
+            'document_kb': args.document_kb,
+            'firestore_latency_ms': args.firestore_latency_ms,
+            'model_artifact_format': main.MODEL_ARTIFACT_FORMAT,
+            'python': platform.python_version(),
+        },
+        'startup_s': round(startup_s, 2),
+        'scenarios': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent client coroutines")
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--seed', type=int, default=42, help="seed for the generated inputs")
+    parser.add_argument('--seed-farmers', type=int, default=200, help="farmers stored before the run")
+    parser.add_argument('--batch-size', type=int, default=100, help="farmers per batch prediction request")
+    parser.add_argument('--document-kb', type=int, default=64, help="size of each uploaded document")
+    parser.add_argument('--firestore-latency-ms', type=float, default=0.0,
+                        help="simulated blocking latency of every Firestore and Storage call")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Shared fixtures: main.py served in process against the in-memory Firestore
+and Storage stand-ins of the benchmarks, with small limits so the limit and
+batch paths are reached with small requests.
+
+Run from the backend directory: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import inmemory_firebase
+from benchmarks.loadtest import asgi_request, seed_farmers, wait_until_ready
+
+# Read by main.py when it is imported
+os.environ.setdefault("UPLOAD_MAX_BYTES", str(16 * 1024))
+os.environ.setdefault("UPLOAD_CHUNK_BYTES", str(4 * 1024))
+os.environ.setdefault("IMPORT_BATCH_SIZE", "10")
+os.environ.setdefault("FARMERS_PAGE_SIZE", "5")
+
+
+@pytest.fixture(scope='session')
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope='session')
+def stand_ins():
+    """The (db, bucket) stand-ins main.py is initialized against"""
+    return inmemory_firebase.install()
+
+
+@pytest.fixture(scope='session')
+def main(loop, stand_ins):
+    """main.py, started up and with both models loaded"""
+    import main
+    loop.run_until_complete(main.app.router.startup())
+    loop.run_until_complete(wait_until_ready(main.app))
+    yield main
+    loop.run_until_complete(main.app.router.shutdown())
+
+
+@pytest.fixture
+def client(main, loop):
+    """Sends one request through the app: client(method, path, query, body, headers) -> (status, body)"""
+    def send(*args, **kwargs):
+        return loop.run_until_complete(asgi_request(main.app, *args, **kwargs))
+    return send
+
+
+@pytest.fixture
+def farmers(main, stand_ins):
+    """An empty farmers collection and document cache; call it with n to store n farmers and get their ids"""
+    db, _ = stand_ins
+    db.collection("farmers").clear()
+    main.farmer_documents.cache.clear()
+    rng = np.random.default_rng(0)
+    return lambda n: seed_farmers(db, rng, n)
@@ -0,0 +1,65 @@
+"""
+Admin model endpoints: token checks and hot reloads.
+"""
+import json
+
+import pytest
+
+TOKEN = 'secret'
+
+
+@pytest.fixture
+def admin(main, client, monkeypatch):
+    """Sends admin requests with the configured token"""
+    monkeypatch.setattr(main, 'ADMIN_API_TOKEN', TOKEN)
+
+    def send(method, path, query=b''):
+        status, body = client(method, path, query, b'', [(b'x-admin-token', TOKEN.encode())])
+        return status, json.loads(body)
+    return send
+
+
+@pytest.mark.parametrize('configured, header, expected', [
+    (None, None, 503),
+    (None, b'anything', 503),
+    ('secret', None, 403),
+    ('secret', b'wrong', 403),
+    ('secret', b'secret', 200),
+])
+def test_admin_token(main, client, monkeypatch, configured, header, expected):
+    monkeypatch.setattr(main, 'ADMIN_API_TOKEN', configured)
+    headers = [(b'x-admin-token', header)] if header is not None else []
+    status, _ = client('GET', '/api/admin/models', b'', b'', headers)
+    assert status == expected
+
+
+def test_reload_swaps_in_a_new_bundle_only_when_forced(main, admin):
+    previous = main.model_registry.get('farmer')
+
+    status, body = admin('POST', '/api/admin/models/reload', b'model=farmer')
+    assert status == 200 and body['models']['farmer'] == {'version': previous.version, 'reloaded': False}
+    assert main.model_registry.get('farmer') is previous
+
+    status, body = admin('POST', '/api/admin/models/reload', b'model=farmer&force=true')
+    assert status == 200 and body['models']['farmer'] == {'version': previous.version, 'reloaded': True}
+    assert main.model_registry.get('farmer') is not previous
+
+    status, body = admin('GET', '/api/admin/models')
+    assert status == 200 and body['models']['farmer']['version'] == previous.version
+
+
+def test_rejected_reload_keeps_the_previous_version(main, admin, monkeypatch):
+    previous = main.model_registry.get('farmer')
+
+    def reject(name):
+        raise AssertionError("smoke batch predictions differ")
+
+    monkeypatch.setattr(main, 'load_model_bundle', reject)
+    status, body = admin('POST', '/api/admin/models/reload', b'model=farmer&force=true')
+    assert status == 422 and 'smoke batch' in body['detail']
+    assert main.model_registry.get('farmer') is previous
+
+
+def test_reload_of_an_unknown_model_is_not_found(admin):
+    status, _ = admin('POST', '/api/admin/models/reload', b'model=orchard')
+    assert status == 404
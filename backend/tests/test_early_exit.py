@@ -0,0 +1,36 @@
+"""
+Early-exit evaluation must settle every row in the forest's band and decision.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.ai.early_exit import EarlyExitForest, verify_early_exit
+from app.ai.specs import default_model_specs, load_bundle, smoke_features
+from benchmarks.bench_early_exit import perturbed_rows
+
+AI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'ai')
+
+
+@pytest.fixture(scope='module', params=sorted(default_model_specs(AI_DIR)))
+def shipped(request):
+    """One of the shipped models and its encoded training dataset"""
+    bundle = load_bundle(default_model_specs(AI_DIR)[request.param])
+    return bundle, smoke_features(bundle)
+
+
+def test_tuned_order_reproduces_the_forest(shipped):
+    bundle, X = shipped
+    evaluator = EarlyExitForest.tuned(bundle.forest, X)
+    verify_early_exit(evaluator, X)
+    verify_early_exit(evaluator, perturbed_rows(bundle, X, 500, np.random.default_rng(4)))
+
+
+def test_small_inputs_use_the_full_forest(shipped):
+    bundle, X = shipped
+    evaluator = EarlyExitForest.tuned(bundle.forest, X, min_rows=len(X) + 1)
+    decisions, proba = evaluator.predict(X)
+    expected_decisions, expected_proba = bundle.forest.predict(X)
+    np.testing.assert_array_equal(decisions, expected_decisions)
+    np.testing.assert_array_equal(proba, expected_proba)
@@ -0,0 +1,42 @@
+"""
+The bounded inference executor: a slot is held until its job finishes.
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.serving.executor import BoundedExecutor, ExecutorFullError
+from app.serving.metrics import MetricsRegistry
+
+
+def test_cancelled_job_keeps_its_slot_until_it_finishes(loop):
+    executor = BoundedExecutor('test', max_workers=1, max_queue=0, registry=MetricsRegistry())
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0)
+
+        # The job is still running on the only worker, so there is no room for another
+        with pytest.raises(ExecutorFullError):
+            await executor.run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if executor._inflight == 0:
+                break
+            await asyncio.sleep(0.01)
+        return await executor.run(lambda: 42)
+
+    try:
+        assert loop.run_until_complete(scenario()) == 42
+    finally:
+        release.set()
+        executor.shutdown()
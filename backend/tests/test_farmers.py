@@ -0,0 +1,46 @@
+"""
+Farmer registration, cached reads and their invalidation against the in-memory stand-ins.
+"""
+import json
+
+import numpy as np
+
+from benchmarks.loadtest import json_request, multipart_request, random_registration
+
+
+def get_json(client, path, query=b''):
+    status, body = client('GET', path, query)
+    assert status == 200, body
+    return json.loads(body)
+
+
+def upload(client, farmer_id, content, filename='id.pdf'):
+    return client(*multipart_request('/api/farmer/upload-document', f"farmer_id={farmer_id}".encode(),
+                                     filename, content, 'application/pdf'))
+
+
+def test_register_then_read(client, farmers):
+    registration = random_registration(np.random.default_rng(1), 'new')
+    status, body = client(*json_request('POST', '/api/farmer/register', registration))
+    assert status == 200
+    created = json.loads(body)
+    farmer = get_json(client, f"/api/farmer/{created['farmer_id']}")
+    assert farmer['personal_info'] == registration['personal_info']
+    assert farmer['risk_level'] == created['risk_assessment']['risk_level']
+    assert farmer['risk_score'] == created['risk_assessment']['risk_score']
+
+
+def test_cached_farmer_is_invalidated_by_an_upload(client, farmers, stand_ins):
+    db, _ = stand_ins
+    farmer_id, = farmers(1)
+    assert get_json(client, f"/api/farmer/{farmer_id}")['status'] == 'pending'
+
+    # A write made behind the server's back is not seen while the cached copy is fresh
+    db.collection("farmers").document(farmer_id).update({"status": "approved"})
+    assert get_json(client, f"/api/farmer/{farmer_id}")['status'] == 'pending'
+
+    status, _ = upload(client, farmer_id, b'%PDF-1.4 test')
+    assert status == 200
+    farmer = get_json(client, f"/api/farmer/{farmer_id}")
+    assert farmer['status'] == 'approved'
+    assert [document['name'] for document in farmer['documents']] == ['id.pdf']
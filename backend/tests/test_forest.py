@@ -0,0 +1,78 @@
+"""
+The compiled and compact forests must predict exactly what sklearn predicts.
+"""
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from app.ai.compact import CompactForest, verify_compact_forest
+from app.ai.forest import CompiledForest, verify_compiled_forest
+from app.ai.specs import default_model_specs, load_bundle, smoke_features
+
+AI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'ai')
+FORESTS = [CompiledForest, CompactForest]
+
+
+@pytest.fixture(scope='module')
+def synthetic():
+    """A small forest fitted on random data, with inputs both from and outside its training range"""
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(400, 5))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=400) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+    return model, np.vstack([X, rng.normal(scale=3, size=(400, 5))])
+
+
+@pytest.fixture(scope='module', params=sorted(default_model_specs(AI_DIR)))
+def shipped(request):
+    """One of the shipped models and its encoded training dataset"""
+    bundle = load_bundle(default_model_specs(AI_DIR)[request.param])
+    return bundle.model, smoke_features(bundle)
+
+
+def split_probes(model, X, seed=0):
+    """Rows of X moved onto both sides of every split threshold, as sklearn compares them in float32"""
+    rng = np.random.default_rng(seed)
+    probes = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        split = tree.feature >= 0
+        thresholds = tree.threshold[split].astype(np.float32)
+        edges = np.concatenate([thresholds, np.nextafter(thresholds, np.float32(np.inf))]).astype(np.float64)
+        rows = X[rng.integers(0, len(X), len(edges))].copy()
+        rows[np.arange(len(edges)), np.tile(tree.feature[split], 2)] = edges
+        probes.append(rows)
+    return np.vstack(probes)
+
+
+def assert_same_predictions(model, forest, X):
+    decisions, proba = forest.predict(X)
+    np.testing.assert_array_equal(proba, model.predict_proba(X))
+    np.testing.assert_array_equal(decisions, model.predict(X))
+
+
+@pytest.mark.parametrize('forest_type', FORESTS)
+def test_synthetic_forest_matches_sklearn(synthetic, forest_type):
+    model, X = synthetic
+    forest = forest_type.from_sklearn(model)
+    assert_same_predictions(model, forest, X)
+    assert_same_predictions(model, forest, split_probes(model, X))
+
+
+@pytest.mark.parametrize('forest_type', FORESTS)
+def test_shipped_forest_matches_sklearn(shipped, forest_type):
+    model, X = shipped
+    forest = forest_type.from_sklearn(model)
+    assert_same_predictions(model, forest, X)
+    assert_same_predictions(model, forest, split_probes(model, X))
+
+
+def test_verify_rejects_a_different_forest(synthetic):
+    model, X = synthetic
+    other = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=1).fit(X[:400], model.predict(X[:400]))
+    with pytest.raises(AssertionError):
+        verify_compiled_forest(model, CompiledForest.from_sklearn(other), X)
+    with pytest.raises(AssertionError):
+        verify_compact_forest(model, CompactForest.from_sklearn(other), X)
@@ -0,0 +1,16 @@
+"""
+Pre-rendered gauge assets and their URLs.
+"""
+from app.serving.visualizations import GAUGE_STYLE_VERSION, gauge_path
+
+
+def test_gauge_url_names_the_style_version(client):
+    path = gauge_path(0.615)
+    assert f"v={GAUGE_STYLE_VERSION}" in path.split('?')[1].split('&')
+    status, body = client('GET', *path.split('?'))
+    assert status == 200 and body.startswith(b'<svg')
+
+
+def test_gauge_outside_the_scale_is_not_found(client):
+    assert client('GET', '/api/visualizations/gauge/101.png')[0] == 404
+    assert client('GET', '/api/visualizations/gauge.svg', b'percent=-1')[0] == 404
@@ -0,0 +1,141 @@
+"""
+Bulk farmer imports: per-row reports, failed batches, whole-file errors and risk scores.
+"""
+import csv
+import io
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.loadtest import multipart_request, random_registration
+
+
+def registrations(n, invalid=()):
+    rng = np.random.default_rng(5)
+    for i in range(n):
+        registration = random_registration(rng, i)
+        if i in invalid:
+            registration['farm_details']['years_operation'] = "unknown"
+        yield registration
+
+
+def ndjson_file(rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows).encode()
+
+
+def csv_file(main, rows):
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow([name for fields in main.IMPORT_COLUMNS.values() for name in fields])
+    for row in rows:
+        writer.writerow([row[section][name] for section, fields in main.IMPORT_COLUMNS.items() for name in fields])
+    return text.getvalue().encode()
+
+
+def import_file(client, filename, content):
+    status, body = client(*multipart_request('/api/farmers/import', b'', filename, content, 'application/octet-stream'))
+    return status, json.loads(body)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_import_reports_every_row(main, client, farmers, stand_ins, fmt):
+    db, _ = stand_ins
+    rows = list(registrations(25, invalid={3, 17}))
+    content = csv_file(main, rows) if fmt == 'csv' else ndjson_file(rows)
+    status, report = import_file(client, f"farmers.{fmt}", content)
+    assert status == 200
+
+    first_line = 2 if fmt == 'csv' else 1
+    assert [result['line'] for result in report['results']] == list(range(first_line, first_line + 25))
+    assert (report['created'], report['invalid'], report['failed']) == (23, 2, 0)
+    assert [result['line'] - first_line for result in report['results'] if result['status'] == 'invalid'] == [3, 17]
+
+    created = [result for result in report['results'] if result['status'] == 'created']
+    stored = db.collection("farmers").document(created[0]['id']).get().to_dict()
+    assert stored['personal_info'] == rows[0]['personal_info']
+    assert (stored['risk_level'], stored['risk_score']) == (created[0]['risk_level'], created[0]['risk_score'])
+    assert len(json.loads(client('GET', '/api/farmers')[1])) == 23
+
+
+def test_failed_batch_is_reported_and_others_are_stored(main, client, farmers, stand_ins):
+    db, _ = stand_ins
+    batch = db.batch
+    commits = 0
+
+    def failing_batch():
+        write_batch = batch()
+        commit = write_batch.commit
+
+        def fail_second():
+            nonlocal commits
+            commits += 1
+            if commits == 2:
+                raise RuntimeError("simulated commit failure")
+            return commit()
+
+        write_batch.commit = fail_second
+        return write_batch
+
+    size = main.IMPORT_BATCH_SIZE
+    db.batch = failing_batch
+    try:
+        status, report = import_file(client, 'farmers.ndjson', ndjson_file(registrations(3 * size)))
+    finally:
+        db.batch = batch
+    assert status == 200
+
+    # Batches commit concurrently, so any one of the three may be the second to commit
+    failed = [result['line'] for result in report['results'] if result['status'] == 'failed']
+    assert len(failed) == size
+    assert failed == list(range(failed[0], failed[0] + size)) and (failed[0] - 1) % size == 0
+    assert all(result['error'] == "simulated commit failure"
+               for result in report['results'] if result['status'] == 'failed')
+    assert (report['created'], report['failed']) == (2 * size, size)
+    assert len(json.loads(client('GET', '/api/farmers')[1])) == 2 * size
+
+
+@pytest.mark.parametrize('filename, content', [
+    ('farmers.csv', b'full_name,email\nJane,jane@example.com\n'),
+    ('farmers.ndjson', b'{"personal_info": "\xff"}\n'),
+    ('farmers.txt', b'{}\n'),
+])
+def test_unreadable_file_is_rejected_before_any_write(client, farmers, filename, content):
+    status, _ = import_file(client, filename, content)
+    assert status == 400
+    assert json.loads(client('GET', '/api/farmers')[1]) == []
+
+
+def test_malformed_lines_are_reported(client, farmers):
+    content = ndjson_file(registrations(2)) + b'{not json\n' + b'[1, 2]\n'
+    status, report = import_file(client, 'farmers.ndjson', content)
+    assert status == 200
+    assert [result['status'] for result in report['results']] == ['created', 'created', 'invalid', 'invalid']
+
+
+def test_import_risk_matches_registration_risk(main, loop):
+    years = [0, 1, 2, 4, 5, 9, 10, 30]
+    funding = [0.0, 10000.0, 10000.01, 50000.0, 50001.0, 100000.0, 100000.5, 1e6]
+    pairs = list(itertools.product(years, funding))
+    levels, scores = main.assess_risk_batch([y for y, _ in pairs], [f for _, f in pairs])
+
+    for (years_operation, funding_required), level, score in zip(pairs, levels, scores):
+        farmer = {
+            "personal_info": {"full_name": "Test"},
+            "farm_details": {"farm_type": "crop", "farm_location": "X", "years_operation": years_operation},
+            "financial_info": {"funding_required": funding_required, "funding_purpose": "seed"},
+        }
+        single = loop.run_until_complete(main.assess_risk(farmer))
+        assert (single['risk_level'], single['risk_score']) == (level, score)
+
+
+@pytest.mark.parametrize('years_operation, funding_required, expected', [
+    (1, 150000.0, ("high", 70)),
+    (3, 60000.0, ("medium", 40)),
+    (9, 10001.0, ("low", 20)),
+    (10, 10000.0, ("low", 0)),
+])
+def test_risk_rules(main, years_operation, funding_required, expected):
+    levels, scores = main.assess_risk_batch([years_operation], [funding_required])
+    assert (levels[0], scores[0]) == expected
@@ -0,0 +1,70 @@
+"""
+The farmer listing: a bare array, cursor pages, the NDJSON stream and projections.
+"""
+import json
+
+import pytest
+
+
+def get_json(client, path, query=b''):
+    status, body = client('GET', path, query)
+    assert status == 200, body
+    return json.loads(body)
+
+
+def test_listing_without_paging_is_a_bare_array(client, farmers):
+    ids = farmers(12)
+    listing = get_json(client, '/api/farmers')
+    assert [farmer['id'] for farmer in listing] == ids
+
+
+def test_pages_cover_the_collection_once(client, farmers):
+    ids = farmers(12)
+    seen, token, pages = [], None, 0
+    while True:
+        query = "page_size=5" + (f"&start_after={token}" if token else "")
+        page = get_json(client, '/api/farmers', query.encode())
+        seen += [farmer['id'] for farmer in page['farmers']]
+        token = page['next_page_token']
+        pages += 1
+        if token is None:
+            break
+    assert seen == ids
+    assert pages == 3
+
+
+def test_page_token_alone_uses_the_default_page_size(main, client, farmers):
+    ids = farmers(12)
+    first = get_json(client, '/api/farmers', b'page_size=2')
+    page = get_json(client, '/api/farmers', f"start_after={first['next_page_token']}".encode())
+    assert [farmer['id'] for farmer in page['farmers']] == ids[2:2 + main.FARMERS_PAGE_SIZE]
+
+
+def test_stream_writes_one_document_per_line(client, farmers):
+    ids = farmers(7)
+    status, body = client('GET', '/api/farmers', b'stream=true')
+    assert status == 200
+    assert [json.loads(line)['id'] for line in body.decode().splitlines()] == ids
+
+
+def test_summary_view(client, farmers):
+    farmers(7)
+    summary = get_json(client, '/api/farmers', b'view=summary&page_size=3')['farmers']
+    assert set(summary[0]) == {'id', 'name', 'email', 'farm_name', 'farm_type', 'funding_required',
+                               'status', 'risk_level'}
+
+
+def test_fields_projection(client, farmers, stand_ins):
+    db, _ = stand_ins
+    ids = farmers(3)
+    listing = get_json(client, '/api/farmers', b'fields=personal_info.full_name,status')
+    stored = db.collection("farmers").document(ids[0]).get().to_dict()
+    assert listing[0] == {'id': ids[0], 'personal_info': {'full_name': stored['personal_info']['full_name']},
+                          'status': stored['status']}
+
+
+@pytest.mark.parametrize('query', [b'start_after=not-a-token!', b'page_size=0', b'fields=a..b'])
+def test_bad_listing_parameters(client, farmers, query):
+    farmers(1)
+    status, _ = client('GET', '/api/farmers', query)
+    assert status == 400
@@ -0,0 +1,28 @@
+"""
+Per-stage latency metrics: each endpoint's stages are charged to that endpoint.
+"""
+import numpy as np
+
+from benchmarks.loadtest import json_request, random_farmer_features
+
+
+def stage_count(client, endpoint, stage):
+    """Observations of one endpoint stage, as /metrics reports them"""
+    _, body = client('GET', '/metrics')
+    prefix = f'request_stage_seconds_count{{endpoint="{endpoint}",stage="{stage}"}} '
+    return next((float(line[len(prefix):]) for line in body.decode().splitlines() if line.startswith(prefix)), 0.0)
+
+
+def test_batch_explanations_are_timed_as_batch_stages(client):
+    rng = np.random.default_rng(13)
+    rows = [random_farmer_features(rng) for _ in range(3)]
+    batch, single = stage_count(client, 'predict_farmer_batch', 'explain'), stage_count(client, 'predict_farmer', 'explain')
+
+    status, _ = client(*json_request('POST', '/api/predict/farmer/batch', {'farmers': rows}, b'explain=true'))
+    assert status == 200
+    assert stage_count(client, 'predict_farmer_batch', 'explain') == batch + 1
+    assert stage_count(client, 'predict_farmer', 'explain') == single
+
+    status, _ = client(*json_request('POST', '/api/predict/farmer', rows[0], b'explain=true'))
+    assert status == 200
+    assert stage_count(client, 'predict_farmer', 'explain') == single + 1
@@ -0,0 +1,73 @@
+"""
+Prediction endpoints: invalid rows are rejected, one by one and per row in a batch.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.ai.features import NonFiniteValueError, UnknownCategoryError
+from benchmarks.loadtest import json_request, random_farmer_features
+
+
+@pytest.fixture
+def farmer_rows():
+    rng = np.random.default_rng(3)
+    return [random_farmer_features(rng) for _ in range(4)]
+
+
+def predict_farmer(client, row):
+    status, body = client(*json_request('POST', '/api/predict/farmer', row))
+    return status, json.loads(body)
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_non_finite_value_is_rejected(client, farmer_rows, value):
+    status, body = predict_farmer(client, dict(farmer_rows[0], annual_income=value))
+    assert status == 400
+    assert 'annual_income' in body['detail']
+
+
+def test_non_finite_integer_is_a_validation_error(client, farmer_rows):
+    status, body = predict_farmer(client, dict(farmer_rows[0], credit_score=float('nan')))
+    assert status == 422
+    assert body['detail'][0]['loc'] == ['body', 'credit_score']
+    assert body['detail'][0]['input'] == 'nan'
+
+
+def test_unknown_farm_type_is_rejected(client, farmer_rows):
+    status, body = predict_farmer(client, dict(farmer_rows[0], farm_type='orchard'))
+    assert status == 400
+    assert 'crop' in body['detail']
+
+
+def test_batch_reports_errors_per_row(client, farmer_rows):
+    rows = [farmer_rows[0], dict(farmer_rows[1], farm_type='orchard'),
+            dict(farmer_rows[2], land_size_hectares=float('nan')), farmer_rows[3]]
+    status, body = client(*json_request('POST', '/api/predict/farmer/batch', {'farmers': rows}))
+    assert status == 200
+    results = json.loads(body)['results']
+
+    assert [result['index'] for result in results] == [0, 1, 2, 3]
+    assert results[1]['prediction'] is None and 'Invalid farm type' in results[1]['error']
+    assert results[2]['prediction'] is None and 'land_size_hectares' in results[2]['error']
+    for index in (0, 3):
+        # Valid rows score exactly as they would on their own
+        single_status, single = predict_farmer(client, rows[index])
+        assert single_status == 200
+        assert results[index]['error'] is None
+        assert results[index]['probability'] == single['probability']
+        assert results[index]['prediction'] == single['prediction']
+
+
+def test_encoder_reports_the_bad_column(main):
+    features = main.model_registry.get('farmer').features
+    row = dict(zip(features.feature_cols, [1.0] * len(features.feature_cols)), farm_type='crop')
+    with pytest.raises(NonFiniteValueError) as e:
+        features.transform_one(dict(row, land_size_hectares=float('nan')))
+    assert e.value.column == 'land_size_hectares'
+
+    X, valid_indices, errors = features.encode_batch([row, dict(row, farm_type='x'), dict(row, previous_loans=np.inf)])
+    assert valid_indices == [0] and len(X) == 1
+    assert isinstance(errors[1], UnknownCategoryError)
+    assert isinstance(errors[2], NonFiniteValueError) and errors[2].column == 'previous_loans'
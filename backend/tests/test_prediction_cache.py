@@ -0,0 +1,56 @@
+"""
+The prediction cache: repeated inputs are served from it, rejected and explained requests bypass it.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.loadtest import json_request, random_farmer_features
+
+
+@pytest.fixture
+def farmer_row():
+    return random_farmer_features(np.random.default_rng(11))
+
+
+def farmer_cache_metric(client, name):
+    """A farmer prediction cache metric, as /metrics reports it"""
+    _, body = client('GET', '/metrics')
+    prefix = f'{name}{{cache="farmer_prediction"}} '
+    return next(float(line[len(prefix):]) for line in body.decode().splitlines() if line.startswith(prefix))
+
+
+def predict_farmer(client, row, query=b''):
+    status, body = client(*json_request('POST', '/api/predict/farmer', row, query))
+    return status, json.loads(body)
+
+
+def test_repeated_input_is_served_from_the_cache(main, client, farmer_row):
+    main.prediction_caches['farmer'].clear()
+    status, first = predict_farmer(client, farmer_row)
+    assert status == 200
+    hits = farmer_cache_metric(client, 'cache_hits_total')
+
+    status, second = predict_farmer(client, farmer_row)
+    assert status == 200 and second == first
+    assert farmer_cache_metric(client, 'cache_hits_total') == hits + 1
+
+
+def test_explained_request_skips_the_cache(client, farmer_row):
+    status, plain = predict_farmer(client, farmer_row)
+    assert status == 200
+    lookups = farmer_cache_metric(client, 'cache_hits_total') + farmer_cache_metric(client, 'cache_misses_total')
+
+    status, explained = predict_farmer(client, farmer_row, b'explain=true')
+    assert status == 200 and 'explanation' in explained
+    assert explained['probability'] == plain['probability']
+    assert farmer_cache_metric(client, 'cache_hits_total') + farmer_cache_metric(client, 'cache_misses_total') == lookups
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_rejected_input_is_not_cached(client, farmer_row, value):
+    entries = farmer_cache_metric(client, 'cache_entries')
+    status, _ = predict_farmer(client, dict(farmer_row, annual_income=value))
+    assert status == 400
+    assert farmer_cache_metric(client, 'cache_entries') == entries
@@ -0,0 +1,70 @@
+"""
+Document uploads: streamed to storage in chunks, limited in size and recorded with one atomic append.
+"""
+import asyncio
+import json
+
+import numpy as np
+
+from benchmarks.loadtest import asgi_request, multipart_request
+
+
+def get_json(client, path, query=b''):
+    status, body = client('GET', path, query)
+    assert status == 200, body
+    return json.loads(body)
+
+
+def upload(client, farmer_id, content, filename='id.pdf'):
+    return client(*multipart_request('/api/farmer/upload-document', f"farmer_id={farmer_id}".encode(),
+                                     filename, content, 'application/pdf'))
+
+
+def test_upload_is_stored_whole(main, client, farmers, stand_ins):
+    _, bucket = stand_ins
+    farmer_id, = farmers(1)
+
+    # Several chunks, the last one partial
+    content = np.random.default_rng(2).bytes(3 * main.UPLOAD_CHUNK_BYTES + 100)
+    status, _ = upload(client, farmer_id, content, 'title.pdf')
+    assert status == 200
+    assert bucket.objects[f"farmer_documents/{farmer_id}/title.pdf"] == content
+
+
+def test_upload_over_the_limit_is_rejected(main, client, farmers, stand_ins):
+    _, bucket = stand_ins
+    farmer_id, = farmers(1)
+
+    # Just over the limit: rejected by the endpoint once the upload is spooled
+    status, _ = upload(client, farmer_id, b'x' * (main.UPLOAD_MAX_BYTES + 1), 'big.pdf')
+    assert status == 413
+
+    # Far over the limit: rejected by the middleware while the body arrives
+    status, _ = upload(client, farmer_id, b'x' * (main.UPLOAD_MAX_BYTES + 2 * main.MULTIPART_OVERHEAD_BYTES),
+                       'huge.pdf')
+    assert status == 413
+
+    assert not [name for name in bucket.objects if name.startswith(f"farmer_documents/{farmer_id}/")]
+    assert get_json(client, f"/api/farmer/{farmer_id}")['documents'] == []
+
+
+def test_concurrent_uploads_are_all_recorded(main, loop, client, farmers):
+    farmer_id, = farmers(1)
+    names = [f"doc{i}.pdf" for i in range(20)]
+
+    async def upload_all():
+        query = f"farmer_id={farmer_id}".encode()
+        requests = [multipart_request('/api/farmer/upload-document', query, name, b'%PDF-1.4 test', 'application/pdf')
+                    for name in names]
+        return await asyncio.gather(*[asgi_request(main.app, *request) for request in requests])
+
+    assert [status for status, _ in loop.run_until_complete(upload_all())] == [200] * len(names)
+    documents = get_json(client, f"/api/farmer/{farmer_id}")['documents']
+    assert sorted(document['name'] for document in documents) == sorted(names)
+
+
+def test_upload_for_unknown_farmer_leaves_no_file(client, farmers, stand_ins):
+    _, bucket = stand_ins
+    status, _ = upload(client, 'missing', b'%PDF-1.4 test')
+    assert status == 404
+    assert not [name for name in bucket.objects if name.startswith('farmer_documents/missing/')]